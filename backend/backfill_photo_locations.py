@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Tag existing memory photos with their EXIF GPS position, capture time and the
+canonical "City, State" from the bundled gazetteer. Works fully offline:
+EXIF headers are read from the blob store (or local files), and each batch of
+coordinates is reverse-geocoded with a single KD-tree query.
+
+    python backfill_photo_locations.py             # photos not scanned yet
+    python backfill_photo_locations.py --recompute # also re-label photos that have coordinates
+
+Every photo is scanned once (location_scanned_at), so photos without GPS or
+capture time are not read again on the next run.
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+from urllib.parse import urlparse
+
+from blob_store import BLOB_ROUTE, blob_path, parse_blob_name
+from database import SessionLocal, init_db
+from gazetteer import reverse_geocode
+from models import MemoryPhoto
+from photo_exif import read_exif_file
+from sqlalchemy import or_, update
+
+BATCH_SIZE = 1000
+READ_WORKERS = 8
+
+
+def photo_file(local_path: str) -> Optional[str]:
+    """Path on disk of a photo's original, or None if it is not stored here"""
+    path = urlparse(local_path).path
+    if path.startswith(BLOB_ROUTE + "/"):
+        name = path[len(BLOB_ROUTE) + 1:]
+        return blob_path(name) if parse_blob_name(name) else None
+    return local_path if os.path.isfile(local_path) else None
+
+
+def backfill(db, recompute: bool = False, batch_size: int = BATCH_SIZE):
+    """Scan photos in photo_id order and bulk-update one batch at a time"""
+    tagged = scanned = 0
+    started = time.perf_counter()
+    last_id = 0
+    pending = MemoryPhoto.location_scanned_at.is_(None)
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as pool:
+        while True:
+            rows = db.query(
+                MemoryPhoto.photo_id, MemoryPhoto.local_path, MemoryPhoto.city_name,
+                MemoryPhoto.latitude, MemoryPhoto.longitude, MemoryPhoto.taken_at, MemoryPhoto.location_scanned_at,
+            ).filter(
+                MemoryPhoto.photo_id > last_id,
+                or_(pending, MemoryPhoto.latitude.isnot(None)) if recompute else pending,
+            ).order_by(MemoryPhoto.photo_id).limit(batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1].photo_id
+            scanned += len(rows)
+
+            # EXIF headers only, read concurrently (I/O bound)
+            to_read = [
+                row for row in rows
+                if row.location_scanned_at is None and (row.latitude is None or row.taken_at is None)
+            ]
+            paths = [photo_file(row.local_path) for row in to_read]
+            exifs = dict(zip(
+                (row.photo_id for row in to_read),
+                pool.map(lambda path: read_exif_file(path) if path else None, paths),
+            ))
+
+            # Every row of the batch is either scanned now or re-labeled, so each one is updated
+            scanned_at = datetime.utcnow()
+            updates, located = [], []
+            for row in rows:
+                exif = exifs.get(row.photo_id) or {}
+                values = {
+                    "photo_id": row.photo_id,
+                    "city_name": row.city_name,
+                    "latitude": row.latitude,
+                    "longitude": row.longitude,
+                    "taken_at": row.taken_at or exif.get("taken_at"),
+                    "location_scanned_at": row.location_scanned_at or scanned_at,
+                    "location_city_name": None,  # Set below for rows with a position
+                }
+                relabel = row.latitude is not None and (recompute or row.location_scanned_at is None)
+                if row.latitude is None and exif.get("latitude") is not None:
+                    values["latitude"], values["longitude"] = exif["latitude"], exif["longitude"]
+                    relabel = True
+                if relabel:
+                    located.append(values)
+                updates.append(values)
+
+            # One vectorized lookup for the whole batch
+            cities = reverse_geocode(
+                [values["latitude"] for values in located],
+                [values["longitude"] for values in located],
+            )
+            for values, city_name in zip(located, cities):
+                values["location_city_name"] = city_name
+                # The client's label stays: it is what the plan's cities are matched on
+                values["city_name"] = values["city_name"] or city_name
+                if city_name:
+                    tagged += 1
+
+            db.execute(update(MemoryPhoto), updates)
+            db.commit()
+            print(f"  ✓ {scanned} photos scanned, {tagged} tagged with a city")
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Backfill complete: {scanned} scanned, {tagged} tagged in {elapsed:.1f}s")
+    return scanned, tagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recompute", action="store_true", help="re-label photos that already have coordinates")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    print("🚀 Backfilling memory photo locations")
+    print("=" * 60)
+    init_db()
+    db = SessionLocal()
+    try:
+        backfill(db, recompute=args.recompute, batch_size=args.batch_size)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for the explore API (explore_places).
+
+Fills a temporary SQLite database with synthetic places clustered around metro areas,
+then times nearby lookups with an empty cell cache (cold) and again once every cell
+is cached (warm), printing median and p99 per mode.
+
+    python bench_explore.py [--places 100000] [--queries 500] [--radius 10]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import explore
+from explore import EXPLORE_CATEGORIES, explore_places
+from models import Base, Poi
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+METROS = [
+    (42.3601, -71.0589), (40.7128, -74.0060), (38.5733, -109.5498), (30.2672, -97.7431),
+    (39.7392, -104.9903), (34.8697, -111.7610), (45.5152, -122.6784), (35.5951, -82.5515),
+    (32.0809, -81.0912), (35.6870, -105.9378), (44.3876, -68.2039), (47.6062, -122.3321),
+    (41.8781, -87.6298), (29.9511, -90.0715), (37.7749, -122.4194), (25.7617, -80.1918),
+]
+CATEGORIES = ["hotel", "restaurant", "vet", "pet_service", "park", "dog_beach"]
+
+
+def seed(db, num_places, rng):
+    batch = []
+    for i in range(num_places):
+        lat, lng = rng.choice(METROS)
+        batch.append(Poi(
+            source_id=f"bench-{i}", category=rng.choice(CATEGORIES), name=f"Place {i}",
+            latitude=rng.gauss(lat, 0.15), longitude=rng.gauss(lng, 0.15),
+            pet_policy=rng.choice(["approved", "conditional"]), rating=round(rng.uniform(3, 5), 1),
+        ))
+        if len(batch) == 5000:
+            db.add_all(batch)
+            db.commit()
+            batch = []
+    db.add_all(batch)
+    db.commit()
+
+
+def measure(label, db, points, radius_km, cold):
+    if not cold:
+        for category, lat, lng in points:
+            explore_places(db, category, lat, lng, radius_km, limit=20)
+    timings = []
+    for category, lat, lng in points:
+        if cold:
+            explore.clear_cache()
+        start = time.perf_counter()
+        explore_places(db, category, lat, lng, radius_km, limit=20)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"{label:<5} median {statistics.median(timings):7.2f} ms   p99 {p99:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--places", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--radius", type=float, default=10.0)
+    args = parser.parse_args()
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            start = time.perf_counter()
+            seed(db, args.places, rng)
+            print(f"Seeded {args.places} places in {time.perf_counter() - start:.1f} s")
+
+            points = []
+            for _ in range(args.queries):
+                lat, lng = rng.choice(METROS)
+                points.append((rng.choice(list(EXPLORE_CATEGORIES)), rng.gauss(lat, 0.05), rng.gauss(lng, 0.05)))
+            measure("cold", db, points, args.radius, cold=True)
+            measure("warm", db, points, args.radius, cold=False)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark: BlobFileResponse (mmap / zerocopy) vs Starlette's FileResponse.
+
+Starts a local uvicorn server with one route per implementation, downloads the same
+files concurrently through both and prints requests/s and MB/s.
+
+    python bench_file_serving.py [--requests 400] [--concurrency 8]
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse
+from file_serving import BlobFileResponse
+
+PORT = 8765
+FILE_SIZES = {"avatar-40KB": 40 * 1024, "photo-2MB": 2 * 1024 * 1024, "photo-8MB": 8 * 1024 * 1024}
+
+
+def build_app(files):
+    app = FastAPI()
+
+    @app.get("/blob/{name}")
+    def blob(name: str, request: Request):
+        return BlobFileResponse(
+            files[name],
+            media_type="image/jpeg",
+            etag=f'"{name}"',
+            range_header=request.headers.get("range"),
+            if_none_match=request.headers.get("if-none-match"),
+        )
+
+    @app.get("/file/{name}")
+    def file(name: str):
+        return FileResponse(files[name], media_type="image/jpeg")
+
+    return app
+
+
+def start_server(app):
+    server = uvicorn.Server(uvicorn.Config(app, port=PORT, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def run(url, total_requests, concurrency):
+    """Download `url` total_requests times over `concurrency` connections"""
+    local = threading.local()
+
+    def fetch(_):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        response = local.session.get(url)
+        response.raise_for_status()
+        return len(response.content)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        total_bytes = sum(pool.map(fetch, range(total_requests)))
+    elapsed = time.perf_counter() - started
+    return total_requests / elapsed, total_bytes / elapsed / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = {}
+        for name, size in FILE_SIZES.items():
+            files[name] = os.path.join(tmp, name)
+            with open(files[name], "wb") as f:
+                f.write(os.urandom(size))
+
+        server, thread = start_server(build_app(files))
+        try:
+            print(f"{'file':<14}{'route':<20}{'req/s':>10}{'MB/s':>10}")
+            for name in FILE_SIZES:
+                for label, route in (("FileResponse", "file"), ("BlobFileResponse", "blob")):
+                    url = f"http://127.0.0.1:{PORT}/{route}/{name}"
+                    run(url, min(20, args.requests), args.concurrency)  # warm up
+                    rps, mbps = run(url, args.requests, args.concurrency)
+                    print(f"{name:<14}{label:<20}{rps:>10.1f}{mbps:>10.1f}")
+        finally:
+            server.should_exit = True
+            thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for plan search: FTS5 (search_plans) vs a LIKE scan over the plan columns.
+
+Fills a temporary SQLite database with synthetic plans spread over many users, then times
+the same queries through both and prints median and p95 per query.
+
+    python bench_plan_search.py [--plans 100000] [--users 1000] [--queries 200]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date
+
+from models import Base, Plan, PlanStop, User
+from search_index import index_plans, search_plans
+from sqlalchemy import create_engine, or_
+from sqlalchemy.orm import Session
+
+CITIES = [
+    "Boston, Massachusetts", "Moab, Utah", "Austin, Texas", "Denver, Colorado", "Sedona, Arizona",
+    "Portland, Oregon", "Asheville, North Carolina", "Savannah, Georgia", "Santa Fe, New Mexico",
+    "Bar Harbor, Maine", "Flagstaff, Arizona", "Bend, Oregon", "Burlington, Vermont", "Duluth, Minnesota",
+]
+WORDS = ["patio", "lodge", "trail", "dog park", "brewery", "lake", "cabin", "grill", "beach", "canyon"]
+QUERIES = ["moab", "dog park", "sedona lodge", "breweries", "patio austin", "canyon trail"]
+
+
+def seed(db, num_plans, num_users, rng):
+    db.add_all(User(email=f"u{i}@example.com", password="x", name=f"User {i}") for i in range(num_users))
+    db.flush()
+    batch = []
+    for i in range(num_plans):
+        plan = Plan(
+            user_id=1 + i % num_users,
+            start_date=date(2025, 6, 1), end_date=date(2025, 6, 5), trip_type="Road Trip",
+            origin=rng.choice(CITIES), destination=rng.choice(CITIES),
+            places_passing_by=json.dumps(rng.sample(CITIES, 2)),
+        )
+        plan.stops = [
+            PlanStop(
+                position=position, day_index=position // 2, type="dining",
+                title=f"{rng.choice(WORDS).title()} stop", subtitle=f"{rng.choice(CITIES)} • {rng.choice(WORDS)}",
+            )
+            for position in range(6)
+        ]
+        batch.append(plan)
+        if len(batch) == 1000:
+            db.add_all(batch)
+            db.flush()
+            index_plans(db, batch)
+            db.commit()
+            batch = []
+    if batch:
+        db.add_all(batch)
+        db.flush()
+        index_plans(db, batch)
+        db.commit()
+
+
+def like_search(db, user_id, query, limit):
+    """Baseline: every word must occur in one of the plan columns"""
+    filters = [
+        or_(Plan.destination.ilike(f"%{word}%"), Plan.origin.ilike(f"%{word}%"),
+            Plan.places_passing_by.ilike(f"%{word}%"),
+            Plan.stops.any(or_(PlanStop.title.ilike(f"%{word}%"), PlanStop.subtitle.ilike(f"%{word}%"))))
+        for word in query.split()
+    ]
+    return db.query(Plan.plan_id).filter(Plan.user_id == user_id, *filters).limit(limit).all()
+
+
+def measure(label, search, db, num_users, num_queries, rng):
+    timings = []
+    for _ in range(num_queries):
+        user_id, query = rng.randint(1, num_users), rng.choice(QUERIES)
+        start = time.perf_counter()
+        search(db, user_id, query, 20)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<8} median {statistics.median(timings):7.2f} ms   p95 {p95:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plans", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            start = time.perf_counter()
+            seed(db, args.plans, args.users, rng)
+            print(f"Seeded and indexed {args.plans} plans in {time.perf_counter() - start:.1f} s")
+
+            measure("fts5", search_plans, db, args.users, args.queries, rng)
+            measure("like", like_search, db, args.users, args.queries, rng)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for route corridor search (corridor_places) on cross-country road trips.
+
+Fills a temporary SQLite database with synthetic places spread over the contiguous US
+(half of them clustered around cities), then times corridor searches along a few
+coast-to-coast routes (first page of 100) and prints median and p95 per search.
+
+    python bench_route_corridor.py [--places 100000] [--repeat 20]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from models import Base, Poi
+from route_corridor import corridor_places
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+ROUTES = {
+    "Seattle → New York": [(47.61, -122.33), (43.62, -116.21), (41.26, -95.93), (41.88, -87.63), (40.71, -74.01)],
+    "Los Angeles → Miami": [(34.05, -118.24), (35.08, -106.65), (32.78, -96.80), (33.75, -84.39), (25.76, -80.19)],
+    "San Francisco → Boston": [(37.77, -122.42), (39.74, -104.99), (39.10, -94.58), (39.96, -82.99), (42.36, -71.06)],
+}
+CITIES = [point for route in ROUTES.values() for point in route]
+CATEGORIES = ["hotel", "restaurant", "vet", "pet_service", "park", "dog_beach"]
+
+
+def seed(db, num_places, rng):
+    batch = []
+    for i in range(num_places):
+        if i % 2:
+            lat, lng = rng.choice(CITIES)
+            lat, lng = rng.gauss(lat, 0.3), rng.gauss(lng, 0.3)
+        else:
+            lat, lng = rng.uniform(25, 49), rng.uniform(-124, -67)
+        batch.append(Poi(
+            source_id=f"bench-{i}", category=rng.choice(CATEGORIES), name=f"Place {i}",
+            latitude=lat, longitude=lng, pet_policy="approved", open_24h=rng.random() < 0.1,
+        ))
+        if len(batch) == 5000:
+            db.add_all(batch)
+            db.commit()
+            batch = []
+    db.add_all(batch)
+    db.commit()
+
+
+def measure(label, db, repeat, **search):
+    timings = []
+    for _ in range(repeat):
+        for route in ROUTES.values():
+            start = time.perf_counter()
+            corridor_places(db, route, limit=100, **search)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<26} median {statistics.median(timings):7.2f} ms   p95 {p95:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--places", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            start = time.perf_counter()
+            seed(db, args.places, rng)
+            print(f"Seeded {args.places} places in {time.perf_counter() - start:.1f} s")
+
+            measure("16 km, 24h vets", db, args.repeat, radius_km=16, categories=["vet"], open_24h=True)
+            measure("16 km, vets and parks", db, args.repeat, radius_km=16, categories=["vet", "park"])
+            measure("16 km, all categories", db, args.repeat, radius_km=16)
+            measure("50 km, all categories", db, args.repeat, radius_km=50)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+from typing import Optional, Tuple
+from urllib.parse import urlparse
+
+# Blobs live on local disk, addressed by the SHA-256 of their content
+BLOB_DIR = os.getenv(
+    "PAWCATION_BLOB_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "blobs"),
+)
+# Public origin of the API for blob URLs written to the database, e.g. "https://api.example.com";
+# when unset, the URLs are built from the base URL of the request that stored the blob
+BLOB_BASE_URL = os.getenv("BLOB_BASE_URL", "")
+BLOB_ROUTE = "/api/blobs"
+# Largest blob accepted; full-resolution phone photos (48 MP JPEG, HEIC, ProRAW) run to tens of MB
+MAX_BLOB_BYTES = int(os.getenv("MAX_BLOB_MB", "100")) * 1024 * 1024
+
+EXTENSIONS = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/webp": "webp",
+    "image/gif": "gif",
+}
+CONTENT_TYPES = {"png": "image/png", "jpg": "image/jpeg", "webp": "image/webp", "gif": "image/gif"}
+
+BLOB_NAME_RE = re.compile(r"^([0-9a-f]{64})\.(png|jpg|webp|gif)$")
+
+
+class BlobError(ValueError):
+    """Raised for content the blob store refuses to keep"""
+
+
+def blob_path(name: str) -> str:
+    """Path of a blob on disk; blobs are sharded by the first two hex digits"""
+    return os.path.join(BLOB_DIR, name[:2], name)
+
+
+def blob_url(name: str, base_url: str = "") -> str:
+    """Absolute URL of a blob; BLOB_BASE_URL, when set, wins over `base_url`"""
+    return f"{(BLOB_BASE_URL or base_url).rstrip('/')}{BLOB_ROUTE}/{name}"
+
+
+def blob_name_from_url(url: Optional[str]) -> Optional[str]:
+    """Blob file name a stored /api/blobs/... URL points at, or None for any other value"""
+    path = urlparse(url or "").path
+    if not path.startswith(BLOB_ROUTE + "/"):
+        return None
+    name = path[len(BLOB_ROUTE) + 1:]
+    return name if parse_blob_name(name) else None
+
+
+def parse_blob_name(name: str) -> Optional[Tuple[str, str]]:
+    """Split a blob file name into (digest, content type), or None if it is not one"""
+    match = BLOB_NAME_RE.match(name)
+    if not match:
+        return None
+    return match.group(1), CONTENT_TYPES[match.group(2)]
+
+
+class BlobWriter:
+    """
+    Write a blob to disk incrementally, hashing as it goes, so large uploads never
+    have to be held in memory. Call commit() to get the blob name, or abort().
+    """
+
+    def __init__(self, content_type: str):
+        self.extension = EXTENSIONS.get((content_type or "").lower())
+        if not self.extension:
+            raise BlobError(f"Unsupported content type: {content_type}")
+        self.size = 0
+        self._hash = hashlib.sha256()
+        # Temp files live inside BLOB_DIR so the final rename stays on one filesystem
+        os.makedirs(BLOB_DIR, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=BLOB_DIR, suffix=".tmp")
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > MAX_BLOB_BYTES:
+            self.abort()
+            raise BlobError("File is too large")
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+    def commit(self) -> str:
+        """Move the finished file into place and return its blob name"""
+        self._file.close()
+        name = f"{self._hash.hexdigest()}.{self.extension}"
+        path = blob_path(name)
+        if os.path.exists(path):
+            # Identical content is only stored once
+            os.remove(self._tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self._tmp_path, path)
+        return name
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+def save_blob(data: bytes, content_type: str) -> str:
+    """
+    Store bytes under their content hash and return the blob file name.
+    Identical content is only written once.
+    """
+    writer = BlobWriter(content_type)
+    try:
+        writer.write(data)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.commit()
+
+
+def delete_blob(name: str) -> bool:
+    """Remove a blob file; False if it was already gone"""
+    try:
+        os.remove(blob_path(name))
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def save_blob_stream(fileobj, content_type: str, chunk_size: int = 1024 * 1024) -> str:
+    """Copy a file object into the blob store chunk by chunk and return the blob name"""
+    writer = BlobWriter(content_type)
+    try:
+        while chunk := fileobj.read(chunk_size):
+            writer.write(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.commit()
+
+
+def parse_data_url(value: str) -> Optional[Tuple[bytes, str]]:
+    """Decode a base64 data URL into (bytes, mime type), or None if value is not one"""
+    if not value or not value.startswith("data:") or "," not in value:
+        return None
+    header, payload = value[len("data:"):].split(",", 1)
+    if not header.endswith(";base64"):
+        return None
+    try:
+        data = base64.b64decode(payload)
+    except (binascii.Error, ValueError):
+        return None
+    return data, (header.split(";")[0] or "application/octet-stream")
+
+
+def store_data_url(value: Optional[str], base_url: str = "") -> Optional[str]:
+    """
+    Move an inline data URL into the blob store and return its short URL.
+    Any other value (regular URLs, None) is returned unchanged.
+    """
+    parsed = parse_data_url(value)
+    if parsed is None:
+        return value
+    data, mime = parsed
+    return blob_url(save_blob(data, mime), base_url)
@@ -0,0 +1,147 @@
+import copy
+import math
+from typing import Dict, List, Optional, Tuple
+
+from gazetteer import normalize_city
+from plan_relations import city_mentions
+
+# Typical price per unit of each class of the flexible item types, most expensive first:
+# per person for dining and activities, per room-night for accommodation. An item's class
+# is the band nearest its price; fitting moves it down a band at the same place.
+COST_BANDS = {
+    "accommodation": [("Luxury room", 350.0), ("Upscale room", 220.0), ("Standard room", 140.0), ("Economy room", 90.0)],
+    "dining": [("Fine dining", 60.0), ("Casual dining", 30.0), ("Counter service", 15.0)],
+    "activity": [("Premium experience", 60.0), ("Standard admission", 30.0), ("Budget option", 12.0)],
+}
+PER_PERSON_TYPES = {"dining", "activity"}
+BAND_LABELS = {label for bands in COST_BANDS.values() for label, _ in bands}
+# Substitutes must be at least as pet-friendly as the item they replace
+COMPLIANCE_RANK = {"approved": 2, "conditional": 1, "notAllowed": 0}
+
+
+def units(item: dict, party: int) -> int:
+    return party if item["type"] in PER_PERSON_TYPES else 1
+
+
+def band_index(item: dict, party: int) -> int:
+    """Index in COST_BANDS of the class nearest the item's price (on a log scale)"""
+    price = item["estimated_cost"] / units(item, party)
+    bands = COST_BANDS[item["type"]]
+    return min(range(len(bands)), key=lambda i: abs(math.log(price / bands[i][1])))
+
+
+def rescaled(item: dict, party: int) -> Optional[Tuple[str, float]]:
+    """The next cheaper class of the item (label, cost), if any"""
+    bands = COST_BANDS[item["type"]]
+    for label, price in bands[band_index(item, party) + 1:]:
+        cost = round(price * units(item, party), 2)
+        if cost < item["estimated_cost"]:
+            return label, cost
+    return None
+
+
+def item_place(item: dict, day_index: int, day_cities: List[str]) -> Tuple[Optional[str], int]:
+    """
+    (normalized "City, State", day index) of an item; the city comes from its subtitle,
+    else the last city of its day label, and is None when neither names one
+    """
+    cities = city_mentions(item.get("subtitle")) or day_cities[-1:]
+    return (normalize_city(cities[0]) if cities else None), day_index
+
+
+def same_place(place: Tuple[Optional[str], int], other: Tuple[Optional[str], int]) -> bool:
+    """Both in the same city, or on the same day when the city is not known"""
+    city, day_index = place
+    return city == other[0] if city else day_index == other[1]
+
+
+def substitute(item: dict, items: List[dict], places: Dict[int, Tuple[Optional[str], int]]) -> Optional[dict]:
+    """
+    The cheapest other item of the same type in the same city that is at least as
+    pet-friendly, if cheaper. `places` maps id() of each item to its item_place().
+    """
+    rank = COMPLIANCE_RANK.get(item.get("compliance"), 0)
+    candidates = [
+        other for other in items
+        if other is not item and other["type"] == item["type"] and other["title"] != item["title"]
+        and same_place(places[id(item)], places[id(other)])
+        and COMPLIANCE_RANK.get(other.get("compliance"), 0) >= rank
+        and other["estimated_cost"] < item["estimated_cost"]
+    ]
+    return min(candidates, key=lambda other: other["estimated_cost"], default=None)
+
+
+def with_band_label(subtitle: str, label: str) -> str:
+    parts = [part for part in subtitle.split(" • ") if part and part not in BAND_LABELS]
+    return " • ".join([*parts, label])
+
+
+def fit_budget(itinerary: dict, budget: float, party: int = 2) -> Tuple[dict, List[dict]]:
+    """
+    A copy of the itinerary brought within budget without regenerating it, and the list of
+    changes made. Only dining, activity and accommodation items are touched. Each step
+    moves the item saving the most down one class of COST_BANDS at the same place; once
+    every item is in its cheapest class, items are instead substituted with the cheapest
+    other item of their type on the plan in the same city that is at least as pet-friendly
+    (a meal at the diner already booked there for another day; never a hotel in the town
+    of another night). Transport costs and the compliance of every kept item are left as
+    they are. The result may still be over budget when there is nothing left to cut.
+    """
+    fitted = copy.deepcopy(itinerary)
+    party = max(party, 1)
+    located = [
+        (day_index, item)
+        for day_index, day in enumerate(fitted.get("days", []))
+        for item in day.get("items", [])
+        if item.get("type") in COST_BANDS and isinstance(item.get("estimated_cost"), (int, float))
+        and item["estimated_cost"] > 0
+    ]
+    items = [item for _, item in located]
+    day_cities = [city_mentions(day.get("dayLabel")) for day in fitted.get("days", [])]
+    # Places are fixed up front: a substitute takes over the title and subtitle of another item
+    places = {id(item): item_place(item, day_index, day_cities[day_index]) for day_index, item in located}
+    originals = [copy.deepcopy(item) for item in items]
+    total = sum(
+        item["estimated_cost"]
+        for day in fitted.get("days", []) for item in day.get("items", [])
+        if isinstance(item.get("estimated_cost"), (int, float))
+    )
+
+    while total > budget + 0.005:
+        # Cheaper classes at the same places first, then other places already on the plan
+        steps = [(item, rescaled(item, party)) for item in items]
+        steps = [(item["estimated_cost"] - target[1], item, target) for item, target in steps if target]
+        action = "rescaled"
+        if not steps:
+            steps = [(item, substitute(item, items, places)) for item in items]
+            steps = [(item["estimated_cost"] - other["estimated_cost"], item, other) for item, other in steps if other]
+            action = "substituted"
+        if not steps:
+            break
+        saving, item, target = max(steps, key=lambda step: step[0])
+        total -= saving
+        if action == "rescaled":
+            label, item["estimated_cost"] = target
+            item["subtitle"] = with_band_label(item.get("subtitle", ""), label)
+        else:
+            keep = {"id": item["id"], "time": item["time"]}
+            item.clear()
+            item.update(copy.deepcopy(target), **keep)
+
+    changes = []
+    for (day_index, item), original in zip(located, originals):
+        if item == original:
+            continue
+        changes.append({
+            "day": day_index + 1,
+            "item_id": item["id"],
+            "action": "substituted" if item["title"] != original["title"] else "rescaled",
+            "title": item["title"],
+            "previous_title": original["title"],
+            "estimated_cost": item["estimated_cost"],
+            "previous_cost": original["estimated_cost"],
+        })
+
+    fitted["total_estimated_cost"] = round(total, 2)
+    fitted["budget"] = budget
+    return fitted, changes
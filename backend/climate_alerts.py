@@ -0,0 +1,182 @@
+import csv
+import os
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+import numpy as np
+from gazetteer import EARTH_RADIUS_KM, locate_cities, to_unit_vectors
+from itinerary_library import join_names
+from models import Pet
+from plan_relations import city_mentions
+from scipy.spatial import cKDTree
+
+# Monthly normal daily highs and lows (°F) and elevation of US cities and park towns,
+# rounded from NOAA 1991-2020 climate normals. Rows with the same columns can be added.
+CLIMATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "us_climate_normals.csv")
+# Places farther than this from every station get no alerts
+MAX_STATION_KM = 150.0
+
+# Normal high at or above which a typical adult, medium-sized dog needs heat precautions,
+# normal low at or below which it needs cold precautions, and elevation where thinner air
+# starts to show on hikes; pet_thresholds() moves them for the pet at hand.
+HEAT_F = 88.0
+COLD_F = 20.0
+ALTITUDE_FT = 8000.0
+
+# Breed name fragments (lowercase); cats included where it matters
+BRACHYCEPHALIC_BREEDS = (
+    "pug", "bulldog", "boxer", "shih tzu", "boston terrier", "pekingese", "lhasa apso", "cavalier",
+    "mastiff", "dogue de bordeaux", "griffon", "japanese chin", "persian", "himalayan", "exotic shorthair",
+)
+THICK_COAT_BREEDS = (
+    "husky", "malamute", "samoyed", "newfoundland", "bernese", "saint bernard", "st. bernard",
+    "great pyrenees", "akita", "chow", "keeshond", "elkhound", "leonberger", "maine coon",
+)
+THIN_COAT_BREEDS = (
+    "chihuahua", "greyhound", "whippet", "dachshund", "pinscher", "doberman", "hairless",
+    "xoloitzcuintli", "chinese crested", "vizsla", "weimaraner", "basenji", "dalmatian", "sphynx",
+)
+# Health notes that make heat and altitude harder on a pet
+AT_RISK_HEALTH = ("heart", "breath", "respiratory", "asthma", "obes", "overweight", "collapse")
+
+
+class ClimateNormals:
+    """Bundled climate normals behind a KD-tree, queried in vectorized batches"""
+
+    def __init__(self, path: str = CLIMATE_PATH):
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        self.lats = np.array([float(row["latitude"]) for row in rows])
+        self.lngs = np.array([float(row["longitude"]) for row in rows])
+        self.elevation = np.array([float(row["elevation_ft"]) for row in rows])
+        self.highs = np.array([[float(row[f"high_{m}"]) for m in range(1, 13)] for row in rows])
+        self.lows = np.array([[float(row[f"low_{m}"]) for m in range(1, 13)] for row in rows])
+        self.tree = cKDTree(to_unit_vectors(self.lats, self.lngs))
+
+    def daily(self, lats: Sequence[float], lngs: Sequence[float], days: Sequence[date]):
+        """
+        Normal (high, low, elevation) at the nearest station for each place and day,
+        interpolated between the mid-month normals, and a mask of places near a station.
+        """
+        bound = 2 * np.sin(MAX_STATION_KM / EARTH_RADIUS_KM / 2)
+        chord, station = self.tree.query(to_unit_vectors(lats, lngs), distance_upper_bound=bound)
+        found = np.isfinite(chord)
+        station = np.where(found, station, 0)
+
+        # Months as a continuous scale, 0.0 at mid-January
+        months = np.array([(day.timetuple().tm_yday - 15.5) / 30.44 for day in days]) % 12
+        before = np.floor(months).astype(int)
+        after = (before + 1) % 12
+        weight = months - before
+        highs = self.highs[station, before] * (1 - weight) + self.highs[station, after] * weight
+        lows = self.lows[station, before] * (1 - weight) + self.lows[station, after] * weight
+        return highs, lows, self.elevation[station], found
+
+
+@lru_cache(maxsize=1)
+def get_climate() -> ClimateNormals:
+    """The shared climate normals, loaded on first use (one per process)"""
+    return ClimateNormals()
+
+
+def mentions_any(text: Optional[str], fragments: Sequence[str]) -> bool:
+    return any(fragment in (text or "").lower() for fragment in fragments)
+
+
+def pet_thresholds(pet: Pet, on: date) -> dict:
+    """HEAT_F, COLD_F and ALTITUDE_FT moved for the pet's size, age, breed and health"""
+    size = (pet.size or "").lower()
+    small = any(word in size for word in ("toy", "small", "tiny"))
+    large = any(word in size for word in ("large", "giant", "xl"))
+    years = (on - pet.date_of_birth).days / 365.25 if pet.date_of_birth else None
+    senior, young = years is not None and years >= 8, years is not None and years < 1
+    short_nosed = mentions_any(pet.breed, BRACHYCEPHALIC_BREEDS)
+    thick_coat = mentions_any(pet.breed, THICK_COAT_BREEDS)
+    thin_coat = mentions_any(pet.breed, THIN_COAT_BREEDS)
+    at_risk = mentions_any(pet.health, AT_RISK_HEALTH)
+
+    heat = HEAT_F - 10 * short_nosed - 8 * thick_coat - 4 * senior - 2 * young - 3 * large - 5 * at_risk
+    cold = COLD_F + 10 * small + 10 * thin_coat + 5 * senior + 5 * young - 20 * thick_coat
+    altitude = ALTITUDE_FT - 2000 * short_nosed - 1000 * senior - 1000 * at_risk
+    return {"heat": heat, "cold": cold, "altitude": altitude, "short_nosed": short_nosed,
+            "needs_coat": small or thin_coat}
+
+
+def day_places(itinerary: dict, first_city: str) -> List[List[tuple]]:
+    """
+    Located (name, lat, lng) cities of each day: those its label and items mention, else
+    the last city of the day before (first_city before the first day)
+    """
+    days = itinerary.get("days", [])
+    mentions = [
+        city_mentions(" • ".join(
+            [day.get("dayLabel", "")]
+            + [f"{item.get('title', '')} • {item.get('subtitle', '')}" for item in day.get("items", [])]
+        ))
+        for day in days
+    ]
+    names = list(dict.fromkeys([first_city, *(name for found in mentions for name in found)]))
+    located = dict(zip(names, locate_cities(names)))
+
+    places, current = [], [located[first_city]] if located[first_city] else []
+    for found in mentions:
+        today = [located[name] for name in found if located[name]]
+        current = list(dict.fromkeys(today)) or current[-1:]
+        places.append(current)
+    return places
+
+
+def add_climate_alerts(itinerary: dict, pets: Sequence[Pet], start_date: date, first_city: str) -> dict:
+    """
+    Replace the weather alerts of every day with ones computed from climate normals for the
+    cities of that day (day_places) and the most sensitive of the pets: a heat alert for
+    the hottest city whose normal high reaches the heat threshold, a cold alert for the
+    coldest city at or under the cold threshold, and an altitude warning for the highest
+    city at or above the altitude threshold. Other alerts are kept.
+    """
+    places = day_places(itinerary, first_city)
+    pairs = [(i, place) for i, today in enumerate(places) for place in today]
+    if not pairs:
+        return itinerary
+    days = [start_date + timedelta(days=i) for i, _ in pairs]
+    highs, lows, elevation, found = get_climate().daily(
+        [place[1] for _, place in pairs], [place[2] for _, place in pairs], days
+    )
+    per_pet = [pet_thresholds(pet, start_date) for pet in pets]
+    heat = found & (highs >= min(limits["heat"] for limits in per_pet))
+    cold = found & (lows <= max(limits["cold"] for limits in per_pet))
+    high_up = found & (elevation >= min(limits["altitude"] for limits in per_pet))
+    short_nosed = any(limits["short_nosed"] for limits in per_pet)
+    coats = [pet.name for pet, limits in zip(pets, per_pet) if limits["needs_coat"]]
+
+    name = join_names([pet.name for pet in pets])
+    day_of_pair = np.array([i for i, _ in pairs])
+    alerts_by_day = [[] for _ in places]
+    for i in np.unique(day_of_pair):
+        in_day = day_of_pair == i
+        if (heat & in_day).any():
+            j = int(np.argmax(np.where(heat & in_day, highs, -np.inf)))
+            advice = "Short-nosed pets overheat fast: walk" if short_nosed else "Pack extra water, walk"
+            alerts_by_day[i].append({"type": "weather", "message": (
+                f"🌡️ Typical high of {round(highs[j])}°F in {pairs[j][1][0]} — {advice} {name} early or late "
+                "and never leave them in the car"
+            )})
+        if (cold & in_day).any():
+            j = int(np.argmin(np.where(cold & in_day, lows, np.inf)))
+            advice = f"Bring a coat for {join_names(coats)} and keep walks short" if coats else \
+                f"Keep outdoor time short for {name} and wipe paws after walks"
+            alerts_by_day[i].append({"type": "weather", "message": (
+                f"❄️ Typical low of {round(lows[j])}°F in {pairs[j][1][0]} — {advice}"
+            )})
+        if (high_up & in_day).any():
+            j = int(np.argmax(np.where(high_up & in_day, elevation, -np.inf)))
+            alerts_by_day[i].append({"type": "warning", "message": (
+                f"⛰️ {pairs[j][1][0]} sits at {elevation[j]:,.0f} ft — Thinner air: plan shorter hikes "
+                f"with extra water and rest for {name}"
+            )})
+
+    for day, alerts in zip(itinerary.get("days", []), alerts_by_day):
+        kept = [alert for alert in day.get("alerts") or [] if alert.get("type") != "weather"]
+        day["alerts"] = kept + alerts
+    return itinerary
@@ -0,0 +1,133 @@
+"""Shared pytest fixtures: an in-memory database wired into the FastAPI app"""
+
+from datetime import date, timedelta
+
+import blob_store
+import explore
+import pytest
+from database import get_db
+from fastapi.testclient import TestClient
+from main import app
+from models import Base, Pet, Plan, User
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+
+def make_engine():
+    """Create an empty in-memory database with all tables"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def use_engine(engine):
+    """Point the app's get_db dependency at the given engine"""
+    TestingSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = TestingSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    # Cached explore results belong to the previous database
+    explore.clear_cache()
+
+
+def record_statements(engine):
+    """Return a list that collects every SQL statement executed on the engine"""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    return executed
+
+
+@pytest.fixture(autouse=True)
+def blob_dir(tmp_path, monkeypatch):
+    """Keep blobs written during tests out of the real blob directory"""
+    path = tmp_path / "blobs"
+    monkeypatch.setattr(blob_store, "BLOB_DIR", str(path))
+    return path
+
+
+@pytest.fixture
+def engine():
+    engine = make_engine()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(engine):
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(engine):
+    use_engine(engine)
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def statements(engine):
+    """List that collects every SQL statement executed on the test engine"""
+    return record_statements(engine)
+
+
+@pytest.fixture
+def fresh_app():
+    """
+    Factory that wires a new empty database into the app on every call.
+    Returns (engine, client, session, statements).
+    """
+    created = []
+
+    def factory():
+        engine = make_engine()
+        session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        created.append((engine, session))
+        use_engine(engine)
+        return engine, TestClient(app), session, record_statements(engine)
+
+    yield factory
+    for engine, session in created:
+        session.close()
+        engine.dispose()
+    app.dependency_overrides.clear()
+
+
+def seed_user(db, num_pets=1, num_plans=1, email="owner@example.com"):
+    """Create a user with the given number of pets and past plans, return the user_id"""
+    user = User(email=email, password="secret", name="Owner")
+    db.add(user)
+    db.flush()
+
+    for i in range(num_pets):
+        db.add(Pet(user_id=user.user_id, name=f"Pet {i}", breed="Corgi", size="small"))
+
+    today = date.today()
+    for i in range(num_plans):
+        db.add(Plan(
+            user_id=user.user_id,
+            start_date=today - timedelta(days=i + 10),
+            end_date=today - timedelta(days=i + 5),
+            trip_type="Direct Trip",
+            destination="Boston, Massachusetts",
+            detailed_itinerary='{"days": []}',
+            pet_ids="1",
+        ))
+    db.commit()
+    return user.user_id
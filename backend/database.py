@@ -1,7 +1,7 @@
 import os
 
 from models import Base
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import Session, sessionmaker
 
 # SQLite database URL
@@ -16,9 +16,32 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def add_missing_columns(bind):
+    """Add model columns that older databases lack (SQLite can only ADD COLUMN)"""
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                default = ""
+                if column.server_default is not None:
+                    default = f" DEFAULT {column.server_default.arg.text}"
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}{default}'))
+                print(f"  ✓ Added column {table.name}.{column.name}")
+
+
 def init_db():
-    """Initialize database - create all tables"""
+    """Initialize database - create all tables, then add missing columns and indexes"""
     Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
     print("✓ Database initialized successfully!")
 
 
@@ -0,0 +1,154 @@
+import json
+import os
+import re
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from gazetteer import EARTH_RADIUS_KM, locate_cities, to_unit_vectors
+from itinerary_library import itinerary_total
+from plan_relations import city_mentions
+
+KM_PER_MILE = 1.609344
+# Driving distance over great-circle distance, typical of US highway trips
+ROAD_FACTOR = 1.25
+# Getting out of and into towns is slow; the rest of a leg is highway driving
+URBAN_MILES = 20.0
+URBAN_MPH = 35.0
+HIGHWAY_MPH = 60.0
+
+# Subtitle parts stating a distance or duration, e.g. "95 miles", "~2-3 hours", "45 min drive"
+DRIVE_FACT_RE = re.compile(
+    r"^(about |approx\.? )?~?\s*\d[\d,.\-–]*\s*(miles?|mi|hours?|hrs?|h|minutes?|mins?)\b", re.IGNORECASE
+)
+
+DEFAULT_VEHICLE = "sedan"
+MPG_BY_VEHICLE = {
+    "compact": 33.0,
+    "sedan": 28.0,
+    "hybrid": 45.0,
+    "suv": 22.0,
+    "minivan": 22.0,
+    "pickup": 18.0,
+    "rv": 10.0,
+}
+
+# Regular gasoline, USD per gallon, by state. The FUEL_PRICES environment variable (a JSON
+# object, "default" for states not listed) overrides entries without a code change.
+FUEL_PRICE_BY_STATE = {
+    "Alaska": 3.90, "Arizona": 3.50, "California": 4.80, "Hawaii": 4.60, "Idaho": 3.40,
+    "Illinois": 3.60, "Nevada": 4.00, "New York": 3.40, "Oregon": 4.00, "Pennsylvania": 3.50,
+    "Utah": 3.40, "Washington": 4.20,
+    "Alabama": 2.95, "Arkansas": 2.95, "Georgia": 3.00, "Kansas": 3.00, "Louisiana": 2.90,
+    "Mississippi": 2.85, "Missouri": 3.00, "Oklahoma": 2.85, "South Carolina": 3.00,
+    "Tennessee": 2.95, "Texas": 2.90,
+}
+_price_overrides = json.loads(os.getenv("FUEL_PRICES", "{}"))
+DEFAULT_FUEL_PRICE = _price_overrides.pop("default", 3.30)
+FUEL_PRICE_BY_STATE.update(_price_overrides)
+
+
+def fuel_price(city: str) -> float:
+    """Price per gallon in the state of a canonical "City, State" """
+    return FUEL_PRICE_BY_STATE.get(city.rsplit(", ", 1)[-1], DEFAULT_FUEL_PRICE)
+
+
+def road_miles(starts: Sequence[Tuple[float, float]], ends: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """Estimated driving miles between pairs of (latitude, longitude)"""
+    a = to_unit_vectors([lat for lat, _ in starts], [lng for _, lng in starts])
+    b = to_unit_vectors([lat for lat, _ in ends], [lng for _, lng in ends])
+    chord = np.linalg.norm(a - b, axis=1)
+    great_circle_km = 2 * np.arcsin(np.minimum(chord / 2, 1.0)) * EARTH_RADIUS_KM
+    return great_circle_km * ROAD_FACTOR / KM_PER_MILE
+
+
+def drive_hours(miles: np.ndarray) -> np.ndarray:
+    urban = np.minimum(miles, URBAN_MILES)
+    return urban / URBAN_MPH + (miles - urban) / HIGHWAY_MPH
+
+
+def duration_text(hours: float) -> str:
+    if hours < 0.75:
+        return f"~{max(5, round(hours * 12) * 5)} minutes"
+    rounded = round(hours * 2) / 2
+    return f"~{rounded:g} hour" + ("" if rounded == 1 else "s")
+
+
+def itinerary_legs(itinerary: dict, origin: str, destination: str, is_round_trip: bool = False) -> List[tuple]:
+    """
+    The drives of a road trip as (transport items, start, end) with canonical
+    (name, latitude, longitude) ends. The itinerary is walked in order from the origin:
+    an item naming a known "City, State" moves the trip there, and a transport item
+    drives to the first other city it names, or else to where the trip is next seen.
+    Consecutive transport items without a city of their own share one drive; one still
+    open at the end drives to the destination (back to the origin for round trips).
+    """
+    items = [item for day in itinerary.get("days", []) for item in day.get("items", [])]
+    mentions = [city_mentions(f"{item.get('title') or ''} • {item.get('subtitle') or ''}") for item in items]
+    names = list(dict.fromkeys([origin, destination, *(name for found in mentions for name in found)]))
+    located = dict(zip(names, locate_cities(names)))
+
+    current = located[origin]
+    legs, pending = [], []
+    for item, found in zip(items, mentions):
+        places = [located[name] for name in found if located[name]]
+        if item.get("type") == "transport" and current:
+            target = next((place for place in places if place[0] != current[0]), None)
+            if target is None:
+                pending.append(item)
+                continue
+            legs.append(([*pending, item], current, target))
+            pending, current = [], target
+        elif places:
+            if not current or places[0][0] != current[0]:
+                if pending:
+                    legs.append((pending, current, places[0]))
+                pending = []
+            current = places[0]
+
+    end = located[origin] if is_round_trip else located[destination]
+    if pending and current and end and end[0] != current[0]:
+        legs.append((pending, current, end))
+    return legs
+
+
+def estimate_drives(
+    itinerary: dict,
+    origin: str,
+    destination: str,
+    is_round_trip: bool = False,
+    vehicle: Optional[str] = None,
+) -> dict:
+    """
+    Replace the guessed mileage and drive time of a road trip's transport items with
+    local estimates (great-circle distance times ROAD_FACTOR, drive time from the urban
+    and highway speeds) and add the fuel_cost for the vehicle's MPG at the fuel price of
+    the state each drive starts in. Items sharing a drive split it evenly. The model's
+    estimated_cost also covers tolls and ferries, so it is kept, and only raised to the
+    fuel cost when it is lower. The total is recomputed.
+    """
+    legs = itinerary_legs(itinerary, origin, destination, is_round_trip)
+    if legs:
+        miles = road_miles([start[1:] for _, start, _ in legs], [end[1:] for _, _, end in legs])
+        hours = drive_hours(miles)
+        mpg = MPG_BY_VEHICLE[vehicle or DEFAULT_VEHICLE]
+        prices = np.array([fuel_price(start[0]) for _, start, _ in legs])
+        costs = miles / mpg * prices
+
+        for (items, _, _), leg_miles, leg_hours, leg_cost in zip(legs, miles, hours, costs):
+            share = len(items)
+            for item in items:
+                item_miles, item_hours = leg_miles / share, leg_hours / share
+                parts = [
+                    part for part in (item.get("subtitle") or "").split(" • ")
+                    if part.strip() and not DRIVE_FACT_RE.match(part.strip())
+                ]
+                item["subtitle"] = " • ".join([*parts, f"{round(item_miles):,} miles", duration_text(item_hours)])
+                item["distance_miles"] = round(float(item_miles), 1)
+                item["drive_hours"] = round(float(item_hours), 2)
+                item["fuel_cost"] = round(float(leg_cost / share), 2)
+                model_cost = item.get("estimated_cost")
+                if not isinstance(model_cost, (int, float)) or model_cost < item["fuel_cost"]:
+                    item["estimated_cost"] = item["fuel_cost"]
+
+    itinerary["total_estimated_cost"] = itinerary_total(itinerary)
+    return itinerary
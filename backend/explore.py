@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+from gazetteer import encode_geohash, geohash_bounds, haversine_km
+from pagination import decode_cursor, encode_cursor
+from poi_store import places_near_points
+from sqlalchemy.orm import Session
+
+# Explore screens of the frontend and the POI categories behind them
+EXPLORE_CATEGORIES = {
+    "hotels": ("hotel",),
+    "hospital": ("vet",),
+    "dining": ("restaurant",),
+    "outdoor": ("park", "dog_beach"),
+    "pet-services": ("pet_service",),
+}
+DEFAULT_RADIUS_KM = 10.0
+MAX_RADIUS_KM = 50.0
+# Results are cached per geohash cell: every point of a cell is served from one set of
+# places fetched around the cell (~4.9 km cells, ~1.2 km for small radii) for the
+# smallest radius bucket covering the requested radius.
+RADIUS_BUCKETS_KM = (1.0, 2.0, 5.0, 10.0, 25.0, MAX_RADIUS_KM)
+CACHE_SIZE = 512
+CACHE_TTL = 300.0  # Seconds; POI imports run in another process and show up after this
+
+
+class CellEntry:
+    """Places around one geohash cell as parallel arrays, for vectorized distance sorting"""
+
+    def __init__(self, places: List[dict]):
+        self.places = places
+        self.ids = np.array([place["poi_id"] for place in places], dtype=np.int64)
+        self.lats = np.array([place["latitude"] for place in places], dtype=float)
+        self.lngs = np.array([place["longitude"] for place in places], dtype=float)
+
+
+_cache: "OrderedDict[tuple, Tuple[float, CellEntry]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def cell_precision(radius_km: float) -> int:
+    return 6 if radius_km <= 5 else 5
+
+
+def radius_bucket(radius_km: float) -> float:
+    return next(bucket for bucket in RADIUS_BUCKETS_KM if bucket >= radius_km)
+
+
+def cell_entry(db: Session, categories: Tuple[str, ...], cell: str, radius_km: float) -> CellEntry:
+    """Places within radius_km of any point of the cell, from the cache or the R-tree"""
+    key = (categories, cell, radius_km)
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] > now:
+            _cache.move_to_end(key)
+            return cached[1]
+
+    south, west, north, east = geohash_bounds(cell)
+    center_lat, center_lng = (south + north) / 2, (west + east) / 2
+    half_diagonal = float(haversine_km(center_lat, center_lng, [north], [east])[0])
+    entry = CellEntry(places_near_points(db, [(center_lat, center_lng)], radius_km + half_diagonal, categories))
+
+    with _cache_lock:
+        _cache[key] = (now + CACHE_TTL, entry)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return entry
+
+
+def explore_places(
+    db: Session,
+    category: str,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    One page of places of an explore category within radius_km, nearest first, each with
+    its distance_km. Returns the places and the cursor of the next page (None on the last).
+    """
+    bucket = radius_bucket(radius_km)
+    cell = encode_geohash(latitude, longitude, cell_precision(bucket))
+    entry = cell_entry(db, EXPLORE_CATEGORIES[category], cell, bucket)
+    if not entry.places:
+        return [], None
+
+    distances = haversine_km(latitude, longitude, entry.lats, entry.lngs)
+    # Round so the cursor round-trips through JSON exactly
+    distances = np.round(distances, 6)
+    keep = distances <= radius_km
+    if cursor:
+        after_distance, after_id = decode_cursor(cursor, [float, int])
+        keep &= (distances > after_distance) | ((distances == after_distance) & (entry.ids > after_id))
+
+    indexes = np.flatnonzero(keep)
+    order = indexes[np.lexsort((entry.ids[indexes], distances[indexes]))][: limit + 1]
+    places = [{**entry.places[i], "distance_km": float(distances[i])} for i in order]
+
+    if len(places) > limit:
+        places = places[:limit]
+        return places, encode_cursor([places[-1]["distance_km"], places[-1]["poi_id"]])
+    return places, None
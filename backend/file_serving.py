@@ -0,0 +1,145 @@
+import mmap
+import os
+from typing import Optional, Tuple
+
+import anyio.to_thread
+from starlette.responses import Response
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+CHUNK_SIZE = 256 * 1024
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header matches the (strong) ETag, weak comparison allowed"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+
+def if_match_satisfied(if_match: str, etag: str) -> bool:
+    """True if an If-Match header matches the ETag; strong comparison, weak tags never match"""
+    if if_match.strip() == "*":
+        return True
+    return etag in [tag.strip() for tag in if_match.split(",")]
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `Range: bytes=...` header into an inclusive (start, end).
+    Returns None when the header is absent, malformed or asks for several ranges
+    (the full body is served then). Raises ValueError when the range is unsatisfiable.
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec or "-" not in spec:
+        return None
+
+    start_text, end_text = (part.strip() for part in spec.split("-", 1))
+    if (start_text and not start_text.isdigit()) or (end_text and not end_text.isdigit()):
+        return None
+
+    if not start_text:
+        # Suffix range: the last N bytes
+        if not end_text:
+            return None
+        length = int(end_text)
+        if length == 0 or size == 0:
+            raise ValueError("range not satisfiable")
+        return max(size - length, 0), size - 1
+
+    start = int(start_text)
+    end = int(end_text) if end_text else size - 1
+    if end_text and start > end:
+        return None  # invalid spec, ignored
+    if start >= size:
+        raise ValueError("range not satisfiable")
+    return start, min(end, size - 1)
+
+
+class BlobFileResponse(Response):
+    """
+    Serve an immutable, content-addressed file with Range and conditional GET support.
+
+    The body goes out through the ASGI `http.response.zerocopy` (sendfile) extension when
+    the server offers it, and otherwise as slices of a memory-mapped file, so no per-chunk
+    read() calls or intermediate buffers are needed. Slicing the map faults pages in from
+    disk, so it runs in a worker thread to keep a slow disk from stalling the event loop.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        media_type: str,
+        etag: str,
+        range_header: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+        if_range: Optional[str] = None,
+    ):
+        self.path = path
+        self.size = os.stat(path).st_size
+        self.start, self.end = 0, self.size - 1
+        headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+            "Accept-Ranges": "bytes",
+        }
+
+        if etag_matches(if_none_match, etag):
+            status_code = 304
+            self.start, self.end = 0, -1
+        else:
+            status_code = 200
+            # If-Range with another validator means the client's copy is stale: send everything
+            if range_header and (not if_range or if_range.strip() == etag):
+                try:
+                    byte_range = parse_range(range_header, self.size)
+                except ValueError:
+                    byte_range = None
+                    status_code = 416
+                    self.start, self.end = 0, -1
+                    headers["Content-Range"] = f"bytes */{self.size}"
+                if byte_range:
+                    status_code = 206
+                    self.start, self.end = byte_range
+                    headers["Content-Range"] = f"bytes {self.start}-{self.end}/{self.size}"
+            headers["Content-Length"] = str(self.end - self.start + 1)
+
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+
+    async def __call__(self, scope, receive, send):
+        count = self.end - self.start + 1
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+
+        if count <= 0 or scope.get("method") == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        with open(self.path, "rb") as f:
+            if "http.response.zerocopy" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopy",
+                    "file": f.fileno(),
+                    "offset": self.start,
+                    "count": count,
+                    "more_body": False,
+                })
+                return
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                position = self.start
+                while position <= self.end:
+                    chunk_end = min(position + CHUNK_SIZE, self.end + 1)
+                    body = await anyio.to_thread.run_sync(mapped.__getitem__, slice(position, chunk_end))
+                    await send({
+                        "type": "http.response.body",
+                        "body": body,
+                        "more_body": chunk_end <= self.end,
+                    })
+                    position = chunk_end
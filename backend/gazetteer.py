@@ -0,0 +1,167 @@
+import csv
+import os
+import re
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# US places with 1000+ inhabitants from GeoNames (cities1000, CC BY 4.0, geonames.org)
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "us_cities.csv")
+EARTH_RADIUS_KM = 6371.0088
+# Coordinates farther than this from any known place are left unresolved
+MAX_DISTANCE_KM = 50.0
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Stored precision, ~40 m cells; clusters group on a prefix of it
+GEOHASH_PRECISION = 8
+COUNTRY_SUFFIXES = ("usa", "us", "united states", "united states of america")
+ABBREVIATIONS = {"st": "saint", "ste": "sainte", "mt": "mount", "ft": "fort"}
+ABBREVIATIONS_RE = re.compile(r"\b(st|ste|mt|ft)\b\.?")
+
+
+def normalize_city(name: str) -> str:
+    """
+    Lookup key for a free-form city string: case-folded, whitespace collapsed and any
+    trailing country dropped, so "Boston,  MA, USA" and "boston, ma" share one key.
+    """
+    parts = [" ".join(part.split()).casefold() for part in (name or "").split(",")]
+    parts = [part for part in parts if part]
+    if len(parts) > 1 and parts[-1] in COUNTRY_SUFFIXES:
+        parts.pop()
+    if parts:
+        # "St. Louis" / "Saint Louis", "Mt. Shasta" / "Mount Shasta"
+        parts[0] = ABBREVIATIONS_RE.sub(lambda m: ABBREVIATIONS[m.group(1)], parts[0])
+    return ", ".join(parts)
+
+
+def encode_geohash(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Standard base-32 geohash; a prefix of the hash is the enclosing coarser cell"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        # Bits alternate between longitude and latitude, starting with longitude
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """(south, west, north, east) of a geohash cell"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            interval = lng_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def to_unit_vectors(lats, lngs) -> np.ndarray:
+    """Map degrees to points on the unit sphere, so euclidean nearest == great-circle nearest"""
+    lat = np.radians(np.asarray(lats, dtype=float))
+    lng = np.radians(np.asarray(lngs, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)))
+
+
+def haversine_km(latitude: float, longitude: float, lats, lngs) -> np.ndarray:
+    """Great-circle distances in km from one point to arrays of points"""
+    lat1, lng1 = np.radians(latitude), np.radians(longitude)
+    lat2 = np.radians(np.asarray(lats, dtype=float))
+    lng2 = np.radians(np.asarray(lngs, dtype=float))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class Gazetteer:
+    """In-memory KD-tree over the bundled city list, queried in vectorized batches"""
+
+    def __init__(self, path: str = GAZETTEER_PATH):
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        self.labels = np.array([f"{row['name']}, {row['state']}" for row in rows], dtype=object)
+        self.lats = np.array([float(row["latitude"]) for row in rows])
+        self.lngs = np.array([float(row["longitude"]) for row in rows])
+        self.population = np.array([int(row["population"]) for row in rows])
+        self.tree = cKDTree(to_unit_vectors(self.lats, self.lngs))
+
+        self.states = {normalize_city(row[column]) for row in rows for column in ("state", "state_code")}
+
+        # "city, state" and "city, st" keys; the most populous place wins a shared name
+        self.index = {}
+        for i in np.argsort(self.population, kind="stable"):
+            row = rows[i]
+            for state in (row["state"], row["state_code"]):
+                self.index[normalize_city(f"{row['name']}, {state}")] = i
+        # "New York, NY" for "New York City", unless another place has that name
+        for i, row in enumerate(rows):
+            if row["name"].endswith(" City"):
+                for state in (row["state"], row["state_code"]):
+                    self.index.setdefault(normalize_city(f"{row['name'][:-5]}, {state}"), i)
+
+    def nearest(self, lats: Sequence[float], lngs: Sequence[float], max_distance_km: float = MAX_DISTANCE_KM):
+        """
+        Index of the nearest place for each coordinate pair and the distance to it in km.
+        Index is -1 where nothing lies within max_distance_km.
+        """
+        if len(lats) == 0:
+            return np.empty(0, dtype=int), np.empty(0)
+        # Chord length on the unit sphere that corresponds to the arc distance
+        bound = 2 * np.sin(max_distance_km / EARTH_RADIUS_KM / 2)
+        chord, index = self.tree.query(to_unit_vectors(lats, lngs), distance_upper_bound=bound)
+        found = np.isfinite(chord)
+        distance_km = np.full(len(index), np.inf)
+        distance_km[found] = 2 * np.arcsin(np.minimum(chord[found] / 2, 1.0)) * EARTH_RADIUS_KM
+        return np.where(found, index, -1), distance_km
+
+    def reverse_geocode(
+        self, lats: Sequence[float], lngs: Sequence[float], max_distance_km: float = MAX_DISTANCE_KM
+    ) -> List[Optional[str]]:
+        """Canonical "City, State" for each coordinate pair, None where nothing is close enough"""
+        index, _ = self.nearest(lats, lngs, max_distance_km)
+        return [self.labels[i] if i >= 0 else None for i in index]
+
+    def locate(self, names: Sequence[str]) -> List[Optional[Tuple[str, float, float]]]:
+        """(canonical "City, State", lat, lng) for each city string, None if it is not known"""
+        result = []
+        for name in names:
+            i = self.index.get(normalize_city(name))
+            result.append(None if i is None else (self.labels[i], float(self.lats[i]), float(self.lngs[i])))
+        return result
+
+
+@lru_cache(maxsize=1)
+def get_gazetteer() -> Gazetteer:
+    """The shared gazetteer, loaded on first use (one per process)"""
+    return Gazetteer()
+
+
+def reverse_geocode(lats: Sequence[float], lngs: Sequence[float]) -> List[Optional[str]]:
+    return get_gazetteer().reverse_geocode(lats, lngs)
+
+
+def locate_cities(names: Sequence[str]) -> List[Optional[Tuple[str, float, float]]]:
+    return get_gazetteer().locate(names)
+
+
+def is_state(text: str) -> bool:
+    """True for a US state name or postal code ("Massachusetts", "MA")"""
+    return normalize_city(text) in get_gazetteer().states
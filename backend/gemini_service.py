@@ -5,6 +5,7 @@ import os
 
 import requests
 from dotenv import load_dotenv
+from poi_store import candidates_prompt, expand_poi_references
 
 # Load .env from project root - handle both running from root and from backend/
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -85,6 +86,30 @@ def analyze_pet_image(image_bytes: bytes, mime_type: str = "image/jpeg"):
         return {"error": f"Gemini request failed: {str(e)}"}
 
 
+def pets_prompt(pet_info: dict) -> str:
+    """
+    TRAVELING PARTY lines for the pet, or for each of several pets (main.pets_profile) with
+    the rule that every item must suit all of them
+    """
+    lines = []
+    for pet in pet_info.get("pets") or [pet_info]:
+        personality_str = ", ".join(pet.get("personality") or []) or "friendly"
+        lines.append(
+            f"- Pet: {pet.get('name', 'your pet')}, a {pet.get('age', 'unknown age')} "
+            f"{pet.get('breed', 'unknown breed')} ({pet.get('size', 'medium')} size, {personality_str})"
+        )
+        if pet.get("health"):
+            lines.append(f"- Health considerations: {pet['health']}")
+    if pet_info.get("pets"):
+        lines.append(
+            f"- These pets travel together: every item MUST suit ALL of them. Apply the most restrictive "
+            f"constraints: {pet_info.get('size', 'medium')} size for transport, cabin and lodging limits, "
+            f"and every health consideration above. When a rule or restriction affects only some of the "
+            f"pets, name them in \"complianceNote\" (e.g. \"Waffles is over the in-cabin weight limit\")."
+        )
+    return "\n".join(lines)
+
+
 def generate_travel_itinerary(
     origin: str,
     destination: str,
@@ -94,12 +119,14 @@ def generate_travel_itinerary(
     num_adults: int = 2,
     num_children: int = 0,
     budget: float = None,
+    candidates: list = None,
 ):
     """
     Generate a detailed, pet-friendly travel itinerary using Gemini AI.
     
     Note: We avoid asking for specific flight details due to Gemini's limitations
     with real-time data. Instead, we request general airline information and time windows.
+    `candidates` are local places (poi_store.itinerary_candidates) the model may pick by id.
     """
     if not API_KEY:
         return {"error": "Missing GEMINI_API_KEY in environment."}
@@ -107,12 +134,6 @@ def generate_travel_itinerary(
     # Build pet description
     pet_name = pet_info.get("name", "your pet")
     pet_breed = pet_info.get("breed", "unknown breed")
-    pet_size = pet_info.get("size", "medium")
-    pet_age = pet_info.get("age", "unknown age")
-    pet_personality = pet_info.get("personality", [])
-    pet_health = pet_info.get("health", "")
-    
-    personality_str = ", ".join(pet_personality) if pet_personality else "friendly"
     
     budget_instruction = ""
     if budget:
@@ -131,8 +152,7 @@ BUDGET CONSTRAINT:
 TRAVELING PARTY:
 - {num_adults} adult(s)
 - {num_children} child(ren)
-- Pet: {pet_name}, a {pet_age} {pet_breed} ({pet_size} size, {personality_str})
-{f"- Health considerations: {pet_health}" if pet_health else ""}
+{pets_prompt(pet_info)}
 
 CRITICAL INSTRUCTIONS:
 1. **DO NOT provide specific flight numbers, departure times, or airline booking details.** Instead, suggest which airlines generally allow pets in-cabin or cargo for this route, and what time windows (morning/afternoon/evening) are typically available.
@@ -141,10 +161,10 @@ CRITICAL INSTRUCTIONS:
 4. For small pets (<20 lbs), prioritize in-cabin airline travel. For larger pets, mention cargo requirements and alternatives.
 5. Include specific pet amenities (water bowls, pet beds, outdoor spaces, etc.)
 6. Suggest pet-friendly activities appropriate for the pet's energy level and size.
-7. Include alerts for weather conditions that might affect the pet.
-8. **LOCATION FORMAT REQUIREMENT: ALL city names in "subtitle" fields MUST use the format "City, State" (e.g., "Boston, Massachusetts", "Los Angeles, California"). This is critical for map functionality.**
+7. **LOCATION FORMAT REQUIREMENT: ALL city names in "subtitle" fields MUST use the format "City, State" (e.g., "Boston, Massachusetts", "Los Angeles, California"). This is critical for map functionality.**
 {budget_instruction}
-9. **IMPORTANT: Include realistic estimated costs for each item.** Add an "estimated_cost" field to every item with a dollar amount.
+{candidates_prompt(candidates)}
+8. **IMPORTANT: Include realistic estimated costs for each item.** Add an "estimated_cost" field to every item with a dollar amount.
 
 Return a JSON object with this EXACT structure:
 {{
@@ -152,12 +172,6 @@ Return a JSON object with this EXACT structure:
     {{
       "date": "Sat, Feb 15",
       "dayLabel": "Travel Day",
-      "alerts": [
-        {{
-          "type": "weather",
-          "message": "🌡️ High of 85°F — Pack extra water for {pet_name}!"
-        }}
-      ],
       "items": [
         {{
           "id": "1",
@@ -243,6 +257,8 @@ Make sure all recommendations are realistic for {destination} and appropriate fo
         if start != -1 and end != -1:
             try:
                 result = json.loads(text[start : end + 1])
+                if candidates:
+                    result = expand_poi_references(result, candidates)
                 
                 # Calculate total estimated cost
                 total_cost = 0
@@ -274,10 +290,12 @@ def generate_road_trip_itinerary(
     num_children: int = 0,
     is_round_trip: bool = False,
     budget: float = None,
+    candidates: list = None,
 ):
     """
     Generate a detailed, pet-friendly road trip itinerary using Gemini AI.
     Focuses on scenic routes, rest stops, pet-friendly accommodations, and activities along the way.
+    `candidates` are local places (poi_store.itinerary_candidates) the model may pick by id.
     """
     if not API_KEY:
         return {"error": "Missing GEMINI_API_KEY in environment."}
@@ -285,12 +303,6 @@ def generate_road_trip_itinerary(
     # Build pet description
     pet_name = pet_info.get("name", "your pet")
     pet_breed = pet_info.get("breed", "unknown breed")
-    pet_size = pet_info.get("size", "medium")
-    pet_age = pet_info.get("age", "unknown age")
-    pet_personality = pet_info.get("personality", [])
-    pet_health = pet_info.get("health", "")
-    
-    personality_str = ", ".join(pet_personality) if pet_personality else "friendly"
     
     trip_type_note = "round trip" if is_round_trip else "one-way"
     round_trip_instruction = ""
@@ -319,8 +331,7 @@ BUDGET CONSTRAINT:
 TRAVELING PARTY:
 - {num_adults} adult(s)
 - {num_children} child(ren)
-- Pet: {pet_name}, a {pet_age} {pet_breed} ({pet_size} size, {personality_str})
-{f"- Health considerations: {pet_health}" if pet_health else ""}
+{pets_prompt(pet_info)}
 
 CRITICAL INSTRUCTIONS FOR ROAD TRIPS:
 1. **FOCUS ON THE JOURNEY, NOT JUST THE DESTINATION** - This is a road trip, so emphasize scenic routes, interesting waypoints, and experiences along the way.
@@ -330,12 +341,12 @@ CRITICAL INSTRUCTIONS FOR ROAD TRIPS:
 5. **Pet-friendly accommodations** - Hotels/motels that welcome pets, with outdoor spaces. Mention pet fees if typical for the area.
 6. **Roadside attractions** - Pet-friendly attractions, hiking trails, dog parks, beaches, or outdoor cafes along the route.
 7. **Pack list reminders** - Occasionally remind about essentials: water bowls, leash, waste bags, pet first aid kit, comfort items.
-8. **Weather and safety** - Alert about temperature concerns (hot car warnings), road conditions, or elevation changes that might affect pets.
-9. **Meal and water breaks** - Regular stops for {pet_name} to eat, drink, and rest.
-10. **LOCATION FORMAT REQUIREMENT: ALL city names in "subtitle" and "dayLabel" fields MUST use the format "City, State" (e.g., "Boston, Massachusetts", "Chicago, Illinois"). This is CRITICAL for map functionality. When mentioning cities along the route, always include the state.**
+8. **Meal and water breaks** - Regular stops for {pet_name} to eat, drink, and rest.
+9. **LOCATION FORMAT REQUIREMENT: ALL city names in "subtitle" and "dayLabel" fields MUST use the format "City, State" (e.g., "Boston, Massachusetts", "Chicago, Illinois"). This is CRITICAL for map functionality. When mentioning cities along the route, always include the state.**
 {round_trip_instruction}
 {budget_instruction}
-11. **IMPORTANT: Include realistic estimated costs for each item.** Add an "estimated_cost" field to every item (gas, tolls, hotels, meals, activities).
+{candidates_prompt(candidates)}
+10. **IMPORTANT: Include realistic estimated costs for each item.** Add an "estimated_cost" field to every item (gas, tolls, hotels, meals, activities).
 
 Return a JSON object with this EXACT structure:
 {{
@@ -343,12 +354,6 @@ Return a JSON object with this EXACT structure:
     {{
       "date": "Sat, Feb 15",
       "dayLabel": "Day 1: {origin} → City/Waypoint",
-      "alerts": [
-        {{
-          "type": "weather",
-          "message": "🌡️ High of 85°F — Keep {pet_name} hydrated! Bring extra water."
-        }}
-      ],
       "items": [
         {{
           "id": "1",
@@ -461,6 +466,8 @@ Return ONLY valid JSON."""
         if start != -1 and end != -1:
             try:
                 result = json.loads(text[start : end + 1])
+                if candidates:
+                    result = expand_poi_references(result, candidates)
                 
                 # Calculate total estimated cost
                 total_cost = 0
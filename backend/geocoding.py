@@ -0,0 +1,110 @@
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+import requests
+from gazetteer import locate_cities, normalize_city
+from models import GeoCity
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY", "")
+GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+# Upstream calls are slow and billed: cap them per request, and retry failures only after a while
+MAX_UPSTREAM_LOOKUPS = 10
+UNRESOLVED_RETRY = timedelta(days=7)
+
+GAZETTEER = "gazetteer"
+GOOGLE = "google"
+PENDING = "pending"
+UNRESOLVED = "unresolved"
+
+
+def geocode_upstream(query: str) -> Optional[Tuple[str, float, float]]:
+    """
+    Resolve a city string with the Google Geocoding API to (canonical "City, State", lat, lng).
+    Returns None when nothing matched; raises on network or API errors.
+    """
+    response = requests.get(
+        GEOCODE_URL,
+        params={"address": query, "components": "country:US", "key": GOOGLE_MAPS_API_KEY},
+        timeout=5,
+    )
+    data = response.json()
+    if data.get("status") == "ZERO_RESULTS":
+        return None
+    if data.get("status") != "OK":
+        raise RuntimeError(f"Geocoding API status {data.get('status')}")
+
+    for result in data.get("results", []):
+        city = state = None
+        for component in result.get("address_components", []):
+            if "locality" in component.get("types", []):
+                city = component.get("long_name")
+            if "administrative_area_level_1" in component.get("types", []):
+                state = component.get("long_name")
+        location = result.get("geometry", {}).get("location", {})
+        if city and state and "lat" in location:
+            return f"{city}, {state}", location["lat"], location["lng"]
+    return None
+
+
+def resolve_cities(db: Session, names: Iterable[str], upstream: bool = True) -> Dict[str, Optional[GeoCity]]:
+    """
+    Look up city strings in the geo_city table, filling misses from the offline gazetteer
+    and then (when `upstream` is set, at most MAX_UPSTREAM_LOOKUPS per call) from the
+    Geocoding API. New rows are added to the session; the caller commits.
+    Returns {raw name: GeoCity, or None when the string is blank}.
+    """
+    keys = {name: normalize_city(name) for name in names}
+    wanted = {key for key in keys.values() if key}
+    if not wanted:
+        return {name: None for name in keys}
+
+    cities = {city.key: city for city in db.query(GeoCity).filter(GeoCity.key.in_(wanted))}
+    new_rows = {}
+
+    # Offline gazetteer for strings never seen before
+    missing = sorted(wanted - cities.keys())
+    for key, location in zip(missing, locate_cities(missing)):
+        if location:
+            name, latitude, longitude = location
+            new_rows[key] = GeoCity(key=key, name=name, latitude=latitude, longitude=longitude, source=GAZETTEER)
+        else:
+            new_rows[key] = GeoCity(key=key, source=PENDING)
+
+    if upstream and GOOGLE_MAPS_API_KEY:
+        retry_before = datetime.utcnow() - UNRESOLVED_RETRY
+        lookups = [
+            city for city in list(cities.values()) + list(new_rows.values())
+            if city.source == PENDING or (city.source == UNRESOLVED and city.updated_at < retry_before)
+        ][:MAX_UPSTREAM_LOOKUPS]
+        raw_names = {key: name for name, key in keys.items()}
+        for city in lookups:
+            try:
+                location = geocode_upstream(raw_names[city.key])
+            except Exception as e:
+                print(f"Geocoding failed for '{raw_names[city.key]}': {e}")
+                continue  # stays pending, tried again next time
+            if location:
+                city.name, city.latitude, city.longitude = location
+                city.source = GOOGLE
+            else:
+                city.source = UNRESOLVED
+            city.updated_at = datetime.utcnow()
+
+    if new_rows:
+        # Another request may have inserted the same key meanwhile; keep whichever came first
+        db.execute(
+            insert(GeoCity).on_conflict_do_nothing(index_elements=[GeoCity.key]),
+            [
+                {
+                    "key": city.key, "name": city.name, "latitude": city.latitude,
+                    "longitude": city.longitude, "source": city.source, "updated_at": datetime.utcnow(),
+                }
+                for city in new_rows.values()
+            ],
+        )
+        cities.update(new_rows)
+
+    return {name: cities.get(key) for name, key in keys.items()}
@@ -0,0 +1,106 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Iterable, List, Tuple
+
+from geocoding import resolve_cities
+from sqlalchemy.orm import sessionmaker
+
+# Single-row inserts arriving within this many milliseconds of each other are written in
+# one transaction (one fsync and one writer lock under SQLite); 0 disables batching
+PHOTO_GROUP_COMMIT_MS = float(os.getenv("PHOTO_GROUP_COMMIT_MS", "0"))
+GROUP_COMMIT_MAX_BATCH = 200
+
+_committers = {}
+_committers_lock = threading.Lock()
+
+
+class GroupCommitter:
+    """
+    Background writer coalescing rows submitted by concurrent requests into shared
+    transactions. submit() hands over a transient ORM object and returns a Future that
+    resolves to it once committed (detached, with its generated id loaded).
+    """
+
+    def __init__(self, bind, window_ms: float = PHOTO_GROUP_COMMIT_MS, max_batch: int = GROUP_COMMIT_MAX_BATCH):
+        self.session_factory = sessionmaker(bind=bind, autoflush=False, expire_on_commit=False)
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.batches = 0  # Transactions committed, for monitoring and tests
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="group-commit", daemon=True)
+        self.thread.start()
+
+    def submit(self, row, cities: Iterable[str] = ()) -> Future:
+        """Queue a row, and the city strings to record in geo_city with it"""
+        future = Future()
+        self.queue.put((row, list(cities), future))
+        return future
+
+    def run(self):
+        while True:
+            first = self.queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.window
+            stopping = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self.write(batch)
+            if stopping:
+                return
+
+    def commit(self, batch: List[Tuple]):
+        with self.session_factory() as db:
+            cities = list(dict.fromkeys(city for _, names, _ in batch for city in names))
+            if cities:
+                resolve_cities(db, cities, upstream=False)
+            db.add_all(row for row, _, _ in batch)
+            db.commit()
+            self.batches += 1
+
+    def write(self, batch: List[Tuple]):
+        """Commit the batch together; if that fails, each row alone so one bad row fails only itself"""
+        try:
+            self.commit(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][2].set_exception(e)
+                return
+            for item in batch:
+                self.write([item])
+            return
+        for row, _, future in batch:
+            future.set_result(row)
+
+    def close(self):
+        """Write what is queued and stop the writer thread"""
+        self.queue.put(None)
+        self.thread.join()
+
+
+def group_committer(bind) -> GroupCommitter:
+    """The shared committer for a database engine, started on first use"""
+    with _committers_lock:
+        if bind not in _committers:
+            _committers[bind] = GroupCommitter(bind)
+        return _committers[bind]
+
+
+def shutdown():
+    """Flush and stop every committer"""
+    with _committers_lock:
+        committers = list(_committers.values())
+        _committers.clear()
+    for committer in committers:
+        committer.close()
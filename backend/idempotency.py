@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+from fastapi import Header, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from models import IdempotencyRecord
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+# How long a key's response is replayed; a key can be reused for a new request afterwards
+IDEMPOTENCY_TTL = timedelta(hours=float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24")))
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(body: bytes) -> str:
+    """SHA-256 of the request body, with JSON bodies in canonical form (key order, spacing)"""
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode()
+    except ValueError:
+        pass
+    return hashlib.sha256(body).hexdigest()
+
+
+class IdempotentRequest:
+    """
+    A create request that may carry an Idempotency-Key. The stored response is written
+    in the same transaction as the rows it describes, so a retry either finds both or
+    neither. Concurrent duplicates serialize on the record's primary key: the loser's
+    commit fails and it replays the winner's response instead.
+    """
+
+    def __init__(self, key: Optional[str], scope: str, fingerprint: Optional[str]):
+        self.key = key
+        self.scope = scope
+        self.fingerprint = fingerprint
+
+    def replay(self, db: Session) -> Optional[JSONResponse]:
+        """The stored response for this key, or None when the request has to run"""
+        if self.key is None:
+            return None
+        record = db.query(IdempotencyRecord).filter(
+            IdempotencyRecord.scope == self.scope,
+            IdempotencyRecord.idempotency_key == self.key,
+            IdempotencyRecord.expires_at > datetime.utcnow(),
+        ).first()
+        if not record:
+            return None
+        if record.fingerprint != self.fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        return JSONResponse(
+            status_code=record.status_code,
+            content=json.loads(record.response_body),
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    def commit(self, db: Session, status_code: int, build_response: Callable[[], Any]) -> Optional[JSONResponse]:
+        """
+        Commit the session, storing build_response() (called after a flush) under the key.
+        Returns the winner's response when a concurrent duplicate committed first.
+        """
+        if self.key is None:
+            db.commit()
+            return None
+        now = datetime.utcnow()
+        try:
+            db.flush()
+            db.query(IdempotencyRecord).filter(IdempotencyRecord.expires_at <= now).delete(synchronize_session=False)
+            db.add(IdempotencyRecord(
+                scope=self.scope,
+                idempotency_key=self.key,
+                fingerprint=self.fingerprint,
+                status_code=status_code,
+                response_body=json.dumps(jsonable_encoder(build_response())),
+                created_at=now,
+                expires_at=now + IDEMPOTENCY_TTL,
+            ))
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            replayed = self.replay(db)
+            if replayed is None:
+                raise
+            return replayed
+        return None
+
+
+async def idempotent_request(request: Request, idempotency_key: Optional[str] = Header(None)) -> IdempotentRequest:
+    """Dependency reading the Idempotency-Key header and fingerprinting the body it applies to"""
+    scope = f"{request.method} {request.url.path}"
+    if idempotency_key is None:
+        return IdempotentRequest(None, scope, None)
+    if not 0 < len(idempotency_key) <= MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+    return IdempotentRequest(idempotency_key, scope, request_fingerprint(await request.body()))
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Import pet-friendly places into the poi table from CSV or GeoJSON. Records are
+upserted by id, so re-importing an updated export is safe.
+
+CSV columns (GeoJSON: Point features with the same properties):
+    id, category, name, latitude, longitude[, address, city, pet_policy, pet_notes,
+    open_24h, rating, phone, website, ...any other column is kept as an attribute]
+
+category is one of hotel, restaurant, vet, pet_service, park, dog_beach;
+pet_policy one of approved, conditional, notAllowed.
+
+    python import_pois.py places.csv [more.geojson ...]
+"""
+
+import argparse
+import time
+
+from database import SessionLocal, init_db
+from poi_store import import_pois, read_csv, read_geojson
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help=".csv, .geojson or .json files")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    print("🚀 Importing pet-friendly places")
+    print("=" * 60)
+    init_db()
+    db = SessionLocal()
+    try:
+        for path in args.paths:
+            started = time.perf_counter()
+            records = read_csv(path) if path.lower().endswith(".csv") else read_geojson(path)
+            imported, skipped = import_pois(db, records, batch_size=args.batch_size)
+            print(f"✓ {path}: {imported} places imported, {skipped} skipped ({time.perf_counter() - started:.1f}s)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import copy
+import math
+import os
+import re
+import zlib
+from datetime import date, timedelta
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from gazetteer import normalize_city
+from models import GeneratedItinerary
+from sqlalchemy.orm import Session
+
+# Reused itineraries must match kind, destination, trip length, round trip or not, pet size
+# and health constraints exactly; everything else (origin, party, budget, breed, age,
+# personality) is compared as hashed feature vectors.
+FEATURE_DIM = 1024
+SIMILARITY_THRESHOLD = 0.85
+MAX_CANDIDATES = 500  # Newest stored itineraries compared per request
+# Also generate a fresh itinerary after serving a reused one, so the library converges
+# on exact matches. Off by default: it spends the Gemini call that reuse saved.
+REFINE_IN_BACKGROUND = os.getenv("ITINERARY_REFINE_IN_BACKGROUND", "") == "1"
+
+TRIP = "trip"
+ROAD_TRIP = "road_trip"
+# Costs of these item types grow with the party; accommodation is priced per room
+PER_PERSON_TYPES = {"transport", "dining", "activity"}
+WORD_RE = re.compile(r"[a-z0-9]+")
+# GeneratedItinerary.pet_name holds the names of several pets joined with this
+PET_NAME_SEPARATOR = ", "
+# Words of a health note that limit what a pet can do, by the constraint they signal
+HEALTH_CONSTRAINTS = {
+    "mobility": {"dysplasia", "arthritis", "arthritic", "ivdd", "paralysis", "paralyzed", "amputee", "tripod",
+                 "luxating", "cruciate", "acl", "surgery", "limp", "limping", "mobility"},
+    "heart": {"heart", "murmur", "cardiac", "cardiomyopathy"},
+    "respiratory": {"brachycephalic", "breathing", "respiratory", "asthma", "trachea", "tracheal"},
+    "seizures": {"seizure", "seizures", "epilepsy", "epileptic"},
+    "chronic": {"diabetes", "diabetic", "insulin", "kidney", "renal", "liver", "cancer", "chemotherapy"},
+    "senses": {"blind", "deaf"},
+}
+
+
+def trip_dates(params: dict) -> Optional[Tuple[date, date]]:
+    """(start, end) of generation parameters, or None when they are not ISO dates"""
+    try:
+        start_date, end_date = date.fromisoformat(params["start_date"]), date.fromisoformat(params["end_date"])
+    except (TypeError, ValueError):
+        return None
+    return (start_date, end_date) if start_date <= end_date else None
+
+
+def age_bucket(age: Optional[str]) -> str:
+    """Coarse pet age from calculate_pet_age() output"""
+    years = re.match(r"(\d+) year", age or "")
+    if years:
+        return "senior" if int(years.group(1)) >= 8 else "adult"
+    if "month" in (age or "") or "puppy" in (age or ""):
+        return "young"
+    return "unknown"
+
+
+def join_names(names: List[str]) -> str:
+    """Names as prose: "Biscuit", "Biscuit and Waffles", "Biscuit, Waffles and Tank" """
+    return names[0] if len(names) == 1 else f"{', '.join(names[:-1])} and {names[-1]}"
+
+
+def pet_names(params: dict) -> List[str]:
+    """Names of the pets of generation parameters (pet_info, or its "pets" for several)"""
+    pet_info = params["pet_info"]
+    return [pet.get("name") for pet in pet_info.get("pets") or [pet_info] if pet.get("name")]
+
+
+def stored_pet_names(source: GeneratedItinerary) -> List[str]:
+    return source.pet_name.split(PET_NAME_SEPARATOR) if source.pet_name else []
+
+
+def health_constraints(health: Optional[str]) -> str:
+    """Sorted, comma-joined HEALTH_CONSTRAINTS flags of a free-text health note, "" for none"""
+    words = set(WORD_RE.findall((health or "").lower()))
+    return ",".join(sorted(flag for flag, keywords in HEALTH_CONSTRAINTS.items() if words & keywords))
+
+
+def match_keys(kind: str, params: dict) -> dict:
+    """GeneratedItinerary columns a stored itinerary must equal to be reused for these parameters"""
+    start_date, end_date = trip_dates(params)
+    pet_info = params["pet_info"]
+    return {
+        "kind": kind,
+        "destination_key": normalize_city(params["destination"]),
+        "num_days": (end_date - start_date).days + 1,
+        "is_round_trip": int(bool(params.get("is_round_trip"))),
+        "pet_size": (pet_info.get("size") or "").lower(),
+        "health_constraints": health_constraints(pet_info.get("health")),
+    }
+
+
+def request_features(params: dict) -> List[Tuple[str, float]]:
+    """Weighted features of generation parameters; origin and pet size weigh most"""
+    pet_info = params["pet_info"]
+    origin_key = normalize_city(params["origin"])
+    budget = params.get("budget")
+    features = [
+        (f"origin:{origin_key}", 2.0),
+        (f"origin_state:{origin_key.rpartition(',')[2].strip()}", 1.0),
+        (f"round_trip:{bool(params.get('is_round_trip'))}", 1.0),
+        (f"adults:{params['num_adults']}", 1.0),
+        (f"children:{params['num_children']}", 1.0),
+        # Budgets within a factor of ~1.4 share a bucket
+        (f"budget:{round(math.log2(budget) * 2) if budget else None}", 1.0),
+        (f"size:{(pet_info.get('size') or '').lower()}", 2.0),
+        (f"age:{age_bucket(pet_info.get('age'))}", 1.0),
+    ]
+    features += [(f"breed:{word}", 1.0) for word in WORD_RE.findall((pet_info.get("breed") or "").lower())]
+    features += [(f"health:{word}", 0.5) for word in WORD_RE.findall((pet_info.get("health") or "").lower())]
+    features += [
+        (f"trait:{trait.lower()}", 0.5) for trait in pet_info.get("personality") or [] if isinstance(trait, str)
+    ]
+    return features
+
+
+def vectorize(features: List[Tuple[str, float]]) -> np.ndarray:
+    """Signed feature hashing into a unit-length float32 vector"""
+    vector = np.zeros(FEATURE_DIM, dtype=np.float32)
+    for feature, weight in features:
+        digest = zlib.crc32(feature.encode())
+        vector[digest % FEATURE_DIM] += weight if digest & 0x80000000 else -weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def find_similar(
+    db: Session, kind: str, params: dict, vector: np.ndarray
+) -> Optional[Tuple[GeneratedItinerary, float]]:
+    """The stored itinerary most similar to `vector`, with its cosine similarity, if above the threshold"""
+    candidates = (
+        db.query(GeneratedItinerary)
+        .filter_by(**match_keys(kind, params))
+        .order_by(GeneratedItinerary.itinerary_id.desc())
+        .limit(MAX_CANDIDATES)
+        .all()
+    )
+    if not candidates:
+        return None
+
+    matrix = np.frombuffer(b"".join(candidate.features for candidate in candidates), dtype=np.float32)
+    similarities = matrix.reshape(len(candidates), FEATURE_DIM) @ vector
+    # Pet names are swapped one for one, so only itineraries for as many pets qualify
+    num_pets = len(pet_names(params))
+    similarities[np.array([len(stored_pet_names(candidate)) != num_pets for candidate in candidates])] = -1.0
+    best = int(np.argmax(similarities))
+    if similarities[best] < SIMILARITY_THRESHOLD:
+        return None
+    return candidates[best], float(similarities[best])
+
+
+def replace_in_strings(value, pattern: re.Pattern, replacement):
+    if isinstance(value, str):
+        return pattern.sub(replacement, value)
+    if isinstance(value, list):
+        return [replace_in_strings(item, pattern, replacement) for item in value]
+    if isinstance(value, dict):
+        return {key: replace_in_strings(item, pattern, replacement) for key, item in value.items()}
+    return value
+
+
+def adapt_itinerary(source: GeneratedItinerary, params: dict) -> dict:
+    """
+    A stored itinerary rewritten for new generation parameters: day dates moved to the
+    new start date, the pets' names swapped in order and per-person costs scaled to the
+    party size. Prices are not invented to fit the budget; budget_fitter does that with
+    real cheaper options.
+    """
+    itinerary = copy.deepcopy(source.itinerary)
+    renames = {old: new for old, new in zip(stored_pet_names(source), pet_names(params)) if old != new}
+    if renames:
+        # One pass, so names trading places ("Biscuit and Waffles" for "Waffles and Biscuit") are not mixed up
+        pattern = re.compile(r"\b(" + "|".join(map(re.escape, sorted(renames, key=len, reverse=True))) + r")\b")
+        itinerary = replace_in_strings(itinerary, pattern, lambda match: renames[match.group(1)])
+
+    start_date, _ = trip_dates(params)
+    party_scale = (
+        max(params["num_adults"] + params["num_children"], 1) / max(source.num_adults + source.num_children, 1)
+    )
+    for i, day in enumerate(itinerary.get("days", [])):
+        day_date = start_date + timedelta(days=i)
+        day["date"] = f"{day_date:%a, %b} {day_date.day}"
+        for item in day.get("items", []):
+            if isinstance(item.get("estimated_cost"), (int, float)) and item.get("type") in PER_PERSON_TYPES:
+                item["estimated_cost"] = round(item["estimated_cost"] * party_scale, 2)
+
+    itinerary["total_estimated_cost"] = itinerary_total(itinerary)
+    budget = params.get("budget")
+    itinerary.pop("budget", None)
+    if budget:
+        itinerary["budget"] = budget
+    return itinerary
+
+
+def itinerary_total(itinerary: dict) -> float:
+    """Sum of the items' estimated costs, the itinerary's total_estimated_cost"""
+    return round(sum(
+        item["estimated_cost"]
+        for day in itinerary.get("days", []) for item in day.get("items", [])
+        if isinstance(item.get("estimated_cost"), (int, float))
+    ), 2)
+
+
+def remember_itinerary(db: Session, kind: str, params: dict, vector: np.ndarray, itinerary: dict):
+    """Store a freshly generated itinerary for reuse; the caller commits"""
+    start_date, _ = trip_dates(params)
+    db.add(GeneratedItinerary(
+        **match_keys(kind, params),
+        start_date=start_date,
+        num_adults=params["num_adults"],
+        num_children=params["num_children"],
+        budget=params.get("budget"),
+        pet_name=PET_NAME_SEPARATOR.join(pet_names(params)) or None,
+        features=vector.tobytes(),
+        itinerary=itinerary,
+    ))
+
+
+def refine_itinerary(bind, kind: str, generate: Callable[..., dict], params: dict, vector: np.ndarray):
+    """Background task: generate a fresh itinerary for parameters that were answered by reuse"""
+    result = generate(**params)
+    if "error" in result:
+        print(f"Background itinerary refinement failed: {result['error']}")
+        return
+    with Session(bind=bind) as db:
+        remember_itinerary(db, kind, params, vector, result)
+        db.commit()
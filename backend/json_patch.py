@@ -0,0 +1,138 @@
+import copy
+from typing import Any, List, Tuple
+
+# RFC 6902 JSON Patch, for small edits to a saved itinerary without resending all of it
+
+
+class JsonPatchError(ValueError):
+    """Raised for a malformed patch or an operation that cannot be applied"""
+
+
+class JsonPatchTestFailed(JsonPatchError):
+    """Raised when a "test" operation does not match the document"""
+
+
+def parse_pointer(pointer: str) -> List[str]:
+    """Reference tokens of an RFC 6901 JSON Pointer ("" is the whole document)"""
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith("/")):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer.split("/")[1:]]
+
+
+def array_index(container: list, token: str, path: str, appending: bool = False) -> int:
+    """Index a token refers to; "-" (and len) are only valid where a value is added"""
+    if appending and token == "-":
+        return len(container)
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise JsonPatchError(f"Invalid array index in {path}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not appending):
+        raise JsonPatchError(f"Array index out of range in {path}")
+    return index
+
+
+def resolve(document: Any, path: str) -> Tuple[Any, str]:
+    """The container holding the target of `path` and the last token; raises for missing parents"""
+    tokens = parse_pointer(path)
+    if not tokens:
+        raise JsonPatchError("The whole document cannot be the target here")
+    parent = document
+    for token in tokens[:-1]:
+        if isinstance(parent, dict) and token in parent:
+            parent = parent[token]
+        elif isinstance(parent, list):
+            parent = parent[array_index(parent, token, path)]
+        else:
+            raise JsonPatchError(f"Path not found: {path}")
+    if not isinstance(parent, (dict, list)):
+        raise JsonPatchError(f"Path not found: {path}")
+    return parent, tokens[-1]
+
+
+def get_value(document: Any, path: str) -> Any:
+    if path == "":
+        return document
+    parent, token = resolve(document, path)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"Path not found: {path}")
+        return parent[token]
+    return parent[array_index(parent, token, path)]
+
+
+def add_value(document: Any, path: str, value: Any) -> Any:
+    if path == "":
+        return value
+    parent, token = resolve(document, path)
+    if isinstance(parent, dict):
+        parent[token] = value
+    else:
+        parent.insert(array_index(parent, token, path, appending=True), value)
+    return document
+
+
+def remove_value(document: Any, path: str) -> Any:
+    parent, token = resolve(document, path)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"Path not found: {path}")
+        return parent.pop(token)
+    return parent.pop(array_index(parent, token, path))
+
+
+def json_equal(a: Any, b: Any) -> bool:
+    """RFC 6902 equality: no bool/number mixing, object member order ignored"""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return isinstance(a, bool) and isinstance(b, bool) and a == b
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(json_equal(a[key], b[key]) for key in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(json_equal(x, y) for x, y in zip(a, b))
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return a == b
+    return type(a) is type(b) and a == b
+
+
+def apply_patch(document: Any, operations: List[dict]) -> Any:
+    """
+    Apply RFC 6902 operations (add, remove, replace, move, copy, test) to a copy of
+    `document` and return it. The patch is atomic: the first failing operation raises
+    JsonPatchError (JsonPatchTestFailed for a "test") and `document` is left unchanged.
+    """
+    if not isinstance(operations, list):
+        raise JsonPatchError("A JSON Patch is a list of operations")
+    result = copy.deepcopy(document)
+    for number, operation in enumerate(operations):
+        if not isinstance(operation, dict) or not isinstance(operation.get("path"), str):
+            raise JsonPatchError(f"Operation {number} needs an op and a path")
+        op, path = operation.get("op"), operation["path"]
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise JsonPatchError(f"Operation {number} ({op}) needs a value")
+        if op in ("move", "copy") and not isinstance(operation.get("from"), str):
+            raise JsonPatchError(f"Operation {number} ({op}) needs a from path")
+
+        if op == "add":
+            result = add_value(result, path, copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            remove_value(result, path)
+        elif op == "replace":
+            get_value(result, path)
+            if path == "":
+                result = copy.deepcopy(operation["value"])
+            else:
+                remove_value(result, path)
+                result = add_value(result, path, copy.deepcopy(operation["value"]))
+        elif op == "move":
+            source = operation["from"]
+            if path.startswith(source + "/"):
+                raise JsonPatchError(f"Operation {number} moves {source} into itself")
+            if path != source:
+                result = add_value(result, path, remove_value(result, source))
+        elif op == "copy":
+            result = add_value(result, path, copy.deepcopy(get_value(result, operation["from"])))
+        elif op == "test":
+            if not json_equal(get_value(result, path), operation["value"]):
+                raise JsonPatchTestFailed(f"Test failed at {path}")
+        else:
+            raise JsonPatchError(f"Operation {number} has an unknown op: {op!r}")
+    return result
@@ -1,22 +1,67 @@
+import json
 import os
-from datetime import date
-from typing import List
+from datetime import date, datetime
+from typing import List, Optional
 
 import requests
 import uvicorn
-from database import get_db, init_db
-from fastapi import Depends, FastAPI, File, HTTPException, UploadFile, status
+from blob_store import (BlobError, blob_path, blob_url, parse_blob_name,
+                        save_blob_stream, store_data_url)
+from budget_fitter import fit_budget
+from climate_alerts import add_climate_alerts
+from database import engine, get_db, init_db
+from drive_estimator import MPG_BY_VEHICLE, estimate_drives
+from explore import (DEFAULT_RADIUS_KM, EXPLORE_CATEGORIES, MAX_RADIUS_KM,
+                     explore_places)
+from fastapi import (BackgroundTasks, Depends, FastAPI, File, Form, Header,
+                     HTTPException, Query, Request, Response, UploadFile,
+                     status)
 from fastapi.middleware.cors import CORSMiddleware
+from file_serving import BlobFileResponse, if_match_satisfied
+from gazetteer import reverse_geocode
+from geocoding import resolve_cities
 from gemini_service import (analyze_pet_image, generate_road_trip_itinerary,
                             generate_travel_itinerary)
-from models import MemoryPhoto, Pet, Plan, User
-from schemas import (ItineraryGenerateRequest, ItineraryResponse,
-                     MemoryPhotoCreate, MemoryPhotoResponse, PastTripResponse,
-                     PetCreate, PetResponse, PetUpdate, PlanCreate,
-                     PlanResponse, PlanSaveRequest, PlanUpdate,
+from group_commit import PHOTO_GROUP_COMMIT_MS, group_committer
+from group_commit import shutdown as shutdown_group_commit
+from idempotency import IdempotentRequest, idempotent_request
+from itinerary_library import (REFINE_IN_BACKGROUND, ROAD_TRIP, TRIP,
+                               adapt_itinerary, age_bucket, find_similar,
+                               itinerary_total, join_names, refine_itinerary,
+                               remember_itinerary, request_features,
+                               trip_dates, vectorize)
+from json_patch import JsonPatchError, JsonPatchTestFailed, apply_patch
+from map_clusters import cluster_visited_cities
+from models import (DeletionJob, MemoryPhoto, Pet, Plan, PlanCity, PlanPet,
+                    PlanStop, User)
+from pagination import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page,
+                        page_size, paginate)
+from photo_pipeline import schedule_variants
+from photo_pipeline import shutdown as shutdown_photo_pipeline
+from plan_relations import (DESTINATION, WAYPOINT, plan_city_names,
+                            remove_plan_pet, sync_plan_relations,
+                            sync_plan_stops)
+from poi_store import CATEGORIES, itinerary_candidates
+from reaper import shutdown as shutdown_reaper
+from reaper import start_reaper, wake_reaper
+from route_corridor import (DEFAULT_CORRIDOR_KM, MAX_CORRIDOR_KM,
+                            corridor_places, plan_route)
+from schemas import (BlobResponse, BudgetFitRequest, BudgetFitResponse,
+                     CityClusterResponse, CorridorPlaceResponse,
+                     DeletionJobResponse, ExplorePlaceResponse, GeoCityRequest,
+                     GeoCityResponse, ItineraryGenerateRequest,
+                     ItineraryResponse, JsonPatchOperation,
+                     MemoryPhotoBulkCreate, MemoryPhotoCreate,
+                     MemoryPhotoResponse, PastTripResponse, PetCreate,
+                     PetResponse, PetUpdate, PlanCreate, PlanListItem,
+                     PlanResponse, PlanSaveRequest, PlanSearchResult,
+                     PlanStopResponse, PlanSummary, PlanUpdate,
                      RoadTripGenerateRequest, UserCreate, UserFull, UserLogin,
                      UserResponse, UserUpdate, VisitedCityResponse)
-from sqlalchemy.orm import Session
+from search_index import index_plans, search_plans, unindex_plans
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session, aliased, load_only, raiseload, undefer
+from sqlalchemy.orm.exc import StaleDataError
 
 app = FastAPI(title="Pawcation API", version="1.0.0")
 
@@ -27,13 +72,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Link", "ETag", "Idempotent-Replayed"],  # next-page links, plan versions, replayed creates
 )
 
 
 @app.on_event("startup")
 def startup_event():
-    """Initialize database on startup"""
+    """Initialize database on startup and start removing soft-deleted rows"""
     init_db()
+    start_reaper(engine)
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Let queued photo variant jobs and grouped inserts finish"""
+    shutdown_photo_pipeline()
+    shutdown_group_commit()
+    shutdown_reaper()
 
 
 def calculate_pet_age(date_of_birth: date) -> str:
@@ -59,11 +114,122 @@ def calculate_pet_age(date_of_birth: date) -> str:
         return f"{age_years} years old"
 
 
+def parse_include(include: Optional[str]) -> set:
+    """Parse a comma-separated ?include= query option into a set of names"""
+    if not include:
+        return set()
+    return {part.strip() for part in include.split(",") if part.strip()}
+
+
+# Plan columns serialized by PlanSummary (everything but detailed_itinerary)
+PLAN_SUMMARY_COLUMNS = [getattr(Plan, name) for name in PlanSummary.model_fields]
+
+
+def request_base_url(request: Request) -> str:
+    """Dependency for the origin blob URLs are built on when BLOB_BASE_URL is unset"""
+    return str(request.base_url)
+
+
+def store_image_fields(data: dict, base_url: str, fields=("image_url", "avatar_url")) -> dict:
+    """Move any inline data URLs in the given fields into the blob store"""
+    try:
+        for field in fields:
+            if data.get(field):
+                data[field] = store_data_url(data[field], base_url)
+    except BlobError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return data
+
+
+PHOTO_VARIANTS = ("thumbnail", "medium", "webp", "original")
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def photo_response(photo: MemoryPhoto, variant: str = "original") -> MemoryPhotoResponse:
+    """
+    Serialize a memory photo. local_path points at the requested variant when it has
+    been generated, and at the original otherwise.
+    """
+    variant_path = getattr(photo, f"{variant}_path", None) if variant != "original" else None
+    return MemoryPhotoResponse(
+        photo_id=photo.photo_id,
+        trip_id=photo.trip_id,
+        user_id=photo.user_id,
+        local_path=variant_path or photo.local_path,
+        original_path=photo.local_path,
+        city_name=photo.city_name,
+        created_at=photo.created_at.isoformat(),
+        width=photo.width,
+        height=photo.height,
+        variants_status=photo.variants_status,
+        thumbnail_path=photo.thumbnail_path,
+        medium_path=photo.medium_path,
+        webp_path=photo.webp_path,
+        latitude=photo.latitude,
+        longitude=photo.longitude,
+        location_city_name=photo.location_city_name,
+        taken_at=photo.taken_at.isoformat() if photo.taken_at else None,
+    )
+
+
+def geo_city_responses(resolved: dict) -> List[GeoCityResponse]:
+    """Serialize resolve_cities() results in request order"""
+    return [
+        GeoCityResponse(
+            query=query,
+            name=city.name if city else None,
+            latitude=city.latitude if city else None,
+            longitude=city.longitude if city else None,
+            source=city.source if city else None,
+        )
+        for query, city in resolved.items()
+    ]
+
+
+def plan_list_item(plan: Plan, include_itinerary: bool = False) -> dict:
+    """Serialize a plan for list responses, adding detailed_itinerary only on request"""
+    item = PlanSummary.model_validate(plan).model_dump()
+    if include_itinerary:
+        item["detailed_itinerary"] = plan.detailed_itinerary
+    return item
+
+
+def schedule_deletion(db: Session, entity: str, entity_id: int, response: Response):
+    """Commit a soft delete with its DeletionJob and wake the reaper"""
+    job = DeletionJob(entity=entity, entity_id=entity_id)
+    db.add(job)
+    db.commit()
+    wake_reaper()
+    response.headers["Location"] = f"/api/deletions/{job.job_id}"
+
+
+def soft_delete_plan(db: Session, plan_id: int, response: Response, not_found: str):
+    plan = db.query(Plan).filter(Plan.plan_id == plan_id).first()
+    if not plan:
+        raise HTTPException(status_code=404, detail=not_found)
+    
+    plan.deleted_at = datetime.utcnow()
+    unindex_plans(db, [plan_id])
+    schedule_deletion(db, "plan", plan_id, response)
+
+
 @app.get("/")
 def root():
     return {"message": "Welcome to Pawcation API 🐾"}
 
 
+@app.post("/api/places/geocode", response_model=List[GeoCityResponse])
+def geocode_cities(request: GeoCityRequest, db: Session = Depends(get_db)):
+    """
+    Resolve a batch of city strings to canonical "City, State" names and coordinates.
+    Served from the geo_city table and the offline gazetteer; only unknown strings
+    are sent to the Geocoding API.
+    """
+    resolved = resolve_cities(db, request.cities)
+    db.commit()
+    return geo_city_responses(resolved)
+
+
 @app.get("/api/places/autocomplete")
 def places_autocomplete(input: str):
     """
@@ -154,6 +320,34 @@ def places_autocomplete(input: str):
         return {"predictions": filtered}
 
 
+# ========== EXPLORE ENDPOINTS ==========
+
+@app.get("/api/explore/{category}", response_model=List[ExplorePlaceResponse])
+def explore(
+    category: str,
+    request: Request,
+    response: Response,
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(DEFAULT_RADIUS_KM, gt=0, le=MAX_RADIUS_KM),  # km
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_size),
+    db: Session = Depends(get_db),
+):
+    """
+    Pet-friendly places of an explore screen (hotels, hospital, dining, outdoor,
+    pet-services) within `radius` km, nearest first. Served from the local POI store
+    through a per-geohash-cell cache; the next page is linked in the Link header.
+    """
+    if category not in EXPLORE_CATEGORIES:
+        raise HTTPException(status_code=404, detail="Unknown explore category")
+    
+    places, next_cursor = explore_places(db, category, lat, lng, radius, limit, cursor)
+    if next_cursor:
+        response.headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+    return places
+
+
 # ========== USER ENDPOINTS ==========
 
 @app.post("/api/users", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
@@ -173,23 +367,58 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
 
 
 @app.get("/api/users/{user_id}", response_model=UserFull)
-def get_user(user_id: int, db: Session = Depends(get_db)):
-    """Get user with all their pets and plans"""
-    user = db.query(User).filter(User.user_id == user_id).first()
+def get_user(
+    user_id: int,
+    pets_limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    plans_limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    """
+    Get user with their pets and plans (latest end_date first), up to a limit per list.
+    Runs a fixed three queries however many pets and plans the user has.
+    """
+    user = db.query(User).options(raiseload("*")).filter(User.user_id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    
+    # Load each relationship with its own limited query; raiseload guards against lazy loads
+    pets, pets_next_cursor = keyset_page(
+        db.query(Pet).options(raiseload("*")).filter(Pet.user_id == user_id),
+        [Pet.pet_id], None, pets_limit,
+    )
+    plans, plans_next_cursor = keyset_page(
+        db.query(Plan).options(load_only(*PLAN_SUMMARY_COLUMNS), raiseload("*")).filter(Plan.user_id == user_id),
+        [Plan.end_date, Plan.plan_id], None, plans_limit, descending=True,
+    )
+    
+    return UserFull(
+        **UserResponse.model_validate(user).model_dump(),
+        pets=pets,
+        plans=plans,
+        pets_next_cursor=pets_next_cursor,
+        plans_next_cursor=plans_next_cursor,
+    )
 
 
 @app.get("/api/users", response_model=List[UserResponse])
-def list_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """List all users"""
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
+def list_users(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_size),
+    db: Session = Depends(get_db),
+):
+    """List all users, paginated by user_id"""
+    return paginate(db.query(User), request, response, [User.user_id], cursor, limit)
 
 
 @app.put("/api/users/{user_id}", response_model=UserResponse)
-def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get_db)):
+def update_user(
+    user_id: int,
+    user_update: UserUpdate,
+    base_url: str = Depends(request_base_url),
+    db: Session = Depends(get_db),
+):
     """Update user profile"""
     user = db.query(User).filter(User.user_id == user_id).first()
     if not user:
@@ -199,7 +428,7 @@ def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get
     if user_update.name is not None:
         user.name = user_update.name
     if user_update.avatar_url is not None:
-        user.avatar_url = user_update.avatar_url
+        user.avatar_url = store_image_fields({"avatar_url": user_update.avatar_url}, base_url)["avatar_url"]
     if user_update.password is not None:
         # In production, hash the password!
         user.password = user_update.password
@@ -210,14 +439,19 @@ def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get
 
 
 @app.delete("/api/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(user_id: int, db: Session = Depends(get_db)):
-    """Delete a user"""
+def delete_user(user_id: int, response: Response, db: Session = Depends(get_db)):
+    """
+    Delete a user. The user, their pets, plans and photos disappear from every read at
+    once; the rows and blob files are removed in the background (see Location for progress).
+    """
     user = db.query(User).filter(User.user_id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    db.delete(user)
-    db.commit()
+    user.deleted_at = datetime.utcnow()
+    # Free the address for a new account right away
+    user.email = f"deleted-{user_id}@deleted.invalid"
+    schedule_deletion(db, "user", user_id, response)
     return None
 
 
@@ -238,16 +472,27 @@ def login_user(login_data: UserLogin, db: Session = Depends(get_db)):
 # ========== PET ENDPOINTS ==========
 
 @app.post("/api/pets", response_model=PetResponse, status_code=status.HTTP_201_CREATED)
-def create_pet(pet: PetCreate, db: Session = Depends(get_db)):
-    """Create a new pet"""
+def create_pet(
+    pet: PetCreate,
+    idempotency: IdempotentRequest = Depends(idempotent_request),
+    base_url: str = Depends(request_base_url),
+    db: Session = Depends(get_db),
+):
+    """Create a new pet; retries with the same Idempotency-Key get the first response"""
+    replayed = idempotency.replay(db)
+    if replayed:
+        return replayed
+    
     # Verify user exists
     user = db.query(User).filter(User.user_id == pet.user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    db_pet = Pet(**pet.dict())
+    db_pet = Pet(**store_image_fields(pet.dict(), base_url))
     db.add(db_pet)
-    db.commit()
+    replayed = idempotency.commit(db, status.HTTP_201_CREATED, lambda: PetResponse.model_validate(db_pet))
+    if replayed:
+        return replayed
     db.refresh(db_pet)
     return db_pet
 
@@ -262,25 +507,37 @@ def get_pet(pet_id: int, db: Session = Depends(get_db)):
 
 
 @app.get("/api/users/{user_id}/pets", response_model=List[PetResponse])
-def get_user_pets(user_id: int, db: Session = Depends(get_db)):
-    """Get all pets for a user"""
+def get_user_pets(
+    user_id: int,
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_size),
+    db: Session = Depends(get_db),
+):
+    """Get all pets for a user, paginated by pet_id"""
     user = db.query(User).filter(User.user_id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    pets = db.query(Pet).filter(Pet.user_id == user_id).all()
-    return pets
+    query = db.query(Pet).filter(Pet.user_id == user_id)
+    return paginate(query, request, response, [Pet.pet_id], cursor, limit)
 
 
 @app.put("/api/pets/{pet_id}", response_model=PetResponse)
-def update_pet(pet_id: int, pet_update: PetUpdate, db: Session = Depends(get_db)):
+def update_pet(
+    pet_id: int,
+    pet_update: PetUpdate,
+    base_url: str = Depends(request_base_url),
+    db: Session = Depends(get_db),
+):
     """Update a pet"""
     db_pet = db.query(Pet).filter(Pet.pet_id == pet_id).first()
     if not db_pet:
         raise HTTPException(status_code=404, detail="Pet not found")
     
     # Update only provided fields
-    update_data = pet_update.dict(exclude_unset=True)
+    update_data = store_image_fields(pet_update.dict(exclude_unset=True), base_url)
     for field, value in update_data.items():
         setattr(db_pet, field, value)
     
@@ -296,6 +553,7 @@ def delete_pet(pet_id: int, db: Session = Depends(get_db)):
     if not pet:
         raise HTTPException(status_code=404, detail="Pet not found")
     
+    remove_plan_pet(db, pet_id)
     db.delete(pet)
     db.commit()
     return None
@@ -318,6 +576,45 @@ async def analyze_image(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"An error occurred during image analysis: {str(e)}")
 
 
+# ========== BLOB ENDPOINTS ==========
+
+@app.post("/api/blobs", response_model=BlobResponse, status_code=status.HTTP_201_CREATED)
+def upload_blob(file: UploadFile = File(...), base_url: str = Depends(request_base_url)):
+    """Upload an image to the content-addressed blob store and return its URL"""
+    # Stream the body to disk in chunks, stopping once it passes MAX_BLOB_BYTES
+    try:
+        name = save_blob_stream(file.file, file.content_type, UPLOAD_CHUNK_SIZE)
+    except BlobError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return BlobResponse(name=name, url=blob_url(name, base_url), size=os.path.getsize(blob_path(name)))
+
+
+@app.get("/api/blobs/{name}")
+def get_blob(name: str, request: Request):
+    """
+    Serve a blob (pet/user avatars and memory photos with their variants).
+    Supports Range requests and If-None-Match; content never changes for a name,
+    so it is cached forever.
+    """
+    parsed = parse_blob_name(name)
+    if not parsed:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    digest, content_type = parsed
+    
+    path = blob_path(name)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Blob not found")
+    
+    return BlobFileResponse(
+        path,
+        media_type=content_type,
+        etag=f'"{digest}"',
+        range_header=request.headers.get("range"),
+        if_none_match=request.headers.get("if-none-match"),
+        if_range=request.headers.get("if-range"),
+    )
+
+
 # ========== PLAN ENDPOINTS ==========
 
 @app.post("/api/plans", response_model=PlanResponse, status_code=status.HTTP_201_CREATED)
@@ -329,71 +626,277 @@ def create_plan(plan: PlanCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="User not found")
     
     db_plan = Plan(**plan.dict())
+    sync_plan_relations(db_plan)
+    sync_plan_stops(db_plan)
+    resolve_cities(db, plan_city_names(db_plan), upstream=False)
     db.add(db_plan)
+    db.flush()
+    index_plans(db, [db_plan])
     db.commit()
     db.refresh(db_plan)
     return db_plan
 
 
 @app.get("/api/plans/{plan_id}", response_model=PlanResponse)
-def get_plan(plan_id: int, db: Session = Depends(get_db)):
-    """Get a specific plan"""
-    plan = db.query(Plan).filter(Plan.plan_id == plan_id).first()
+def get_plan(plan_id: int, response: Response, db: Session = Depends(get_db)):
+    """Get a specific plan; the ETag header carries its version"""
+    plan = db.query(Plan).options(undefer(Plan.detailed_itinerary)).filter(Plan.plan_id == plan_id).first()
     if not plan:
         raise HTTPException(status_code=404, detail="Plan not found")
+    response.headers["ETag"] = plan_etag(plan)
     return plan
 
 
-@app.get("/api/users/{user_id}/plans", response_model=List[PlanResponse])
-def get_user_plans(user_id: int, db: Session = Depends(get_db)):
-    """Get all plans for a user"""
+@app.get("/api/plans/{plan_id}/stops", response_model=List[PlanStopResponse])
+def get_plan_stops(plan_id: int, type: Optional[str] = None, db: Session = Depends(get_db)):
+    """
+    Itinerary items of a plan in order, with their city, coordinates and estimated
+    cost, without loading the itinerary JSON. Optionally filtered by item type.
+    """
+    query = db.query(PlanStop).filter(PlanStop.plan_id == plan_id)
+    if type:
+        query = query.filter(PlanStop.type == type)
+    stops = query.order_by(PlanStop.position).all()
+    if not stops and not db.query(Plan.plan_id).filter(Plan.plan_id == plan_id).first():
+        raise HTTPException(status_code=404, detail="Plan not found")
+    return stops
+
+
+@app.get("/api/plans/{plan_id}/geocode", response_model=List[GeoCityResponse])
+def geocode_plan_cities(plan_id: int, db: Session = Depends(get_db)):
+    """
+    Coordinates and canonical names of every city of a plan (origin, destination,
+    places passing by and the cities in its itinerary) in one call.
+    """
+    plan = db.query(Plan).filter(Plan.plan_id == plan_id).first()
+    if not plan:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    
+    resolved = resolve_cities(db, plan_city_names(plan))
+    db.commit()
+    return geo_city_responses(resolved)
+
+
+@app.get("/api/plans/{plan_id}/corridor", response_model=List[CorridorPlaceResponse])
+def get_plan_corridor(
+    plan_id: int,
+    request: Request,
+    response: Response,
+    category: List[str] = Query([]),
+    open_24h: bool = False,
+    radius: float = Query(DEFAULT_CORRIDOR_KM, gt=0, le=MAX_CORRIDOR_KM),  # km
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_size),
+    db: Session = Depends(get_db),
+):
+    """
+    Places within `radius` km of a plan's route (origin, places passing by, destination),
+    in the order they are passed, e.g. `?category=vet&open_24h=true` for emergency vets.
+    Repeat `category` for several; the next page is linked in the Link header.
+    """
+    unknown = [c for c in category if c not in CATEGORIES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown category: {unknown[0]}")
+    
+    plan = (
+        db.query(Plan)
+        .options(load_only(Plan.origin, Plan.destination, Plan.places_passing_by))
+        .filter(Plan.plan_id == plan_id)
+        .first()
+    )
+    if not plan:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    route = plan_route(plan)
+    if len(route) < 2:
+        raise HTTPException(status_code=422, detail="Plan route needs at least two known places")
+    
+    places, next_cursor = corridor_places(db, route, radius, category, open_24h, limit, cursor)
+    if next_cursor:
+        response.headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+    return places
+
+
+@app.get("/api/users/{user_id}/plans/search", response_model=List[PlanSearchResult])
+def search_user_plans(
+    user_id: int,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """
+    Full-text search over a user's plans (destination, origin, places passing by and
+    itinerary titles, subtitles and compliance notes), best match first, with
+    highlighted snippets. Every word must match (stemmed, "breweries" finds "brewery").
+    """
+    hits = search_plans(db, user_id, q, limit)
+    if not hits:
+        return []
+    
+    plans = {
+        plan.plan_id: plan
+        for plan in db.query(Plan).options(load_only(*PLAN_SUMMARY_COLUMNS))
+        .filter(Plan.plan_id.in_([hit["plan_id"] for hit in hits]))
+    }
+    return [
+        PlanSearchResult(
+            **PlanSummary.model_validate(plans[hit["plan_id"]]).model_dump(),
+            score=hit["score"],
+            destination_highlight=hit["destination"],
+            snippet=hit["snippet"],
+        )
+        for hit in hits if hit["plan_id"] in plans
+    ]
+
+
+@app.get("/api/users/{user_id}/plans", response_model=List[PlanListItem], response_model_exclude_unset=True)
+def get_user_plans(
+    user_id: int,
+    request: Request,
+    response: Response,
+    include: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_size),
+    db: Session = Depends(get_db),
+):
+    """
+    Get all plans for a user, latest end_date first.
+    Pass ?include=itinerary to also return detailed_itinerary.
+    """
     user = db.query(User).filter(User.user_id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    plans = db.query(Plan).filter(Plan.user_id == user_id).all()
-    return plans
+    include_itinerary = "itinerary" in parse_include(include)
+    query = db.query(Plan).filter(Plan.user_id == user_id)
+    if include_itinerary:
+        query = query.options(undefer(Plan.detailed_itinerary))
+    
+    plans = paginate(
+        query, request, response, [Plan.end_date, Plan.plan_id], cursor, limit, descending=True
+    )
+    return [plan_list_item(plan, include_itinerary) for plan in plans]
+
+
+def plan_etag(plan: Plan) -> str:
+    return f'"{plan.version}"'
+
+
+def check_if_match(plan: Plan, if_match: Optional[str], required: bool = False):
+    """412 when If-Match names another version of the plan, 428 when it is required but missing"""
+    if if_match is None:
+        if required:
+            raise HTTPException(status_code=428, detail="If-Match header with the plan's ETag is required")
+        return
+    if not if_match_satisfied(if_match, plan_etag(plan)):
+        raise HTTPException(status_code=412, detail="Plan was modified; fetch it again")
+
+
+def commit_plan(db: Session, plan: Plan, response: Response):
+    """Commit changes to a plan, 412 if another request updated it since it was loaded"""
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=412, detail="Plan was modified; fetch it again")
+    db.refresh(plan)
+    response.headers["ETag"] = plan_etag(plan)
 
 
 @app.put("/api/plans/{plan_id}", response_model=PlanResponse)
-def update_plan(plan_id: int, plan_update: PlanUpdate, db: Session = Depends(get_db)):
-    """Update a plan"""
+def update_plan(
+    plan_id: int,
+    plan_update: PlanUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """Update a plan; with If-Match, only if it is still at that version"""
     db_plan = db.query(Plan).filter(Plan.plan_id == plan_id).first()
     if not db_plan:
         raise HTTPException(status_code=404, detail="Plan not found")
+    check_if_match(db_plan, if_match)
     
     # Update only provided fields
     update_data = plan_update.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_plan, field, value)
     
-    db.commit()
-    db.refresh(db_plan)
+    if update_data.keys() & {"pet_ids", "destination", "places_passing_by"}:
+        sync_plan_relations(db_plan)
+    if "detailed_itinerary" in update_data:
+        sync_plan_stops(db_plan)
+    if update_data.keys() & {"origin", "destination", "places_passing_by", "detailed_itinerary"}:
+        resolve_cities(
+            db, plan_city_names(db_plan, include_stops="detailed_itinerary" in update_data), upstream=False
+        )
+        index_plans(db, [db_plan])
+    
+    commit_plan(db, db_plan, response)
     return db_plan
 
 
-@app.delete("/api/plans/{plan_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_plan(plan_id: int, db: Session = Depends(get_db)):
-    """Delete a plan"""
-    plan = db.query(Plan).filter(Plan.plan_id == plan_id).first()
-    if not plan:
+@app.patch("/api/plans/{plan_id}/itinerary", response_model=PlanResponse)
+def patch_plan_itinerary(
+    plan_id: int,
+    operations: List[JsonPatchOperation],
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Edit a plan's detailed_itinerary with an RFC 6902 JSON Patch, e.g.
+    `[{"op": "replace", "path": "/days/0/items/2/estimated_cost", "value": 45}]`.
+    If-Match must carry the plan's ETag. The patch applies entirely or not at all;
+    total_estimated_cost is recomputed from the items afterwards.
+    """
+    db_plan = db.query(Plan).options(undefer(Plan.detailed_itinerary)).filter(Plan.plan_id == plan_id).first()
+    if not db_plan:
         raise HTTPException(status_code=404, detail="Plan not found")
+    check_if_match(db_plan, if_match, required=True)
     
-    db.delete(plan)
-    db.commit()
+    try:
+        itinerary = json.loads(db_plan.detailed_itinerary) if db_plan.detailed_itinerary else {"days": []}
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Plan itinerary is not valid JSON")
+    try:
+        itinerary = apply_patch(itinerary, [
+            operation.model_dump(by_alias=True, exclude_unset=True) for operation in operations
+        ])
+    except JsonPatchTestFailed as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except JsonPatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if not isinstance(itinerary, dict) or not isinstance(itinerary.get("days", []), list):
+        raise HTTPException(status_code=422, detail="Patched itinerary must be an object with a days list")
+    
+    itinerary["total_estimated_cost"] = itinerary_total(itinerary)
+    db_plan.detailed_itinerary = json.dumps(itinerary)
+    sync_plan_stops(db_plan)
+    resolve_cities(db, plan_city_names(db_plan), upstream=False)
+    index_plans(db, [db_plan])
+    commit_plan(db, db_plan, response)
+    return db_plan
+
+
+@app.delete("/api/plans/{plan_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_plan(plan_id: int, response: Response, db: Session = Depends(get_db)):
+    """Delete a plan; its stops and photos are removed in the background"""
+    soft_delete_plan(db, plan_id, response, "Plan not found")
     return None
 
 
-@app.post("/api/plans/generate-itinerary", response_model=ItineraryResponse)
-def generate_itinerary(request: ItineraryGenerateRequest, db: Session = Depends(get_db)):
-    """Generate a pet-friendly travel itinerary using Gemini AI"""
-    # Get pet information from database
-    pet = db.query(Pet).filter(Pet.pet_id == request.pet_id).first()
-    if not pet:
-        raise HTTPException(status_code=404, detail="Pet not found")
-    
-    # Prepare pet info for Gemini
-    pet_info = {
+@app.get("/api/deletions/{job_id}", response_model=DeletionJobResponse)
+def get_deletion(job_id: int, db: Session = Depends(get_db)):
+    """Progress of the background removal of a deleted user or plan"""
+    job = db.query(DeletionJob).filter(DeletionJob.job_id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Deletion not found")
+    return job
+
+
+def pet_profile(pet: Pet) -> dict:
+    """Pet information passed to Gemini"""
+    return {
         "name": pet.name,
         "breed": pet.breed,
         "age": calculate_pet_age(pet.date_of_birth),
@@ -401,65 +904,184 @@ def generate_itinerary(request: ItineraryGenerateRequest, db: Session = Depends(
         "personality": pet.personality or [],
         "health": pet.health,
     }
-    
-    # Generate itinerary using Gemini
-    result = generate_travel_itinerary(
-        origin=request.origin,
-        destination=request.destination,
-        start_date=request.start_date,
-        end_date=request.end_date,
-        pet_info=pet_info,
-        num_adults=request.num_adults,
-        num_children=request.num_children,
-        budget=request.budget,
-    )
-    
+
+
+def size_rank(size: Optional[str]) -> int:
+    """Order of free-form pet sizes from toy (0) to giant (4); -1 when unknown"""
+    size = (size or "").lower()
+    if "small" in size:
+        return 0 if "extra" in size or "toy" in size else 1
+    if "toy" in size or "tiny" in size:
+        return 0
+    if "giant" in size or "extra" in size or "xl" in size:
+        return 4
+    if "large" in size:
+        return 3
+    return 2 if "medium" in size else -1
+
+
+def pets_profile(pets: List[Pet]) -> dict:
+    """
+    Pet information passed to Gemini for one or several pets traveling together. Several
+    pets get a combined profile under the most restrictive constraints (the largest size,
+    every health note, a senior's or a puppy's age before an adult's) with each pet's own
+    profile under "pets".
+    """
+    profiles = [pet_profile(pet) for pet in pets]
+    if len(profiles) == 1:
+        return profiles[0]
+    age_priority = {"senior": 0, "young": 1, "adult": 2, "unknown": 3}
+    return {
+        "name": join_names([profile["name"] for profile in profiles]),
+        "breed": join_names([profile["breed"] or "unknown breed" for profile in profiles]),
+        "age": min((profile["age"] for profile in profiles), key=lambda age: age_priority[age_bucket(age)]),
+        "size": max((profile["size"] for profile in profiles), key=size_rank),
+        "personality": list(dict.fromkeys(trait for profile in profiles for trait in profile["personality"])),
+        "health": "; ".join(f"{profile['name']}: {profile['health']}" for profile in profiles if profile["health"]),
+        "pets": profiles,
+    }
+
+
+def request_pets(db: Session, request) -> List[Pet]:
+    """The pets of a generation request (pet_ids, else pet_id), loaded in one query"""
+    pet_ids = list(dict.fromkeys(request.pet_ids or ([request.pet_id] if request.pet_id is not None else [])))
+    if not pet_ids:
+        raise HTTPException(status_code=400, detail="pet_id or pet_ids is required")
+    pets = {pet.pet_id: pet for pet in db.query(Pet).filter(Pet.pet_id.in_(pet_ids))}
+    if len(pets) < len(pet_ids):
+        raise HTTPException(status_code=404, detail="Pet not found")
+    return [pets[pet_id] for pet_id in pet_ids]
+
+
+def serve_itinerary(
+    db: Session,
+    background_tasks: BackgroundTasks,
+    kind: str,
+    generate,
+    params: dict,
+    reuse: bool,
+):
+    """
+    Answer a generation request with an adapted copy of a stored itinerary generated
+    for a similar request, or else call Gemini and store its result for next time.
+    """
+    def with_candidates():
+        # Real places near the destination (and along the way for road trips) for Gemini to pick from
+        origin = params["origin"] if kind == ROAD_TRIP else None
+        return {**params, "candidates": itinerary_candidates(db, params["destination"], origin)}
+
+    if trip_dates(params) is None:
+        # Not ISO dates: let Gemini make sense of them, nothing to store
+        result = generate(**with_candidates())
+        if "error" in result:
+            raise HTTPException(status_code=500, detail=result["error"])
+        return result
+
+    vector = vectorize(request_features(params))
+    match = find_similar(db, kind, params, vector) if reuse else None
+    if match:
+        source, similarity = match
+        result = adapt_itinerary(source, params)
+        result["reused_from"] = source.itinerary_id
+        result["similarity"] = round(similarity, 3)
+        if REFINE_IN_BACKGROUND:
+            background_tasks.add_task(refine_itinerary, db.get_bind(), kind, generate, with_candidates(), vector)
+        return result
+
+    result = generate(**with_candidates())
     if "error" in result:
         raise HTTPException(status_code=500, detail=result["error"])
-    
+    remember_itinerary(db, kind, params, vector, result)
+    db.commit()
     return result
 
 
-@app.post("/api/plans/generate-road-trip-itinerary", response_model=ItineraryResponse)
-def generate_road_trip(request: RoadTripGenerateRequest, db: Session = Depends(get_db)):
-    """Generate a pet-friendly road trip itinerary using Gemini AI"""
-    # Get pet information from database
-    pet = db.query(Pet).filter(Pet.pet_id == request.pet_id).first()
-    if not pet:
-        raise HTTPException(status_code=404, detail="Pet not found")
+@app.post("/api/plans/generate-itinerary", response_model=ItineraryResponse)
+def generate_itinerary(
+    request: ItineraryGenerateRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)
+):
+    """
+    Generate a pet-friendly travel itinerary for one or several pets using Gemini AI, or
+    adapt one generated for a similar earlier request (same destination, trip length and
+    number of pets, similar party and pets). Weather and altitude alerts come from local
+    climate normals for the pets.
+    """
+    pets = request_pets(db, request)
     
-    # Prepare pet info for Gemini
-    pet_info = {
-        "name": pet.name,
-        "breed": pet.breed,
-        "age": calculate_pet_age(pet.date_of_birth),
-        "size": pet.size,
-        "personality": pet.personality or [],
-        "health": pet.health,
+    params = {
+        "origin": request.origin,
+        "destination": request.destination,
+        "start_date": request.start_date,
+        "end_date": request.end_date,
+        "pet_info": pets_profile(pets),
+        "num_adults": request.num_adults,
+        "num_children": request.num_children,
+        "budget": request.budget,
     }
+    result = serve_itinerary(db, background_tasks, TRIP, generate_travel_itinerary, params, request.reuse)
+    dates = trip_dates(params)
+    return add_climate_alerts(result, pets, dates[0], request.destination) if dates else result
+
+
+@app.post("/api/plans/generate-road-trip-itinerary", response_model=ItineraryResponse)
+def generate_road_trip(
+    request: RoadTripGenerateRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)
+):
+    """
+    Generate a pet-friendly road trip itinerary for one or several pets using Gemini AI,
+    or adapt one generated for a similar earlier request. Mileage, drive times and fuel
+    costs of the drives are computed locally for the request's vehicle, weather and
+    altitude alerts from local climate normals for the pets.
+    """
+    vehicle = request.vehicle.strip().lower() if request.vehicle else None
+    if vehicle and vehicle not in MPG_BY_VEHICLE:
+        raise HTTPException(status_code=400, detail=f"Unknown vehicle: {request.vehicle}")
+    pets = request_pets(db, request)
     
-    # Generate road trip itinerary using Gemini
-    result = generate_road_trip_itinerary(
-        origin=request.origin,
-        destination=request.destination,
-        start_date=request.start_date,
-        end_date=request.end_date,
-        pet_info=pet_info,
-        num_adults=request.num_adults,
-        num_children=request.num_children,
-        is_round_trip=request.is_round_trip,
-        budget=request.budget,
+    params = {
+        "origin": request.origin,
+        "destination": request.destination,
+        "start_date": request.start_date,
+        "end_date": request.end_date,
+        "pet_info": pets_profile(pets),
+        "num_adults": request.num_adults,
+        "num_children": request.num_children,
+        "is_round_trip": request.is_round_trip,
+        "budget": request.budget,
+    }
+    result = serve_itinerary(db, background_tasks, ROAD_TRIP, generate_road_trip_itinerary, params, request.reuse)
+    result = estimate_drives(result, request.origin, request.destination, request.is_round_trip, vehicle)
+    dates = trip_dates(params)
+    return add_climate_alerts(result, pets, dates[0], request.origin) if dates else result
+
+
+@app.post("/api/plans/fit-budget", response_model=BudgetFitResponse)
+def fit_itinerary_budget(request: BudgetFitRequest):
+    """
+    Bring a generated itinerary within budget locally, without another Gemini call: cheaper
+    classes of stays, meals and activities first, then substitutes already on the plan
+    """
+    itinerary, changes = fit_budget(
+        request.itinerary.model_dump(exclude_none=True), request.budget, request.num_adults + request.num_children
     )
-    
-    if "error" in result:
-        raise HTTPException(status_code=500, detail=result["error"])
-    
-    return result
+    return {
+        "itinerary": itinerary,
+        "changes": changes,
+        "within_budget": itinerary["total_estimated_cost"] <= request.budget,
+    }
 
 
 @app.post("/api/plans/save", response_model=PlanResponse, status_code=status.HTTP_201_CREATED)
-def save_plan(plan: PlanSaveRequest, db: Session = Depends(get_db)):
-    """Save a generated itinerary as a plan"""
+def save_plan(
+    plan: PlanSaveRequest,
+    idempotency: IdempotentRequest = Depends(idempotent_request),
+    db: Session = Depends(get_db),
+):
+    """Save a generated itinerary as a plan; retries with the same Idempotency-Key get the first response"""
+    replayed = idempotency.replay(db)
+    if replayed:
+        return replayed
+    
     # Verify user exists
     user = db.query(User).filter(User.user_id == plan.user_id).first()
     if not user:
@@ -479,77 +1101,92 @@ def save_plan(plan: PlanSaveRequest, db: Session = Depends(get_db)):
         is_round_trip=1 if plan.is_round_trip else 0,
         detailed_itinerary=plan.detailed_itinerary,
     )
+    sync_plan_relations(db_plan)
+    sync_plan_stops(db_plan)
+    resolve_cities(db, plan_city_names(db_plan), upstream=False)
     db.add(db_plan)
-    db.commit()
+    db.flush()
+    index_plans(db, [db_plan])
+    replayed = idempotency.commit(db, status.HTTP_201_CREATED, lambda: PlanResponse.model_validate(db_plan))
+    if replayed:
+        return replayed
     db.refresh(db_plan)
     return db_plan
 
 
 # ========== MEMORY ENDPOINTS ==========
 
-@app.get("/api/memories/past-trips/{user_id}", response_model=List[PastTripResponse])
-def get_past_trips(user_id: int, db: Session = Depends(get_db)):
-    """Get all past trips for a user (trips with end_date < today)"""
-    import json
-    from datetime import date
-    
+@app.get("/api/memories/past-trips/{user_id}", response_model=List[PastTripResponse], response_model_exclude_unset=True)
+def get_past_trips(
+    user_id: int,
+    request: Request,
+    response: Response,
+    pet_id: Optional[int] = None,
+    city_name: Optional[str] = None,
+    include: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_size),
+    db: Session = Depends(get_db),
+):
+    """
+    Get all past trips for a user (trips with end_date < today), optionally only those with a pet or city.
+    Pass ?include=itinerary to also return detailed_itinerary.
+    """
     today = date.today()
+    include_itinerary = "itinerary" in parse_include(include)
+    
+    # Photo count and cover photo (first photo, medium variant) per trip, aggregated in the same query
+    photo_stats = (
+        db.query(
+            MemoryPhoto.trip_id.label("trip_id"),
+            func.count(MemoryPhoto.photo_id).label("photo_count"),
+            func.min(MemoryPhoto.photo_id).label("cover_photo_id"),
+        )
+        .join(Plan, Plan.plan_id == MemoryPhoto.trip_id)
+        .filter(Plan.user_id == user_id)
+        .group_by(MemoryPhoto.trip_id)
+        .subquery()
+    )
+    cover = aliased(MemoryPhoto)
     
     # Get all plans where end_date < today
-    plans = db.query(Plan).filter(
-        Plan.user_id == user_id,
-        Plan.end_date < today
-    ).order_by(Plan.end_date.desc()).all()
+    query = (
+        db.query(Plan, photo_stats.c.photo_count, func.coalesce(cover.medium_path, cover.local_path))
+        .outerjoin(photo_stats, photo_stats.c.trip_id == Plan.plan_id)
+        .outerjoin(cover, cover.photo_id == photo_stats.c.cover_photo_id)
+        .filter(Plan.user_id == user_id, Plan.end_date < today)
+    )
+    if include_itinerary:
+        query = query.options(undefer(Plan.detailed_itinerary))
+    if pet_id is not None:
+        query = query.join(PlanPet, PlanPet.plan_id == Plan.plan_id).filter(PlanPet.pet_id == pet_id)
+    if city_name:
+        query = query.filter(Plan.city_links.any(PlanCity.city_name == city_name))
+    rows = paginate(
+        query, request, response, [Plan.end_date, Plan.plan_id], cursor, limit,
+        descending=True, key=lambda row: (row[0].end_date, row[0].plan_id),
+    )
+    
+    # Get visited cities for all trips in one query
+    trip_types = {plan.plan_id: plan.trip_type for plan, _, _ in rows}
+    visited = {plan_id: [] for plan_id in trip_types}
+    if trip_types:
+        city_links = db.query(PlanCity).filter(
+            PlanCity.plan_id.in_(trip_types.keys())
+        ).order_by(PlanCity.plan_id, PlanCity.position)
+        for link in city_links:
+            # Waypoints only count for road trips
+            if link.role == DESTINATION or trip_types[link.plan_id] == "Road Trip":
+                visited[link.plan_id].append(link.city_name)
     
     result = []
-    for plan in plans:
-        # Get photos for this trip
-        photos = db.query(MemoryPhoto).filter(MemoryPhoto.trip_id == plan.plan_id).all()
-        
-        # Get cover photo (first photo)
-        cover_photo = photos[0].local_path if photos else None
-        
-        # Get visited cities from itinerary or places_passing_by
-        visited_cities = []
-        if plan.detailed_itinerary:
-            try:
-                itinerary = json.loads(plan.detailed_itinerary)
-                # Extract cities from itinerary
-                if plan.destination:
-                    visited_cities.append(plan.destination)
-            except:
-                pass
-        
-        if plan.places_passing_by and plan.trip_type == "Road Trip":
-            try:
-                cities = json.loads(plan.places_passing_by) if plan.places_passing_by.startswith('[') else [c.strip() for c in plan.places_passing_by.split(',')]
-                visited_cities.extend(cities)
-            except:
-                if plan.places_passing_by:
-                    visited_cities.extend([c.strip() for c in plan.places_passing_by.split(',')])
-        
-        # Remove duplicates while preserving order
-        visited_cities = list(dict.fromkeys(visited_cities))
-        
+    for plan, photo_count, cover_photo in rows:
         past_trip = PastTripResponse(
-            plan_id=plan.plan_id,
-            user_id=plan.user_id,
-            start_date=plan.start_date,
-            end_date=plan.end_date,
-            trip_type=plan.trip_type,
-            is_round_trip=bool(plan.is_round_trip),
-            destination=plan.destination,
-            places_passing_by=plan.places_passing_by,
-            detailed_itinerary=plan.detailed_itinerary,
-            num_humans=plan.num_humans,
-            num_adults=plan.num_adults,
-            num_children=plan.num_children,
-            budget=plan.budget,
-            origin=plan.origin,
-            pet_ids=plan.pet_ids,
+            **plan_list_item(plan, include_itinerary),
             cover_photo=cover_photo,
-            photo_count=len(photos),
-            visited_cities=visited_cities
+            photo_count=photo_count or 0,
+            # Remove duplicates while preserving order
+            visited_cities=list(dict.fromkeys(visited[plan.plan_id]))
         )
         result.append(past_trip)
     
@@ -557,55 +1194,176 @@ def get_past_trips(user_id: int, db: Session = Depends(get_db)):
 
 
 @app.get("/api/memories/photos/{trip_id}", response_model=List[MemoryPhotoResponse])
-def get_trip_photos(trip_id: int, city_name: str = None, db: Session = Depends(get_db)):
-    """Get all photos for a specific trip, optionally filtered by city"""
+def get_trip_photos(
+    trip_id: int,
+    request: Request,
+    response: Response,
+    city_name: str = None,
+    variant: str = Query("thumbnail", enum=list(PHOTO_VARIANTS)),
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_size),
+    db: Session = Depends(get_db),
+):
+    """
+    Get all photos for a specific trip, newest first, optionally filtered by city.
+    local_path is the thumbnail by default; pass ?variant= for medium, webp or original.
+    """
     query = db.query(MemoryPhoto).filter(MemoryPhoto.trip_id == trip_id)
     
     if city_name:
         query = query.filter(MemoryPhoto.city_name == city_name)
     
-    photos = query.order_by(MemoryPhoto.created_at.desc()).all()
+    photos = paginate(
+        query, request, response, [MemoryPhoto.created_at, MemoryPhoto.photo_id], cursor, limit,
+        descending=True,
+    )
     
     # Convert to response format
-    return [
-        MemoryPhotoResponse(
-            photo_id=p.photo_id,
-            trip_id=p.trip_id,
-            user_id=p.user_id,
-            local_path=p.local_path,
-            city_name=p.city_name,
-            created_at=p.created_at.isoformat()
-        ) for p in photos
-    ]
+    return [photo_response(p, variant) for p in photos]
 
 
 @app.post("/api/memories/photos", response_model=MemoryPhotoResponse, status_code=status.HTTP_201_CREATED)
-def add_memory_photo(photo: MemoryPhotoCreate, db: Session = Depends(get_db)):
-    """Add a new photo to a trip"""
+def add_memory_photo(
+    photo: MemoryPhotoCreate,
+    idempotency: IdempotentRequest = Depends(idempotent_request),
+    db: Session = Depends(get_db),
+):
+    """Add a new photo to a trip; retries with the same Idempotency-Key get the first response"""
+    replayed = idempotency.replay(db)
+    if replayed:
+        return replayed
+    
     # Verify trip exists
-    trip = db.query(Plan).filter(Plan.plan_id == photo.trip_id).first()
+    trip = db.query(Plan.plan_id).filter(Plan.plan_id == photo.trip_id).first()
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
     
+    location_city_name = None
+    if photo.latitude is not None and photo.longitude is not None:
+        location_city_name = reverse_geocode([photo.latitude], [photo.longitude])[0]
+    
     # Create photo record
     db_photo = MemoryPhoto(
         trip_id=photo.trip_id,
         user_id=photo.user_id,
         local_path=photo.local_path,
-        city_name=photo.city_name
+        city_name=photo.city_name or location_city_name,
+        location_city_name=location_city_name,
+        latitude=photo.latitude,
+        longitude=photo.longitude,
+        taken_at=photo.taken_at,
     )
+    cities = list(dict.fromkeys(name for name in (photo.city_name, location_city_name) if name))
+    if PHOTO_GROUP_COMMIT_MS and idempotency.key is None:
+        # Written together with concurrent requests' photos; hand the connection back meanwhile
+        db.close()
+        future = group_committer(db.get_bind()).submit(db_photo, cities)
+        return photo_response(future.result())
+    
+    if cities:
+        resolve_cities(db, cities, upstream=False)
     db.add(db_photo)
-    db.commit()
+    replayed = idempotency.commit(db, status.HTTP_201_CREATED, lambda: photo_response(db_photo))
+    if replayed:
+        return replayed
     db.refresh(db_photo)
     
-    return MemoryPhotoResponse(
-        photo_id=db_photo.photo_id,
-        trip_id=db_photo.trip_id,
-        user_id=db_photo.user_id,
-        local_path=db_photo.local_path,
-        city_name=db_photo.city_name,
-        created_at=db_photo.created_at.isoformat()
+    return photo_response(db_photo)
+
+
+@app.post("/api/memories/photos/bulk", response_model=List[MemoryPhotoResponse], status_code=status.HTTP_201_CREATED)
+def add_memory_photos(
+    request: MemoryPhotoBulkCreate,
+    idempotency: IdempotentRequest = Depends(idempotent_request),
+    db: Session = Depends(get_db),
+):
+    """
+    Add up to 500 photos to a trip in one transaction: the trip is checked once, GPS
+    positions are placed in one vectorized lookup and all rows are inserted together.
+    """
+    replayed = idempotency.replay(db)
+    if replayed:
+        return replayed
+    
+    trip = db.query(Plan.plan_id).filter(Plan.plan_id == request.trip_id).first()
+    if not trip:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    
+    location_names = [None] * len(request.photos)
+    located = [i for i, photo in enumerate(request.photos) if photo.latitude is not None and photo.longitude is not None]
+    if located:
+        found = reverse_geocode(
+            [request.photos[i].latitude for i in located], [request.photos[i].longitude for i in located]
+        )
+        for i, name in zip(located, found):
+            location_names[i] = name
+    city_names = [photo.city_name for photo in request.photos]
+    resolve_cities(db, list(dict.fromkeys(name for name in city_names + location_names if name)), upstream=False)
+    
+    # One multi-row INSERT; rowids follow the VALUES order, so sorting restores the request order
+    created_at = datetime.utcnow()
+    db_photos = sorted(db.scalars(insert(MemoryPhoto).values([
+        {
+            "trip_id": request.trip_id,
+            "user_id": request.user_id,
+            "local_path": photo.local_path,
+            "city_name": photo.city_name or location_city_name,
+            "location_city_name": location_city_name,
+            "latitude": photo.latitude,
+            "longitude": photo.longitude,
+            "taken_at": photo.taken_at,
+            "created_at": created_at,
+        }
+        for photo, location_city_name in zip(request.photos, location_names)
+    ]).returning(MemoryPhoto)).all(), key=lambda db_photo: db_photo.photo_id)
+    responses = [photo_response(db_photo) for db_photo in db_photos]
+    replayed = idempotency.commit(db, status.HTTP_201_CREATED, lambda: responses)
+    if replayed:
+        return replayed
+    return responses
+
+
+@app.post("/api/memories/photos/upload", response_model=MemoryPhotoResponse, status_code=status.HTTP_201_CREATED)
+def upload_memory_photo(
+    trip_id: int = Form(...),
+    user_id: int = Form(...),
+    city_name: Optional[str] = Form(None),
+    file: UploadFile = File(...),
+    base_url: str = Depends(request_base_url),
+    db: Session = Depends(get_db),
+):
+    """
+    Upload a photo to a trip. The file is streamed into the blob store and the
+    thumbnail, medium and WebP variants are generated in the background, where the
+    EXIF GPS position (if any) is placed as location_city_name, the canonical "City, State".
+    """
+    # Verify trip exists
+    trip = db.query(Plan).filter(Plan.plan_id == trip_id).first()
+    if not trip:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    
+    # Stream the body to disk in chunks
+    try:
+        name = save_blob_stream(file.file, file.content_type, UPLOAD_CHUNK_SIZE)
+    except BlobError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if city_name:
+        resolve_cities(db, [city_name], upstream=False)
+    
+    db_photo = MemoryPhoto(
+        trip_id=trip_id,
+        user_id=user_id,
+        local_path=blob_url(name, base_url),
+        city_name=city_name,
+        variants_status="pending",
     )
+    db.add(db_photo)
+    db.commit()
+    db.refresh(db_photo)
+    
+    schedule_variants(db.get_bind(), db_photo.photo_id, blob_path(name), base_url)
+    return photo_response(db_photo)
 
 
 @app.delete("/api/memories/photos/{photo_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -623,16 +1381,27 @@ def delete_memory_photo(photo_id: int, db: Session = Depends(get_db)):
 @app.get("/api/memories/visited-cities/{user_id}", response_model=List[VisitedCityResponse])
 def get_visited_cities(user_id: int, db: Session = Depends(get_db)):
     """Get all visited cities with aggregated trip information for map display"""
-    import json
-    from datetime import date
-    
     today = date.today()
     
-    # Get all past trips
-    plans = db.query(Plan).filter(
-        Plan.user_id == user_id,
-        Plan.end_date < today
-    ).all()
+    # Get all past trips joined with the cities they pass through
+    rows = (
+        db.query(Plan.plan_id, Plan.trip_type, PlanCity.role, PlanCity.city_name)
+        .outerjoin(PlanCity, PlanCity.plan_id == Plan.plan_id)
+        .filter(Plan.user_id == user_id, Plan.end_date < today)
+        .order_by(Plan.plan_id, PlanCity.position)
+        .all()
+    )
+    
+    # Photo counts per (trip, city) for those trips
+    photo_counts = dict(
+        ((trip_id, city), count)
+        for trip_id, city, count in db.query(
+            MemoryPhoto.trip_id, MemoryPhoto.city_name, func.count(MemoryPhoto.photo_id)
+        )
+        .join(Plan, Plan.plan_id == MemoryPhoto.trip_id)
+        .filter(Plan.user_id == user_id, Plan.end_date < today, MemoryPhoto.city_name.isnot(None))
+        .group_by(MemoryPhoto.trip_id, MemoryPhoto.city_name)
+    )
     
     # Aggregate cities across all trips
     city_trips = {}  # {city_name: [trip_ids]}
@@ -641,62 +1410,64 @@ def get_visited_cities(user_id: int, db: Session = Depends(get_db)):
     # Generate colors for trips
     colors = ["#FF6B6B", "#4ECDC4", "#45B7D1", "#FFA07A", "#98D8C8", "#F7DC6F", "#BB8FCE", "#85C1E2"]
     
-    for idx, plan in enumerate(plans):
-        trip_colors[plan.plan_id] = colors[idx % len(colors)]
+    for plan_id, trip_type, role, city in rows:
+        if plan_id not in trip_colors:
+            trip_colors[plan_id] = colors[len(trip_colors) % len(colors)]
         
-        # Extract cities
-        cities = []
-        if plan.trip_type == "Direct Trip" or plan.trip_type == "Direct Flight":
-            if plan.destination:
-                cities = [plan.destination]
-        elif plan.trip_type == "Road Trip":
-            if plan.places_passing_by:
-                try:
-                    cities = json.loads(plan.places_passing_by) if plan.places_passing_by.startswith('[') else [c.strip() for c in plan.places_passing_by.split(',')]
-                except:
-                    cities = [c.strip() for c in plan.places_passing_by.split(',')]
+        # Direct trips map to their destination, road trips to the places passed by
+        if city is None:
+            continue
+        if trip_type in ("Direct Trip", "Direct Flight"):
+            if role != DESTINATION:
+                continue
+        elif trip_type == "Road Trip":
+            if role != WAYPOINT:
+                continue
+        else:
+            continue
         
-        # Add cities to aggregation
-        for city in cities:
-            if city not in city_trips:
-                city_trips[city] = []
-            city_trips[city].append(plan.plan_id)
+        trip_ids = city_trips.setdefault(city, [])
+        if plan_id not in trip_ids:
+            trip_ids.append(plan_id)
     
     # Build response
     result = []
     for city_name, trip_ids in city_trips.items():
-        # Count photos for this city across all trips
-        photo_count = db.query(MemoryPhoto).filter(
-            MemoryPhoto.city_name == city_name,
-            MemoryPhoto.trip_id.in_(trip_ids)
-        ).count()
-        
-        # Use color of the first trip for this city
-        trip_color = trip_colors.get(trip_ids[0], "#4ECDC4")
-        
         result.append(VisitedCityResponse(
             city_name=city_name,
             trip_ids=trip_ids,
-            photo_count=photo_count,
-            trip_color=trip_color
+            photo_count=sum(photo_counts.get((trip_id, city_name), 0) for trip_id in trip_ids),
+            # Use color of the first trip for this city
+            trip_color=trip_colors.get(trip_ids[0], "#4ECDC4")
         ))
     
     return result
 
 
+@app.get("/api/memories/visited-cities/{user_id}/clusters", response_model=List[CityClusterResponse])
+def get_visited_city_clusters(
+    user_id: int,
+    zoom: int = Query(..., ge=0, le=22),
+    west: float = Query(-180, ge=-180, le=180),
+    south: float = Query(-90, ge=-90, le=90),
+    east: float = Query(180, ge=-180, le=180),
+    north: float = Query(90, ge=-90, le=90),
+    db: Session = Depends(get_db),
+):
+    """
+    Visited cities inside the map's bounding box, clustered for the zoom level.
+    Clusters carry city, trip and photo counts plus a cover photo; at most a few
+    hundred are returned however many cities the user has visited.
+    """
+    if south > north:
+        raise HTTPException(status_code=400, detail="south must not be greater than north")
+    return cluster_visited_cities(db, user_id, zoom, west, south, east, north)
+
+
 @app.delete("/api/memories/trips/{trip_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_past_trip(trip_id: int, db: Session = Depends(get_db)):
-    """Delete a past trip and all its associated photos"""
-    trip = db.query(Plan).filter(Plan.plan_id == trip_id).first()
-    if not trip:
-        raise HTTPException(status_code=404, detail="Trip not found")
-    
-    # Delete all photos for this trip
-    db.query(MemoryPhoto).filter(MemoryPhoto.trip_id == trip_id).delete()
-    
-    # Delete the trip
-    db.delete(trip)
-    db.commit()
+def delete_past_trip(trip_id: int, response: Response, db: Session = Depends(get_db)):
+    """Delete a past trip; its photos and their files are removed in the background"""
+    soft_delete_plan(db, trip_id, response, "Trip not found")
     return None
 
 
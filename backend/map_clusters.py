@@ -0,0 +1,132 @@
+from datetime import date
+from typing import List
+
+from gazetteer import GEOHASH_PRECISION
+from models import MemoryPhoto, Plan, PlanCity
+from plan_relations import DESTINATION, WAYPOINT
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+# (max zoom, geohash prefix length): cells roughly half a 256px tile wide
+ZOOM_PRECISION = [(1, 1), (4, 2), (6, 3), (9, 4), (11, 5), (14, 6), (17, 7)]
+# Upper bound on clusters per response; the grid is coarsened until it fits
+MAX_CLUSTERS = 200
+
+
+def precision_for_zoom(zoom: int) -> int:
+    for max_zoom, precision in ZOOM_PRECISION:
+        if zoom <= max_zoom:
+            return precision
+    return GEOHASH_PRECISION
+
+
+def visited_city_filter():
+    """A plan city counts as visited: destinations of direct trips, waypoints of road trips"""
+    return or_(
+        and_(Plan.trip_type.in_(("Direct Trip", "Direct Flight")), PlanCity.role == DESTINATION),
+        and_(Plan.trip_type == "Road Trip", PlanCity.role == WAYPOINT),
+    )
+
+
+def bbox_filter(west: float, south: float, east: float, north: float):
+    longitude = (
+        PlanCity.longitude.between(west, east) if west <= east
+        # Box crossing the antimeridian
+        else or_(PlanCity.longitude >= west, PlanCity.longitude <= east)
+    )
+    return and_(PlanCity.latitude.between(south, north), longitude)
+
+
+def cluster_visited_cities(
+    db: Session,
+    user_id: int,
+    zoom: int,
+    west: float = -180,
+    south: float = -90,
+    east: float = 180,
+    north: float = 90,
+) -> List[dict]:
+    """
+    Visited cities of a user's past trips inside a bounding box, grouped into geohash
+    cells sized for the zoom level. The number of queries does not depend on how many
+    cities there are, and at most MAX_CLUSTERS clusters are returned.
+    """
+    filters = [
+        Plan.user_id == user_id,
+        Plan.end_date < date.today(),
+        PlanCity.geohash.isnot(None),
+        visited_city_filter(),
+        bbox_filter(west, south, east, north),
+    ]
+
+    precision = precision_for_zoom(zoom)
+    while True:
+        # A geohash is a prefix code, so the cell of every zoom level is a prefix of the stored
+        # geohash; it is taken on the fly over the user's past-trip cities left by the filters
+        cell = func.substr(PlanCity.geohash, 1, precision)
+        rows = (
+            db.query(
+                cell.label("cell"),
+                func.count(func.distinct(PlanCity.city_name)).label("city_count"),
+                func.count(func.distinct(PlanCity.plan_id)).label("trip_count"),
+                func.min(PlanCity.city_name).label("city_name"),
+                func.avg(PlanCity.latitude).label("latitude"),
+                func.avg(PlanCity.longitude).label("longitude"),
+                func.min(PlanCity.longitude).label("west"),
+                func.min(PlanCity.latitude).label("south"),
+                func.max(PlanCity.longitude).label("east"),
+                func.max(PlanCity.latitude).label("north"),
+            )
+            .join(Plan, Plan.plan_id == PlanCity.plan_id)
+            .filter(*filters)
+            .group_by(cell)
+            .limit(MAX_CLUSTERS + 1)
+            .all()
+        )
+        if len(rows) <= MAX_CLUSTERS or precision == 1:
+            break
+        precision -= 1
+
+    # Photo count and newest photo per cell, matching photos to their trip's city
+    photo_stats = {
+        row.cell: row
+        for row in db.query(
+            cell.label("cell"),
+            func.count(MemoryPhoto.photo_id).label("photo_count"),
+            func.max(MemoryPhoto.photo_id).label("cover_photo_id"),
+        )
+        .join(Plan, Plan.plan_id == PlanCity.plan_id)
+        .join(MemoryPhoto, and_(
+            MemoryPhoto.trip_id == PlanCity.plan_id,
+            MemoryPhoto.city_name == PlanCity.city_name,
+        ))
+        .filter(*filters)
+        .group_by(cell)
+    }
+
+    cover_ids = [stats.cover_photo_id for stats in photo_stats.values()]
+    covers = {}
+    if cover_ids:
+        covers = {
+            photo.photo_id: photo.thumbnail_path or photo.local_path
+            for photo in db.query(MemoryPhoto.photo_id, MemoryPhoto.thumbnail_path, MemoryPhoto.local_path)
+            .filter(MemoryPhoto.photo_id.in_(cover_ids))
+        }
+
+    clusters = []
+    for row in rows:
+        stats = photo_stats.get(row.cell)
+        cover_photo_id = stats.cover_photo_id if stats else None
+        clusters.append({
+            "geohash": row.cell,
+            "latitude": row.latitude,
+            "longitude": row.longitude,
+            "bounds": [row.west, row.south, row.east, row.north],
+            "city_count": row.city_count,
+            "trip_count": row.trip_count,
+            "city_name": row.city_name if row.city_count == 1 else None,
+            "photo_count": stats.photo_count if stats else 0,
+            "cover_photo_id": cover_photo_id,
+            "cover_photo": covers.get(cover_photo_id),
+        })
+    return clusters
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Move inline data-URL images (Pet.image_url, Pet.avatar_url, User.avatar_url)
+out of the database into the content-addressed blob store, rewriting each
+column to the short blob URL. Safe to run more than once.
+
+The rewrite cannot be undone, so BLOB_BASE_URL must be set to the public origin
+of the API (e.g. "https://api.example.com"): the frontend is served from another
+origin and could not load relative /api/blobs/... URLs.
+"""
+
+import sys
+
+from blob_store import BLOB_BASE_URL, BLOB_DIR, BlobError, store_data_url
+from database import SessionLocal, init_db
+from models import Pet, User
+from sqlalchemy import or_
+
+BATCH_SIZE = 200
+
+
+def migrate_images(model, id_column, fields):
+    """Rewrite data URLs in `fields` of `model`, committing in batches"""
+    db = SessionLocal()
+    migrated = 0
+    errors = 0
+    try:
+        last_id = 0
+        while True:
+            # Only rows that still hold a data URL, fetched by id range
+            rows = db.query(id_column, *fields).filter(
+                id_column > last_id,
+                or_(*[field.like("data:%") for field in fields]),
+            ).order_by(id_column).limit(BATCH_SIZE).all()
+            if not rows:
+                break
+            
+            for row in rows:
+                updates = {}
+                for field in fields:
+                    value = getattr(row, field.key)
+                    try:
+                        new_value = store_data_url(value)
+                    except BlobError as e:
+                        errors += 1
+                        print(f"  ❌ {model.__tablename__} {row[0]} {field.key}: {e}")
+                        continue
+                    if new_value != value:
+                        updates[field.key] = new_value
+                if updates:
+                    db.query(model).filter(id_column == row[0]).update(updates, synchronize_session=False)
+                    migrated += 1
+            db.commit()
+            
+            last_id = rows[-1][0]
+            print(f"  ✓ {model.__tablename__}: {migrated} rows rewritten")
+    finally:
+        db.close()
+    
+    print(f"✅ {model.__tablename__} migration complete: {migrated} rewritten, {errors} errors")
+    return migrated, errors
+
+
+def main():
+    if not BLOB_BASE_URL:
+        print("❌ Set BLOB_BASE_URL to the public origin of the API, e.g. BLOB_BASE_URL=http://localhost:8000")
+        sys.exit(1)
+    
+    print("🚀 Moving inline images into the blob store")
+    print(f"   Blob directory: {BLOB_DIR}")
+    print(f"   Blob URLs: {BLOB_BASE_URL}/api/blobs/...")
+    print("=" * 60)
+    init_db()
+    migrate_images(User, User.user_id, [User.avatar_url])
+    migrate_images(Pet, Pet.pet_id, [Pet.image_url, Pet.avatar_url])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Backfill the plan_pets, plan_cities and plan_stop tables from the legacy
+Plan.pet_ids, Plan.places_passing_by and Plan.detailed_itinerary columns, rebuild
+the plan_search full-text index, and record every city string of plans and
+memory photos in the geo_city table (offline gazetteer only).
+The string columns are left untouched and stay available as a compatibility view.
+Safe to run more than once.
+"""
+
+from database import SessionLocal, init_db
+from geocoding import resolve_cities
+from models import MemoryPhoto, Plan
+from plan_relations import (plan_city_names, sync_plan_relations,
+                            sync_plan_stops)
+from search_index import index_plans
+from sqlalchemy.orm import undefer
+
+BATCH_SIZE = 500
+
+
+def backfill_plans():
+    """Rebuild relation rows for every plan, committing in batches"""
+    db = SessionLocal()
+    migrated = 0
+    try:
+        last_id = 0
+        while True:
+            plans = db.query(Plan).options(undefer(Plan.detailed_itinerary)).filter(
+                Plan.plan_id > last_id
+            ).order_by(Plan.plan_id).limit(BATCH_SIZE).all()
+            if not plans:
+                break
+            
+            names = []
+            for plan in plans:
+                sync_plan_relations(plan)
+                sync_plan_stops(plan)
+                names.extend(plan_city_names(plan))
+            resolve_cities(db, set(names), upstream=False)
+            index_plans(db, plans)
+            db.commit()
+            
+            migrated += len(plans)
+            last_id = plans[-1].plan_id
+            print(f"  ✓ Backfilled {migrated} plans")
+    finally:
+        db.close()
+    
+    print(f"✅ Plan relations backfill complete: {migrated} plans")
+    return migrated
+
+
+def record_photo_cities():
+    """Add the distinct city names of memory photos to geo_city"""
+    db = SessionLocal()
+    try:
+        names = [name for (name,) in db.query(MemoryPhoto.city_name).filter(MemoryPhoto.city_name.isnot(None)).distinct()]
+        for start in range(0, len(names), BATCH_SIZE):
+            resolve_cities(db, names[start:start + BATCH_SIZE], upstream=False)
+            db.commit()
+    finally:
+        db.close()
+    print(f"✅ Recorded {len(names)} photo city names")
+
+
+def main():
+    print("🚀 Backfilling plan relation tables")
+    print("=" * 60)
+    init_db()  # creates the relation tables and missing indexes
+    backfill_plans()
+    record_photo_cities()
+
+
+if __name__ == "__main__":
+    main()
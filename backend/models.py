@@ -1,9 +1,11 @@
 from datetime import date, datetime
 
-from sqlalchemy import (JSON, Column, Date, DateTime, Float, ForeignKey,
-                        Integer, String, Text)
+from sqlalchemy import (DDL, JSON, Column, Date, DateTime, Float, ForeignKey,
+                        Index, Integer, LargeBinary, String, Text, event,
+                        select, text, union)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import (Session, deferred, relationship,
+                            with_loader_criteria)
 
 Base = declarative_base()
 
@@ -16,6 +18,8 @@ class User(Base):
     password = Column(String, nullable=False)  # Should be hashed in production
     name = Column(String, nullable=True)  # User display name
     avatar_url = Column(String, nullable=True)  # User profile avatar
+    # Soft delete: hidden from reads at once, rows removed later by reaper.py
+    deleted_at = Column(DateTime, nullable=True, index=True)
     
     # Relationships
     pets = relationship("Pet", back_populates="owner", cascade="all, delete-orphan")
@@ -48,8 +52,13 @@ class Pet(Base):
     image_url = Column(String, nullable=True)  # Full image for AI analysis
     avatar_url = Column(String, nullable=True)  # Cropped circular avatar
     
-    # Relationship
+    # Relationships
     owner = relationship("User", back_populates="pets")
+    plan_links = relationship("PlanPet", back_populates="pet", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index("ix_pets_user_id_pet_id", "user_id", "pet_id"),
+    )
 
 
 class Plan(Base):
@@ -67,7 +76,7 @@ class Plan(Base):
     is_round_trip = Column(Integer, default=0)  # 0 for one-way, 1 for round trip
     destination = Column(String)  # Main destination
     places_passing_by = Column(Text, nullable=True)  # JSON string or comma-separated
-    detailed_itinerary = Column(Text, nullable=True)  # JSON string with full itinerary
+    detailed_itinerary = deferred(Column(Text, nullable=True))  # JSON string with full itinerary, loaded on access
     
     # Travel Party
     num_humans = Column(Integer, default=1)
@@ -79,24 +88,227 @@ class Plan(Base):
     
     # Additional Info
     origin = Column(String, nullable=True)
-    pet_ids = Column(String, nullable=True)  # Comma-separated pet IDs
+    pet_ids = Column(String, nullable=True)  # Comma-separated pet IDs (mirrors plan_pets)
     
-    # Relationship
+    # Bumped by every ORM update of the row; exposed as the plan's ETag for If-Match
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
+    deleted_at = Column(DateTime, nullable=True, index=True)  # Soft delete, see User.deleted_at
+    
+    # Relationships
     owner = relationship("User", back_populates="plans")
+    pet_links = relationship("PlanPet", back_populates="plan", cascade="all, delete-orphan")
+    city_links = relationship(
+        "PlanCity",
+        back_populates="plan",
+        cascade="all, delete-orphan",
+        order_by="PlanCity.position",
+    )
+    # Plans can have hundreds of stops: reaper.py removes them with one bulk DELETE per
+    # batch of plans (plan_relations.delete_plan_stops) instead of the ORM loading each row
+    stops = relationship(
+        "PlanStop",
+        back_populates="plan",
+        cascade="all, delete-orphan",
+        order_by="PlanStop.position",
+        passive_deletes=True,
+    )
+
+    __table_args__ = (
+        Index("ix_plans_user_id_end_date", "user_id", "end_date", "plan_id"),
+    )
+    # UPDATEs carry "WHERE version = ?" and raise StaleDataError when another writer won
+    __mapper_args__ = {"version_id_col": version}
+
+
+class PlanPet(Base):
+    """Pets travelling on a plan (normalized form of Plan.pet_ids)"""
+    __tablename__ = "plan_pets"
+
+    plan_id = Column(Integer, ForeignKey("plans.plan_id", ondelete="CASCADE"), primary_key=True)
+    pet_id = Column(Integer, ForeignKey("pets.pet_id", ondelete="CASCADE"), primary_key=True)
+
+    # Relationships
+    plan = relationship("Plan", back_populates="pet_links")
+    pet = relationship("Pet", back_populates="plan_links")
+
+    __table_args__ = (
+        Index("ix_plan_pets_pet_id", "pet_id", "plan_id"),
+    )
+
+
+class PlanCity(Base):
+    """Cities a plan visits (normalized form of destination + Plan.places_passing_by)"""
+    __tablename__ = "plan_cities"
+
+    plan_id = Column(Integer, ForeignKey("plans.plan_id", ondelete="CASCADE"), primary_key=True)
+    position = Column(Integer, primary_key=True)  # 0 = destination, 1..n = places passing by
+    role = Column(String, nullable=False)  # "destination" or "waypoint"
+    city_name = Column(String, nullable=False)
+    # Map position from the offline gazetteer; None when the city string is not known
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    geohash = Column(String, nullable=True)
+
+    # Relationship
+    plan = relationship("Plan", back_populates="city_links")
+
+    __table_args__ = (
+        Index("ix_plan_cities_city_name", "city_name", "plan_id"),
+    )
+
+
+class PlanStop(Base):
+    """One item of a plan's detailed_itinerary, extracted when the itinerary is saved"""
+    __tablename__ = "plan_stop"
+
+    plan_id = Column(Integer, ForeignKey("plans.plan_id", ondelete="CASCADE"), primary_key=True)
+    position = Column(Integer, primary_key=True)  # Order of the item across the whole itinerary
+    day_index = Column(Integer, nullable=False)  # 0-based index into itinerary["days"]
+    type = Column(String, nullable=True)  # "transport", "accommodation", "dining", "activity", ...
+    title = Column(String, nullable=True)
+    subtitle = Column(String, nullable=True)
+    compliance = Column(String, nullable=True)  # "approved", "conditional" or "notAllowed"
+    compliance_note = Column(String, nullable=True)
+    city_name = Column(String, nullable=True)  # "City, State" from the subtitle, else the day label
+    latitude = Column(Float, nullable=True)  # From the offline gazetteer
+    longitude = Column(Float, nullable=True)
+    estimated_cost = Column(Float, nullable=True)
+
+    # Relationship
+    plan = relationship("Plan", back_populates="stops")
+
+    __table_args__ = (
+        Index("ix_plan_stop_city_name", "city_name", "plan_id"),
+        Index("ix_plan_stop_type", "type", "plan_id"),
+    )
+
+
+class GeoCity(Base):
+    """Geocoding cache for every city string the system has seen, keyed on its normalized form"""
+    __tablename__ = "geo_city"
+
+    key = Column(String, primary_key=True)  # gazetteer.normalize_city() of the raw string
+    name = Column(String, nullable=True)  # Canonical "City, State"
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    source = Column(String, nullable=False)  # "gazetteer", "google", "pending" (not looked up yet) or "unresolved"
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class GeneratedItinerary(Base):
+    """A Gemini itinerary with the request it answered, reused for similar requests (itinerary_library.py)"""
+    __tablename__ = "generated_itinerary"
+
+    itinerary_id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)  # "trip" or "road_trip"
+    destination_key = Column(String, nullable=False)  # gazetteer.normalize_city() of the destination
+    num_days = Column(Integer, nullable=False)
+    # Also matched exactly; NULL in rows stored before they were recorded, which are never reused
+    is_round_trip = Column(Integer, nullable=True)  # 0 for one-way, 1 for round trip
+    pet_size = Column(String, nullable=True)  # Lower-cased size of the (largest) pet, "" if unknown
+    health_constraints = Column(String, nullable=True)  # itinerary_library.health_constraints(), "" if none
+    start_date = Column(Date, nullable=False)
+    num_adults = Column(Integer, nullable=False)
+    num_children = Column(Integer, nullable=False)
+    budget = Column(Float, nullable=True)
+    pet_name = Column(String, nullable=True)
+    features = Column(LargeBinary, nullable=False)  # Normalized float32 vector of the request and pet
+    itinerary = deferred(Column(JSON, nullable=False))
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index(
+            "ix_generated_itinerary_match",
+            "kind", "destination_key", "num_days", "is_round_trip", "pet_size", "health_constraints", "itinerary_id",
+        ),
+    )
+
+
+class IdempotencyRecord(Base):
+    """Response of a create request sent with an Idempotency-Key, replayed for retries (idempotency.py)"""
+    __tablename__ = "idempotency_record"
+
+    scope = Column(String, primary_key=True)  # "POST /api/pets"
+    idempotency_key = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)  # SHA-256 of the canonical request body
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(Text, nullable=False)  # JSON
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class DeletionJob(Base):
+    """Removal of a soft-deleted user or plan and everything under it, worked off by reaper.py"""
+    __tablename__ = "deletion_job"
+
+    job_id = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)  # "user" or "plan"
+    entity_id = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # "pending", "running" or "done"
+    rows_deleted = Column(Integer, nullable=False, default=0)
+    blobs_deleted = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_deletion_job_status", "status", "job_id"),
+    )
+
+
+class Poi(Base):
+    """A pet-friendly place imported from CSV/GeoJSON (poi_store.py), located through the poi_rtree index"""
+    __tablename__ = "poi"
+
+    poi_id = Column(Integer, primary_key=True)
+    source_id = Column(String, unique=True, nullable=False)  # Id in the imported dataset, e.g. "osm:node/123"
+    category = Column(String, nullable=False)  # "hotel", "restaurant", "vet", "pet_service", "park" or "dog_beach"
+    name = Column(String, nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    address = Column(String, nullable=True)
+    city_name = Column(String, nullable=True)  # "City, State"
+    pet_policy = Column(String, nullable=False, default="approved")  # Same values as itinerary compliance
+    pet_notes = Column(String, nullable=True)  # e.g. "Dogs up to 50 lbs, $25/night"
+    open_24h = Column(Integer, nullable=False, default=0)  # 0 or 1 (boolean as int)
+    rating = Column(Float, nullable=True)
+    phone = Column(String, nullable=True)
+    website = Column(String, nullable=True)
+    attributes = Column(JSON, nullable=True)  # Any other columns/properties of the source record
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
 
 class MemoryPhoto(Base):
     __tablename__ = "memory_photos"
 
     photo_id = Column(Integer, primary_key=True, index=True)
-    trip_id = Column(Integer, ForeignKey("plans.plan_id"), nullable=False)
+    trip_id = Column(Integer, ForeignKey("plans.plan_id"), nullable=False, index=True)
     user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
     
     # Photo storage (local path or URL)
-    local_path = Column(String, nullable=False)  # Local storage path
+    local_path = Column(String, nullable=False)  # Local storage path, or blob URL of the uploaded original
+    width = Column(Integer, nullable=True)  # Original dimensions (server uploads only)
+    height = Column(Integer, nullable=True)
+    
+    # Resized variants generated in the background for server uploads
+    variants_status = Column(String, nullable=True)  # "pending", "ready" or "failed"
+    thumbnail_path = Column(String, nullable=True)
+    thumbnail_width = Column(Integer, nullable=True)
+    thumbnail_height = Column(Integer, nullable=True)
+    medium_path = Column(String, nullable=True)
+    medium_width = Column(Integer, nullable=True)
+    medium_height = Column(Integer, nullable=True)
+    webp_path = Column(String, nullable=True)  # Same dimensions as medium
     
     # Location info
-    city_name = Column(String, nullable=True)  # City-level location (e.g., "Boston, Massachusetts")
+    # The client's label, as typed in the plan (e.g. "Boston, MA"), so it matches PlanCity.city_name;
+    # falls back to location_city_name when the client sent none
+    city_name = Column(String, nullable=True)
+    location_city_name = Column(String, nullable=True)  # Canonical "City, State" of the GPS position (gazetteer)
+    latitude = Column(Float, nullable=True)  # From EXIF GPS (or the client), decimal degrees
+    longitude = Column(Float, nullable=True)
+    taken_at = Column(DateTime, nullable=True)  # EXIF capture time, camera local time
+    location_scanned_at = Column(DateTime, nullable=True)  # When the EXIF header was read
     
     # Metadata
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -104,3 +316,72 @@ class MemoryPhoto(Base):
     # Relationships
     trip = relationship("Plan")
     user = relationship("User")
+
+    __table_args__ = (
+        Index("ix_memory_photos_trip_id_created_at", "trip_id", "created_at", "photo_id"),
+    )
+
+
+# Full-text index of plans (see search_index.py), one row per plan with rowid = plan_id.
+# `owner` holds a single "u<user_id>" token so the user filter is part of the MATCH
+# instead of a scan over every plan that matches the words.
+PLAN_SEARCH_DDL = DDL(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS plan_search USING fts5("
+    "owner, destination, origin, places, itinerary, "
+    "tokenize = 'porter unicode61 remove_diacritics 2')"
+)
+event.listen(Base.metadata, "after_create", PLAN_SEARCH_DDL.execute_if(dialect="sqlite"))
+
+# R*Tree over POI coordinates (points stored as zero-size boxes), kept in sync by triggers
+# so bulk imports and upserts cannot leave it stale.
+POI_RTREE_DDL = [
+    DDL("CREATE VIRTUAL TABLE IF NOT EXISTS poi_rtree USING rtree(id, min_lat, max_lat, min_lng, max_lng)"),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS poi_rtree_insert AFTER INSERT ON poi BEGIN "
+        "INSERT INTO poi_rtree VALUES (new.poi_id, new.latitude, new.latitude, new.longitude, new.longitude); END"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS poi_rtree_update AFTER UPDATE OF latitude, longitude ON poi BEGIN "
+        "UPDATE poi_rtree SET min_lat = new.latitude, max_lat = new.latitude, "
+        "min_lng = new.longitude, max_lng = new.longitude WHERE id = new.poi_id; END"
+    ),
+    DDL("CREATE TRIGGER IF NOT EXISTS poi_rtree_delete AFTER DELETE ON poi BEGIN DELETE FROM poi_rtree WHERE id = old.poi_id; END"),
+]
+for ddl in POI_RTREE_DDL:
+    event.listen(Base.metadata, "after_create", ddl.execute_if(dialect="sqlite"))
+
+# Soft-deleted users and plans, and whatever hangs off them, are left out of every ORM
+# SELECT until reaper.py removes the rows. Core tables are used so the subqueries are not
+# filtered themselves. Sessions with info["include_deleted"] (the reaper) see everything.
+# PlanCity and PlanPet are exempt: every read reaches them through a filtered Plan (a join,
+# or plan ids from a filtered query), so their own criteria would only add another NOT IN
+# to the trip list and map queries. Read them the same way. Each subquery is uncorrelated,
+# so SQLite evaluates it once per statement (see test_query_budget.py).
+_users, _plans = User.__table__, Plan.__table__
+DELETED_USER_IDS = select(_users.c.user_id).where(_users.c.deleted_at.isnot(None))
+DELETED_PLAN_IDS = union(
+    select(_plans.c.plan_id).where(_plans.c.deleted_at.isnot(None)),
+    select(_plans.c.plan_id).where(_plans.c.user_id.in_(DELETED_USER_IDS)),
+)
+SOFT_DELETE_CRITERIA = [
+    # Lambdas so the criteria follow aliases of the entities
+    with_loader_criteria(User, lambda cls: cls.deleted_at.is_(None), include_aliases=True),
+    with_loader_criteria(
+        Plan, lambda cls: cls.deleted_at.is_(None) & cls.user_id.not_in(DELETED_USER_IDS), include_aliases=True
+    ),
+    with_loader_criteria(Pet, lambda cls: cls.user_id.not_in(DELETED_USER_IDS), include_aliases=True),
+    with_loader_criteria(PlanStop, lambda cls: cls.plan_id.not_in(DELETED_PLAN_IDS), include_aliases=True),
+    with_loader_criteria(MemoryPhoto, lambda cls: cls.trip_id.not_in(DELETED_PLAN_IDS), include_aliases=True),
+]
+
+
+@event.listens_for(Session, "do_orm_execute")
+def hide_soft_deleted(execute_state):
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+        and not execute_state.execution_options.get("include_deleted", False)
+        and not execute_state.session.info.get("include_deleted", False)
+    ):
+        execute_state.statement = execute_state.statement.options(*SOFT_DELETE_CRITERIA)
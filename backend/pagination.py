@@ -0,0 +1,91 @@
+import base64
+import json
+from typing import Callable, List, Optional, Tuple
+
+from fastapi import HTTPException, Query, Request, Response
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def page_size(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)) -> int:
+    """Dependency for the ?limit= query option of paginated endpoints"""
+    return limit
+
+
+def encode_cursor(values) -> str:
+    """Encode the sort key of the last row of a page as an opaque cursor"""
+    raw = json.dumps([v.isoformat() if hasattr(v, "isoformat") else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, columns) -> list:
+    """Decode an opaque cursor back into typed sort key values for the given columns (or Python types)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(raw, list) or len(raw) != len(columns):
+            raise ValueError("cursor does not match sort key")
+
+        values = []
+        for column, value in zip(columns, raw):
+            python_type = column.type.python_type if hasattr(column, "type") else column
+            if hasattr(python_type, "fromisoformat"):
+                values.append(python_type.fromisoformat(value))
+            else:
+                values.append(python_type(value))
+        return values
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_page(
+    query,
+    columns: list,
+    cursor: Optional[str],
+    limit: int,
+    descending: bool = False,
+    key: Optional[Callable] = None,
+) -> Tuple[List, Optional[str]]:
+    """
+    Fetch one page of a query ordered by `columns` (the last one must be unique).
+    Returns the rows and the cursor of the next page, or None on the last page.
+    """
+    if key is None:
+        key = lambda row: [getattr(row, column.key) for column in columns]
+
+    sort_key = tuple_(*columns)
+    if cursor:
+        values = tuple_(*decode_cursor(cursor, columns))
+        query = query.filter(sort_key < values if descending else sort_key > values)
+
+    order = [column.desc() if descending else column.asc() for column in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(key(rows[-1]))
+    return rows, None
+
+
+def paginate(
+    query,
+    request: Request,
+    response: Response,
+    columns: list,
+    cursor: Optional[str],
+    limit: int,
+    descending: bool = False,
+    key: Optional[Callable] = None,
+) -> List:
+    """
+    Apply keyset pagination to a query and return one page of rows. When more rows
+    follow, sets a `Link: <...>; rel="next"` header pointing at the next page.
+    No total count is computed.
+    """
+    rows, next_cursor = keyset_page(query, columns, cursor, limit, descending, key)
+    if next_cursor:
+        next_url = request.url.include_query_params(cursor=next_cursor)
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return rows
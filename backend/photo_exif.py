@@ -0,0 +1,74 @@
+from datetime import datetime
+from typing import Optional
+
+from PIL import Image
+
+# EXIF tag ids (see the EXIF 2.3 spec / PIL.ExifTags)
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+DATETIME_ORIGINAL = 0x9003
+DATETIME = 0x0132
+GPS_LATITUDE_REF = 1
+GPS_LATITUDE = 2
+GPS_LONGITUDE_REF = 3
+GPS_LONGITUDE = 4
+
+
+def _degrees(value, ref) -> Optional[float]:
+    """Convert an EXIF (degrees, minutes, seconds) triple plus N/S/E/W ref to decimal degrees"""
+    try:
+        degrees, minutes, seconds = (float(part) for part in value)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    decimal = degrees + minutes / 60 + seconds / 3600
+    if isinstance(ref, bytes):
+        ref = ref.decode("ascii", "ignore")
+    if (ref or "").strip().upper() in ("S", "W"):
+        decimal = -decimal
+    return decimal
+
+
+def _datetime(value) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value).strip("\x00 "), "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def read_exif(image: Image.Image) -> dict:
+    """
+    GPS position and capture time of an opened image:
+    {"latitude", "longitude", "taken_at"}, each None when missing or unreadable.
+    """
+    result = {"latitude": None, "longitude": None, "taken_at": None}
+    try:
+        exif = image.getexif()
+    except Exception:
+        return result
+
+    gps = exif.get_ifd(GPS_IFD)
+    if GPS_LATITUDE in gps and GPS_LONGITUDE in gps:
+        latitude = _degrees(gps[GPS_LATITUDE], gps.get(GPS_LATITUDE_REF))
+        longitude = _degrees(gps[GPS_LONGITUDE], gps.get(GPS_LONGITUDE_REF))
+        # (0, 0) is what some cameras write when they have no fix
+        if (
+            latitude is not None and longitude is not None
+            and -90 <= latitude <= 90 and -180 <= longitude <= 180
+            and (latitude, longitude) != (0, 0)
+        ):
+            result["latitude"], result["longitude"] = latitude, longitude
+
+    taken_at = exif.get_ifd(EXIF_IFD).get(DATETIME_ORIGINAL) or exif.get(DATETIME)
+    result["taken_at"] = _datetime(taken_at)
+    return result
+
+
+def read_exif_file(path: str) -> dict:
+    """read_exif for a file on disk; only the header is parsed, pixels are not decoded"""
+    try:
+        with Image.open(path) as image:
+            return read_exif(image)
+    except (OSError, SyntaxError, ValueError):
+        return {"latitude": None, "longitude": None, "taken_at": None}
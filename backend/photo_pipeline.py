@@ -0,0 +1,134 @@
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import blob_store
+from gazetteer import reverse_geocode
+from models import MemoryPhoto
+from photo_exif import read_exif
+from PIL import Image, ImageOps
+from sqlalchemy.orm import Session
+
+# name: (longest edge in px, Pillow format, content type, save options)
+VARIANTS = {
+    "thumbnail": (320, "JPEG", "image/jpeg", {"quality": 80, "optimize": True}),
+    "medium": (1280, "JPEG", "image/jpeg", {"quality": 85, "optimize": True}),
+    "webp": (1280, "WEBP", "image/webp", {"quality": 80, "method": 4}),
+}
+PHOTO_WORKERS = int(os.getenv("PHOTO_WORKERS", "2"))
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()  # Events of queued jobs, shared by request threads and pool callbacks
+_pending_lock = threading.Lock()
+
+
+def generate_variants(original_path: str, blob_dir: str) -> dict:
+    """
+    Resize an original photo into every variant and store each one as a blob, and
+    read its EXIF position and capture time. Runs in a worker process; returns blob
+    names, dimensions and the location resolved to "City, State".
+    """
+    blob_store.BLOB_DIR = blob_dir
+
+    with Image.open(original_path) as image:
+        location = read_exif(image)
+        location["city_name"] = None
+        if location["latitude"] is not None:
+            location["city_name"] = reverse_geocode([location["latitude"]], [location["longitude"]])[0]
+
+        image = ImageOps.exif_transpose(image)
+        result = {"width": image.width, "height": image.height, "location": location}
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        for name, (max_edge, image_format, content_type, options) in VARIANTS.items():
+            variant = image.copy()
+            variant.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            buffer = io.BytesIO()
+            variant.save(buffer, image_format, **options)
+            result[name] = {
+                "name": blob_store.save_blob(buffer.getvalue(), content_type),
+                "width": variant.width,
+                "height": variant.height,
+            }
+    return result
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=PHOTO_WORKERS)
+        return _executor
+
+
+def store_variants(bind, photo_id: int, future, base_url: str = ""):
+    """Write the outcome of a variant job back onto the photo row"""
+    with Session(bind=bind) as db:
+        photo = db.get(MemoryPhoto, photo_id)
+        if photo is None:
+            return  # deleted while processing
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Variant generation failed for photo {photo_id}: {e}")
+            photo.variants_status = "failed"
+        else:
+            photo.width = result["width"]
+            photo.height = result["height"]
+            photo.thumbnail_path = blob_store.blob_url(result["thumbnail"]["name"], base_url)
+            photo.thumbnail_width = result["thumbnail"]["width"]
+            photo.thumbnail_height = result["thumbnail"]["height"]
+            photo.medium_path = blob_store.blob_url(result["medium"]["name"], base_url)
+            photo.medium_width = result["medium"]["width"]
+            photo.medium_height = result["medium"]["height"]
+            photo.webp_path = blob_store.blob_url(result["webp"]["name"], base_url)
+            photo.variants_status = "ready"
+
+            location = result["location"]
+            photo.latitude = location["latitude"]
+            photo.longitude = location["longitude"]
+            photo.taken_at = location["taken_at"]
+            photo.location_scanned_at = datetime.utcnow()
+            photo.location_city_name = location["city_name"]
+            # The client's label stays: it is what the plan's cities are matched on
+            photo.city_name = photo.city_name or location["city_name"]
+        db.commit()
+
+
+def schedule_variants(bind, photo_id: int, original_path: str, base_url: str = ""):
+    """Queue variant generation for a photo without blocking the request"""
+    finished = threading.Event()
+    with _pending_lock:
+        _pending.add(finished)
+
+    def done(future):
+        try:
+            store_variants(bind, photo_id, future, base_url)
+        finally:
+            finished.set()
+            with _pending_lock:
+                _pending.discard(finished)
+
+    future = get_executor().submit(generate_variants, original_path, blob_store.BLOB_DIR)
+    future.add_done_callback(done)
+    return future
+
+
+def wait_for_pending(timeout: float = None):
+    """Block until queued variant jobs (and their row updates) have finished"""
+    with _pending_lock:
+        pending = list(_pending)
+    for finished in pending:
+        finished.wait(timeout)
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
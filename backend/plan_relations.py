@@ -0,0 +1,159 @@
+import json
+import re
+from typing import List, Optional
+
+from gazetteer import encode_geohash, is_state, locate_cities
+from models import Plan, PlanCity, PlanPet, PlanStop
+from sqlalchemy import func, literal, select, update
+
+DESTINATION = "destination"
+WAYPOINT = "waypoint"
+
+
+def parse_pet_ids(pet_ids: str) -> List[int]:
+    """Parse the comma-separated Plan.pet_ids string into a list of ints"""
+    if not pet_ids:
+        return []
+
+    result = []
+    for value in pet_ids.split(","):
+        value = value.strip()
+        if value.isdigit() and int(value) not in result:
+            result.append(int(value))
+    return result
+
+
+def parse_places_passing_by(places_passing_by: str) -> List[str]:
+    """Parse Plan.places_passing_by, which is either a JSON list or comma-separated"""
+    if not places_passing_by:
+        return []
+
+    cities = None
+    if places_passing_by.startswith("["):
+        try:
+            cities = json.loads(places_passing_by)
+        except json.JSONDecodeError:
+            cities = None
+    if not isinstance(cities, list):
+        cities = places_passing_by.split(",")
+
+    # Remove blanks and duplicates while preserving order
+    return list(dict.fromkeys(str(c).strip() for c in cities if str(c).strip()))
+
+
+def city_mentions(text: str) -> List[str]:
+    """
+    "City, State" strings in an itinerary subtitle or day label, e.g.
+    "Day 1: San Francisco, California → Santa Barbara, California" or
+    "Los Angeles, California • Check-in time".
+    """
+    found = []
+    for part in re.split(r"[•→|]|: | - ", text or ""):
+        pieces = [piece.strip() for piece in part.split(",")]
+        if len(pieces) == 2 and pieces[0] and is_state(pieces[1]):
+            found.append(", ".join(pieces))
+    return found
+
+
+def _cost(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_itinerary_stops(detailed_itinerary: str) -> List[dict]:
+    """
+    Flatten a saved itinerary JSON into one dict per item with its day index, type,
+    texts, compliance, estimated cost and "City, State" (from the item subtitle, falling back to
+    the last city of the day label, e.g. "Day 1: San Francisco, California → Santa Barbara, California").
+    """
+    try:
+        itinerary = json.loads(detailed_itinerary or "{}")
+    except json.JSONDecodeError:
+        return []
+    if not isinstance(itinerary, dict):
+        return []
+
+    stops = []
+    for day_index, day in enumerate(itinerary.get("days") or []):
+        if not isinstance(day, dict):
+            continue
+        day_cities = city_mentions(day.get("dayLabel"))
+        for item in day.get("items") or []:
+            if not isinstance(item, dict):
+                continue
+            cities = city_mentions(item.get("subtitle")) or day_cities[-1:]
+            stops.append({
+                "day_index": day_index,
+                "type": item.get("type"),
+                "title": item.get("title"),
+                "subtitle": item.get("subtitle"),
+                "compliance": item.get("compliance"),
+                "compliance_note": item.get("complianceNote"),
+                "city_name": cities[0] if cities else None,
+                "estimated_cost": _cost(item.get("estimated_cost")),
+            })
+    return stops
+
+
+def sync_plan_stops(plan: Plan):
+    """
+    Rebuild the plan_stop rows of a plan from its detailed_itinerary.
+    Call this after creating a plan or changing detailed_itinerary.
+    """
+    stops = [PlanStop(position=position, **stop)
+             for position, stop in enumerate(parse_itinerary_stops(plan.detailed_itinerary))]
+    locations = locate_cities([stop.city_name or "" for stop in stops])
+    for stop, location in zip(stops, locations):
+        if location:
+            _, stop.latitude, stop.longitude = location
+    plan.stops = stops
+
+
+def delete_plan_stops(db, plan_ids):
+    """Bulk-delete the plan_stop rows of the given plans (a list or a plan_id subquery), return the count"""
+    return db.query(PlanStop).filter(PlanStop.plan_id.in_(plan_ids)).delete(synchronize_session=False)
+
+
+def remove_plan_pet(db, pet_id: int):
+    """
+    Drop a pet id from the pet_ids string of every plan linked to it, in one UPDATE,
+    so a later sync_plan_relations does not link the deleted pet again.
+    """
+    padded = literal(",") + func.replace(Plan.pet_ids, " ", "") + literal(",")
+    db.execute(
+        update(Plan)
+        .where(Plan.plan_id.in_(select(PlanPet.plan_id).where(PlanPet.pet_id == pet_id)))
+        .values(pet_ids=func.trim(func.replace(padded, f",{pet_id},", ","), ","), version=Plan.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def plan_city_names(plan: Plan, include_stops: bool = True) -> List[str]:
+    """Every city string of a plan: origin, destination, places passing by and itinerary stops"""
+    names = [plan.origin, plan.destination, *parse_places_passing_by(plan.places_passing_by)]
+    if include_stops:
+        names.extend(stop.city_name for stop in plan.stops)
+    return list(dict.fromkeys(name.strip() for name in names if name and name.strip()))
+
+
+def sync_plan_relations(plan: Plan):
+    """
+    Rebuild the plan_pets and plan_cities rows of a plan from its string columns,
+    placing each city on the map through the gazetteer.
+    Call this after creating a plan or changing pet_ids, destination or places_passing_by.
+    """
+    plan.pet_links = [PlanPet(pet_id=pet_id) for pet_id in parse_pet_ids(plan.pet_ids)]
+
+    city_links = []
+    if plan.destination:
+        city_links.append(PlanCity(position=0, role=DESTINATION, city_name=plan.destination))
+    for position, city in enumerate(parse_places_passing_by(plan.places_passing_by), start=1):
+        city_links.append(PlanCity(position=position, role=WAYPOINT, city_name=city))
+
+    for link, location in zip(city_links, locate_cities([link.city_name for link in city_links])):
+        if location:
+            _, link.latitude, link.longitude = location
+            link.geohash = encode_geohash(link.latitude, link.longitude)
+    plan.city_links = city_links
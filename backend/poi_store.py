@@ -0,0 +1,358 @@
+import csv
+import json
+import math
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from gazetteer import haversine_km, locate_cities
+from models import Poi
+from sqlalchemy import Integer, select, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+CATEGORIES = ("hotel", "restaurant", "vet", "pet_service", "park", "dog_beach")
+PET_POLICIES = ("approved", "conditional", "notAllowed")
+KM_PER_DEGREE = 111.32
+
+# Itinerary grounding: places offered to Gemini near the destination and along a road trip
+ITINERARY_CATEGORIES = ("hotel", "restaurant", "park", "dog_beach", "vet")
+DESTINATION_RADIUS_KM = 25.0
+DESTINATION_PER_CATEGORY = 4
+ROUTE_CATEGORIES = ("hotel", "restaurant", "park")
+ROUTE_RADIUS_KM = 15.0
+ROUTE_STEP_KM = 250.0
+ROUTE_PER_CATEGORY = 1
+MAX_CANDIDATES = 40
+
+# Ids in the poi_rtree index (models.POI_RTREE_DDL) overlapping any of a JSON list of
+# [south, north, west, east] boxes. CROSS JOIN keeps the boxes in the outer loop, so the
+# R-tree is probed once per box; with a plain JOIN (or an OR of boxes) SQLite scans it all.
+IDS_IN_BOXES = text(
+    "SELECT poi_rtree.id FROM json_each(:boxes) AS box CROSS JOIN poi_rtree "
+    "ON poi_rtree.max_lat >= json_extract(box.value, '$[0]') AND poi_rtree.min_lat <= json_extract(box.value, '$[1]') "
+    "AND poi_rtree.max_lng >= json_extract(box.value, '$[2]') AND poi_rtree.min_lng <= json_extract(box.value, '$[3]')"
+).columns(id=Integer)
+
+# Plain columns for lookups returning many places, where ORM objects are too slow
+PLACE_COLUMNS = (
+    Poi.poi_id, Poi.category, Poi.name, Poi.latitude, Poi.longitude, Poi.address, Poi.city_name,
+    Poi.pet_policy, Poi.pet_notes, Poi.open_24h, Poi.rating, Poi.phone, Poi.website, Poi.attributes,
+)
+
+POI_FIELDS = (
+    "category", "name", "latitude", "longitude", "address", "city_name",
+    "pet_policy", "pet_notes", "open_24h", "rating", "phone", "website",
+)
+
+
+def parse_poi(record: dict) -> Optional[dict]:
+    """
+    Normalize one imported record (CSV row or GeoJSON properties with coordinates) to
+    poi column values, or None when it lacks an id, name, known category or position.
+    Unknown keys are kept in `attributes`.
+    """
+    record = {key.strip().lower(): value for key, value in record.items() if key}
+    record.setdefault("city_name", record.pop("city", None))
+    try:
+        latitude, longitude = float(record["latitude"]), float(record["longitude"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    category = (record.get("category") or "").strip().lower()
+    source_id = str(record.pop("id", None) or record.pop("source_id", None) or "").strip()
+    if not source_id or not record.get("name") or category not in CATEGORIES:
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+
+    policy = record.get("pet_policy") or "approved"
+    try:
+        rating = float(record["rating"]) if record.get("rating") not in (None, "") else None
+    except ValueError:
+        rating = None
+    return {
+        "source_id": source_id,
+        "category": category,
+        "name": str(record["name"]).strip(),
+        "latitude": latitude,
+        "longitude": longitude,
+        "address": record.get("address") or None,
+        "city_name": record.get("city_name") or None,
+        "pet_policy": policy if policy in PET_POLICIES else "conditional",
+        "pet_notes": record.get("pet_notes") or None,
+        "open_24h": 1 if str(record.get("open_24h", "")).strip().lower() in ("1", "true", "yes", "24/7") else 0,
+        "rating": rating,
+        "phone": record.get("phone") or None,
+        "website": record.get("website") or None,
+        "attributes": {key: value for key, value in record.items() if key not in POI_FIELDS and value not in (None, "")}
+        or None,
+    }
+
+
+def read_csv(path: str) -> Iterator[dict]:
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def read_geojson(path: str) -> Iterator[dict]:
+    """Point features of a FeatureCollection as flat records"""
+    with open(path, encoding="utf-8") as f:
+        collection = json.load(f)
+    for feature in collection.get("features", []):
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") != "Point":
+            continue
+        longitude, latitude = geometry["coordinates"][:2]
+        record = dict(feature.get("properties") or {})
+        record.setdefault("id", feature.get("id"))
+        yield {**record, "latitude": latitude, "longitude": longitude}
+
+
+def import_pois(db: Session, records: Iterable[dict], batch_size: int = 1000) -> Tuple[int, int]:
+    """
+    Upsert records by source_id in batches (the R-tree follows through triggers) and
+    commit. Returns (imported, skipped).
+    """
+    imported = skipped = 0
+    batch = []
+
+    def flush():
+        statement = insert(Poi)
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[Poi.source_id],
+                set_={field: statement.excluded[field] for field in POI_FIELDS + ("attributes", "updated_at")},
+            ),
+            batch,
+        )
+        db.commit()
+
+    for record in records:
+        values = parse_poi(record)
+        if values is None:
+            skipped += 1
+            continue
+        batch.append({**values, "updated_at": datetime.utcnow()})
+        if len(batch) >= batch_size:
+            flush()
+            imported += len(batch)
+            batch = []
+    if batch:
+        flush()
+        imported += len(batch)
+    return imported, skipped
+
+
+def search_boxes(points: Sequence[Tuple[float, float]], radius_km: float) -> List[List[float]]:
+    """[south, north, west, east] of the squares around circles, split at the antimeridian"""
+    boxes = []
+    for latitude, longitude in points:
+        dlat = radius_km / KM_PER_DEGREE
+        dlng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+        south, north, west, east = latitude - dlat, latitude + dlat, longitude - dlng, longitude + dlng
+        if west < -180:
+            boxes += [[south, north, west + 360, 180.0], [south, north, -180.0, east]]
+        elif east > 180:
+            boxes += [[south, north, west, 180.0], [south, north, -180.0, east - 360]]
+        else:
+            boxes.append([south, north, west, east])
+    return boxes
+
+
+def ids_near_points(points: Sequence[Tuple[float, float]], radius_km: float):
+    """Select of the POI ids in the R-tree boxes around the points, one statement for any number"""
+    return IDS_IN_BOXES.bindparams(boxes=json.dumps(search_boxes(points, radius_km)))
+
+
+def place_dict(row) -> dict:
+    return {**row._mapping, "open_24h": bool(row.open_24h)}
+
+
+def places_near_points(
+    db: Session,
+    points: Sequence[Tuple[float, float]],
+    radius_km: float,
+    categories: Optional[Sequence[str]] = None,
+) -> List[dict]:
+    """
+    Places in the R-tree boxes around the points as dicts of PLACE_COLUMNS, unsorted.
+    The boxes are squares, so callers filter by exact distance.
+    """
+    if not points:
+        return []
+    query = select(*PLACE_COLUMNS).where(Poi.poi_id.in_(ids_near_points(points, radius_km)))
+    if categories:
+        query = query.where(Poi.category.in_(categories))
+    return [place_dict(row) for row in db.execute(query)]
+
+
+def locations_near_points(
+    db: Session,
+    points: Sequence[Tuple[float, float]],
+    radius_km: float,
+    categories: Optional[Sequence[str]] = None,
+    open_24h: bool = False,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Ids, latitudes and longitudes of the places in the R-tree boxes around the points.
+    For searches with many candidates: load the places that make the cut with places_by_id.
+    """
+    query = select(Poi.poi_id, Poi.latitude, Poi.longitude).where(Poi.poi_id.in_(ids_near_points(points, radius_km)))
+    if categories:
+        query = query.where(Poi.category.in_(categories))
+    if open_24h:
+        query = query.where(Poi.open_24h == 1)
+    rows = db.execute(query).all() if points else []
+    ids, lats, lngs = zip(*rows) if rows else ((), (), ())
+    return np.array(ids, dtype=np.int64), np.array(lats, dtype=float), np.array(lngs, dtype=float)
+
+
+def places_by_id(db: Session, ids: Sequence[int]) -> List[dict]:
+    """Places as dicts of PLACE_COLUMNS, in the order of ids"""
+    by_id = {row.poi_id: place_dict(row) for row in db.execute(select(*PLACE_COLUMNS).where(Poi.poi_id.in_(ids)))}
+    return [by_id[poi_id] for poi_id in ids]
+
+
+def pois_near_points(
+    db: Session,
+    points: Sequence[Tuple[float, float]],
+    radius_km: float,
+    categories: Optional[Sequence[str]] = None,
+) -> List[List[Tuple[Poi, float]]]:
+    """
+    For each point, the POIs within radius_km as (poi, distance km), nearest first.
+    One query for all points.
+    """
+    if not points:
+        return []
+    query = db.query(Poi).filter(Poi.poi_id.in_(ids_near_points(points, radius_km)))
+    if categories:
+        query = query.filter(Poi.category.in_(categories))
+    pois = query.all()
+    lats, lngs = [poi.latitude for poi in pois], [poi.longitude for poi in pois]
+
+    results = []
+    for latitude, longitude in points:
+        distances = haversine_km(latitude, longitude, lats, lngs) if pois else []
+        results.append(sorted(
+            ((poi, float(distance)) for poi, distance in zip(pois, distances) if distance <= radius_km),
+            key=lambda pair: (pair[1], pair[0].poi_id),
+        ))
+    return results
+
+
+def pois_near(
+    db: Session,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    categories: Optional[Sequence[str]] = None,
+) -> List[Tuple[Poi, float]]:
+    """POIs within radius_km of a point as (poi, distance km), nearest first"""
+    return pois_near_points(db, [(latitude, longitude)], radius_km, categories)[0]
+
+
+def best_per_category(nearby: List[Tuple[Poi, float]], categories: Sequence[str], count: int) -> List[Poi]:
+    """Top `count` places per category that allow pets, by rating then distance"""
+    chosen = []
+    for category in categories:
+        places = [
+            (poi, distance) for poi, distance in nearby
+            if poi.category == category and poi.pet_policy != "notAllowed"
+        ]
+        places.sort(key=lambda pair: (-(pair[0].rating or 0), pair[1]))
+        chosen += [poi for poi, _ in places[:count]]
+    return chosen
+
+
+def route_points(start: Tuple[float, float], end: Tuple[float, float]) -> List[Tuple[float, float]]:
+    """Points every ~ROUTE_STEP_KM on the straight line between two places, ends excluded"""
+    distance = float(haversine_km(start[0], start[1], [end[0]], [end[1]])[0])
+    steps = int(distance // ROUTE_STEP_KM)
+    return [
+        (start[0] + (end[0] - start[0]) * i / (steps + 1), start[1] + (end[1] - start[1]) * i / (steps + 1))
+        for i in range(1, steps + 1)
+    ]
+
+
+def candidate_dict(poi: Poi) -> dict:
+    return {
+        "id": poi.poi_id,
+        "category": poi.category,
+        "name": poi.name,
+        "address": poi.address,
+        "city_name": poi.city_name,
+        "pet_policy": poi.pet_policy,
+        "pet_notes": poi.pet_notes,
+    }
+
+
+def itinerary_candidates(db: Session, destination: str, origin: Optional[str] = None) -> List[dict]:
+    """
+    Real places to build an itinerary from: the best rated per category around the
+    destination and, when an origin is given (road trips), a few along the way.
+    Empty when the cities are not in the gazetteer or no POIs are nearby.
+    """
+    destination_location, origin_location = locate_cities([destination, origin or ""])
+    if not destination_location:
+        return []
+    _, latitude, longitude = destination_location
+    nearby = pois_near(db, latitude, longitude, DESTINATION_RADIUS_KM, ITINERARY_CATEGORIES)
+    chosen = best_per_category(nearby, ITINERARY_CATEGORIES, DESTINATION_PER_CATEGORY)
+
+    if origin_location:
+        points = route_points(origin_location[1:], (latitude, longitude))
+        for nearby in pois_near_points(db, points, ROUTE_RADIUS_KM, ROUTE_CATEGORIES):
+            chosen += best_per_category(nearby, ROUTE_CATEGORIES, ROUTE_PER_CATEGORY)
+
+    unique = {poi.poi_id: poi for poi in chosen}
+    return [candidate_dict(poi) for poi in list(unique.values())[:MAX_CANDIDATES]]
+
+
+def candidates_prompt(candidates: List[dict]) -> str:
+    """Prompt section listing candidate places, one compact line each"""
+    if not candidates:
+        return ""
+    lines = "\n".join(
+        f"{c['id']}|{c['category']}|{c['name']}|{c['city_name'] or ''}|{c['pet_notes'] or c['pet_policy']}"
+        for c in candidates
+    )
+    return f"""
+VERIFIED PET-FRIENDLY PLACES (id|category|name|city|pet policy):
+{lines}
+- Prefer these places for accommodation, dining and activity items
+- For an item at one of these places output ONLY {{"id", "time", "type", "poi": <place id>, "estimated_cost"}};
+  title, subtitle and compliance are filled in from the record
+- Use a free-form item only when no listed place fits
+"""
+
+
+def expand_poi_references(itinerary: dict, candidates: List[dict]) -> dict:
+    """
+    Fill items that reference a candidate ("poi": id) with the place's name, location and
+    pet policy. Items referencing an id that was not offered are dropped.
+    """
+    by_id = {candidate["id"]: candidate for candidate in candidates}
+    for day in itinerary.get("days", []):
+        items = []
+        for item in day.get("items", []):
+            if "poi" not in item:
+                items.append(item)
+                continue
+            try:
+                place = by_id.get(int(item.pop("poi")))
+            except (TypeError, ValueError):
+                place = None
+            if place is None:
+                continue
+            location = " • ".join(part for part in (place["city_name"], place["address"]) if part)
+            item.update({
+                "title": place["name"],
+                "subtitle": location or place["category"],
+                "compliance": place["pet_policy"],
+                "complianceNote": place["pet_notes"],
+                "poi_id": place["id"],
+            })
+            items.append(item)
+        day["items"] = items
+    return itinerary
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Remove soft-deleted users and plans for good: their photos, stops, cities, pet links,
+search entries, pets and the blob files nothing else points at. Work is done in small
+transactions so the SQLite write lock is never held for long, and each DeletionJob
+records its progress. Runs in a background thread of the API; run this file to work
+off pending jobs by hand.
+"""
+
+import os
+import threading
+from datetime import datetime
+from typing import Iterable
+
+from blob_store import blob_name_from_url, delete_blob
+from models import DeletionJob, MemoryPhoto, Pet, Plan, PlanCity, PlanPet, User
+from plan_relations import delete_plan_stops
+from search_index import unindex_plans
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+REAP_BATCH_SIZE = int(os.getenv("REAP_BATCH_SIZE", "500"))  # Photos per transaction
+PLANS_PER_BATCH = 20  # Plans per transaction, with their stops, cities and pet links
+REAP_INTERVAL_SECONDS = float(os.getenv("REAP_INTERVAL_SECONDS", "60"))
+
+PHOTO_URL_COLUMNS = (MemoryPhoto.local_path, MemoryPhoto.thumbnail_path, MemoryPhoto.medium_path, MemoryPhoto.webp_path)
+BLOB_URL_COLUMNS = PHOTO_URL_COLUMNS + (Pet.image_url, Pet.avatar_url, User.avatar_url)
+
+_wake = threading.Event()
+_stop = threading.Event()
+_thread = None
+
+
+def reaper_session(bind) -> Session:
+    """A session that sees soft-deleted rows"""
+    return Session(bind=bind, info={"include_deleted": True})
+
+
+def delete_unreferenced_blobs(db: Session, urls: Iterable[str]) -> int:
+    """Delete the blob files behind `urls` that no remaining row points at (blobs are shared by content)"""
+    urls = {url for url in urls if blob_name_from_url(url)}
+    if not urls:
+        return 0
+    referenced = set()
+    for column in BLOB_URL_COLUMNS:
+        referenced.update(blob_name_from_url(url) for url in db.scalars(select(column).where(column.in_(urls))))
+    names = {blob_name_from_url(url) for url in urls} - referenced
+    return sum(delete_blob(name) for name in names)
+
+
+def record_progress(db: Session, job: DeletionJob, rows: int = 0, blobs: int = 0):
+    job.rows_deleted += rows
+    job.blobs_deleted += blobs
+    job.updated_at = datetime.utcnow()
+    db.commit()
+
+
+def reap_photos(db: Session, job: DeletionJob, condition, batch_size: int):
+    while True:
+        rows = db.execute(
+            select(MemoryPhoto.photo_id, *PHOTO_URL_COLUMNS).where(condition).order_by(MemoryPhoto.photo_id).limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        db.query(MemoryPhoto).filter(MemoryPhoto.photo_id.in_([row.photo_id for row in rows])).delete(
+            synchronize_session=False
+        )
+        record_progress(db, job, rows=len(rows))
+        # Files go only once the rows are gone for good
+        blobs = delete_unreferenced_blobs(db, [url for row in rows for url in row[1:]])
+        if blobs:
+            record_progress(db, job, blobs=blobs)
+
+
+def reap_plans(db: Session, job: DeletionJob, condition):
+    while True:
+        plan_ids = db.scalars(select(Plan.plan_id).where(condition).order_by(Plan.plan_id).limit(PLANS_PER_BATCH)).all()
+        if not plan_ids:
+            return
+        deleted = delete_plan_stops(db, plan_ids)
+        for model in (PlanCity, PlanPet):
+            deleted += db.query(model).filter(model.plan_id.in_(plan_ids)).delete(synchronize_session=False)
+        unindex_plans(db, plan_ids)
+        deleted += db.query(Plan).filter(Plan.plan_id.in_(plan_ids)).delete(synchronize_session=False)
+        record_progress(db, job, rows=deleted)
+
+
+def reap_user(db: Session, job: DeletionJob, user_id: int, batch_size: int):
+    user_plans = select(Plan.plan_id).where(Plan.user_id == user_id)
+    reap_photos(db, job, or_(MemoryPhoto.user_id == user_id, MemoryPhoto.trip_id.in_(user_plans)), batch_size)
+    reap_plans(db, job, Plan.user_id == user_id)
+
+    # A user has a handful of pets: one transaction for them and the user row
+    pets = db.execute(select(Pet.pet_id, Pet.image_url, Pet.avatar_url).where(Pet.user_id == user_id)).all()
+    pet_ids = [pet.pet_id for pet in pets]
+    deleted = db.query(PlanPet).filter(PlanPet.pet_id.in_(pet_ids)).delete(synchronize_session=False)
+    deleted += db.query(Pet).filter(Pet.pet_id.in_(pet_ids)).delete(synchronize_session=False)
+    avatar = db.scalar(select(User.avatar_url).where(User.user_id == user_id))
+    deleted += db.query(User).filter(User.user_id == user_id).delete(synchronize_session=False)
+    record_progress(db, job, rows=deleted)
+    blobs = delete_unreferenced_blobs(db, [avatar, *(url for pet in pets for url in pet[1:])])
+    if blobs:
+        record_progress(db, job, blobs=blobs)
+
+
+def reap_job(db: Session, job: DeletionJob, batch_size: int = REAP_BATCH_SIZE):
+    """Work a job off; it can be resumed after a crash since every step only deletes what is left"""
+    model = User if job.entity == "user" else Plan
+    key = User.user_id if job.entity == "user" else Plan.plan_id
+    # Never touch an entity that is not (or no longer) soft-deleted
+    if db.scalar(select(key).where(key == job.entity_id, model.deleted_at.is_(None))) is None:
+        job.status = "running"
+        record_progress(db, job)
+        if job.entity == "user":
+            reap_user(db, job, job.entity_id, batch_size)
+        else:
+            reap_photos(db, job, MemoryPhoto.trip_id == job.entity_id, batch_size)
+            reap_plans(db, job, Plan.plan_id == job.entity_id)
+    job.status = "done"
+    job.finished_at = datetime.utcnow()
+    record_progress(db, job)
+
+
+def reap_pending(bind, batch_size: int = REAP_BATCH_SIZE) -> int:
+    """Run every unfinished deletion job, oldest first; returns how many finished"""
+    finished = 0
+    with reaper_session(bind) as db:
+        jobs = db.query(DeletionJob).filter(DeletionJob.status != "done").order_by(DeletionJob.job_id).all()
+        for job in jobs:
+            try:
+                reap_job(db, job, batch_size)
+                finished += 1
+            except Exception as e:
+                db.rollback()
+                print(f"Deletion job {job.job_id} failed, will retry: {e}")
+    return finished
+
+
+def start_reaper(bind, interval: float = REAP_INTERVAL_SECONDS):
+    """Reap in a background thread every `interval` seconds, and whenever wake_reaper() is called"""
+    global _thread
+    if _thread is not None:
+        return
+    _stop.clear()
+
+    def run():
+        while not _stop.is_set():
+            _wake.clear()
+            reap_pending(bind)
+            _wake.wait(interval)
+
+    _thread = threading.Thread(target=run, name="reaper", daemon=True)
+    _thread.start()
+
+
+def wake_reaper():
+    """Ask the background reaper to run now (no-op when it is not running)"""
+    _wake.set()
+
+
+def shutdown():
+    global _thread
+    if _thread is None:
+        return
+    _stop.set()
+    _wake.set()
+    _thread.join()
+    _thread = None
+
+
+if __name__ == "__main__":
+    from database import engine, init_db
+
+    init_db()
+    print(f"✓ {reap_pending(engine)} deletion jobs finished")
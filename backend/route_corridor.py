@@ -0,0 +1,121 @@
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from gazetteer import EARTH_RADIUS_KM, locate_cities, to_unit_vectors
+from models import Plan
+from pagination import decode_cursor, encode_cursor
+from plan_relations import parse_places_passing_by
+from poi_store import locations_near_points, places_by_id
+from sqlalchemy.orm import Session
+
+DEFAULT_CORRIDOR_KM = 16.0  # ~10 miles
+MAX_CORRIDOR_KM = 50.0
+# Candidates come from R-tree boxes around points sampled every radius km along the route;
+# long routes get sparser (and larger) boxes so one query never probes more than this many
+MAX_PROBES = 1000
+
+
+def plan_route(plan: Plan) -> List[Tuple[float, float]]:
+    """
+    (latitude, longitude) of the plan's waypoints in travel order: origin, places passing
+    by, destination. Cities missing from the gazetteer are skipped.
+    """
+    names = [plan.origin, *parse_places_passing_by(plan.places_passing_by), plan.destination]
+    route = []
+    for location in locate_cities([name or "" for name in names]):
+        if location and (not route or route[-1] != location[1:]):
+            route.append(location[1:])
+    return route
+
+
+def slerp(start: np.ndarray, end: np.ndarray, angle: float, fractions: np.ndarray) -> np.ndarray:
+    """Unit vectors at the given fractions of the great-circle arc from start to end"""
+    weights_start = np.sin((1 - fractions) * angle) / np.sin(angle)
+    weights_end = np.sin(fractions * angle) / np.sin(angle)
+    return np.outer(weights_start, start) + np.outer(weights_end, end)
+
+
+def probe_points(vertices: np.ndarray, angles: np.ndarray, step_km: float) -> List[Tuple[float, float]]:
+    """Points at most step_km apart along every leg of the route"""
+    points = [vertices[:1]]
+    for i, angle in enumerate(angles):
+        pieces = max(1, math.ceil(angle * EARTH_RADIUS_KM / step_km))
+        points.append(slerp(vertices[i], vertices[i + 1], angle, np.arange(1, pieces + 1) / pieces))
+    points = np.vstack(points)
+    lats = np.degrees(np.arcsin(np.clip(points[:, 2], -1, 1)))
+    lngs = np.degrees(np.arctan2(points[:, 1], points[:, 0]))
+    return list(zip(lats.tolist(), lngs.tolist()))
+
+
+def route_positions(
+    vertices: np.ndarray, angles: np.ndarray, points: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Distance in km from each point (unit vectors) to the route, and how far along the
+    route (km from the origin) its nearest spot is. Computed for all points against all
+    legs at once: the distance to a leg is the distance to its great circle when the
+    point projects inside the arc, else to the nearer end.
+    """
+    starts, ends = vertices[:-1], vertices[1:]
+    normals = np.cross(starts, ends)
+    normals /= np.linalg.norm(normals, axis=1)[:, None]
+    towards_end = np.cross(normals, starts)
+
+    along = np.arctan2(points @ towards_end.T, points @ starts.T)
+    off_circle = np.arcsin(np.clip(np.abs(points @ normals.T), 0, 1))
+    to_start = np.arccos(np.clip(points @ starts.T, -1, 1))
+    to_end = np.arccos(np.clip(points @ ends.T, -1, 1))
+    inside = (along >= 0) & (along <= angles)
+    distances = np.where(inside, off_circle, np.minimum(to_start, to_end))
+
+    leg = np.argmin(distances, axis=1)
+    rows = np.arange(len(points))
+    leg_offsets = np.concatenate(([0.0], np.cumsum(angles)[:-1]))
+    progress = leg_offsets[leg] + np.clip(along[rows, leg], 0, angles[leg])
+    return distances[rows, leg] * EARTH_RADIUS_KM, progress * EARTH_RADIUS_KM
+
+
+def corridor_places(
+    db: Session,
+    route: Sequence[Tuple[float, float]],
+    radius_km: float,
+    categories: Optional[Sequence[str]] = None,
+    open_24h: bool = False,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    One page of the places within radius_km of the route (at least two waypoints joined
+    by great-circle legs), in the order they are passed, each with its distance_km from
+    the route and progress_km along it. Returns the places and the next page's cursor.
+    """
+    vertices = to_unit_vectors([lat for lat, _ in route], [lng for _, lng in route])
+    angles = np.arccos(np.clip(np.sum(vertices[:-1] * vertices[1:], axis=1), -1, 1))
+    length_km = float(angles.sum()) * EARTH_RADIUS_KM
+    # A box of half-side radius + step / 2 around every probe covers the corridor
+    step_km = max(radius_km, length_km / MAX_PROBES)
+    probes = probe_points(vertices, angles, step_km)
+    ids, lats, lngs = locations_near_points(db, probes, radius_km + step_km / 2, categories, open_24h)
+    if not len(ids):
+        return [], None
+
+    distances, progress = route_positions(vertices, angles, to_unit_vectors(lats, lngs))
+    # Round so the cursor round-trips through JSON exactly
+    distances, progress = np.round(distances, 6), np.round(progress, 6)
+    keep = distances <= radius_km
+    if cursor:
+        after_progress, after_id = decode_cursor(cursor, [float, int])
+        keep &= (progress > after_progress) | ((progress == after_progress) & (ids > after_id))
+
+    # Only the places of this page are loaded in full
+    indexes = np.flatnonzero(keep)
+    order = indexes[np.lexsort((ids[indexes], progress[indexes]))][: limit + 1]
+    page = [
+        {**place, "distance_km": float(distances[i]), "progress_km": float(progress[i])}
+        for i, place in zip(order, places_by_id(db, ids[order].tolist()))
+    ]
+    if len(page) > limit:
+        page = page[:limit]
+        return page, encode_cursor([page[-1]["progress_km"], page[-1]["poi_id"]])
+    return page, None
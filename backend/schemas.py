@@ -1,7 +1,7 @@
-from datetime import date
-from typing import List, Optional
+from datetime import date, datetime
+from typing import Any, List, Literal, Optional
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
 
 # User Schemas
@@ -133,11 +133,53 @@ class PlanUpdate(BaseModel):
 class PlanResponse(PlanBase):
     plan_id: int
     user_id: int
+    version: int = 1  # Also sent as the ETag; send it back in If-Match to edit the plan
 
     class Config:
         from_attributes = True
 
 
+class JsonPatchOperation(BaseModel):
+    """One RFC 6902 operation; paths are JSON Pointers into the itinerary, e.g. /days/0/items/2/title"""
+    op: Literal["add", "remove", "replace", "move", "copy", "test"]
+    path: str
+    value: Any = None
+    from_: Optional[str] = Field(None, alias="from")  # For move and copy
+
+
+class PlanSummary(BaseModel):
+    """Plan without detailed_itinerary, for list screens"""
+    plan_id: int
+    user_id: int
+    start_date: date
+    end_date: date
+    trip_type: Optional[str] = None
+    is_round_trip: Optional[bool] = False
+    destination: Optional[str] = None
+    places_passing_by: Optional[str] = None
+    num_humans: int = 1
+    num_adults: int = 1
+    num_children: int = 0
+    budget: Optional[float] = None
+    origin: Optional[str] = None
+    pet_ids: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class PlanSearchResult(PlanSummary):
+    """Plan matching a search; highlights are HTML-escaped with matches wrapped in <mark>"""
+    score: float  # Higher is better
+    destination_highlight: str
+    snippet: str  # Matching part of the itinerary
+
+
+class PlanListItem(PlanSummary):
+    """Plan in a list response; detailed_itinerary is only set with ?include=itinerary"""
+    detailed_itinerary: Optional[str] = None
+
+
 # Combined Response Schemas
 class UserWithPets(UserResponse):
     pets: List[PetResponse] = []
@@ -147,7 +189,7 @@ class UserWithPets(UserResponse):
 
 
 class UserWithPlans(UserResponse):
-    plans: List[PlanResponse] = []
+    plans: List[PlanSummary] = []
 
     class Config:
         from_attributes = True
@@ -155,7 +197,10 @@ class UserWithPlans(UserResponse):
 
 class UserFull(UserResponse):
     pets: List[PetResponse] = []
-    plans: List[PlanResponse] = []
+    plans: List[PlanSummary] = []
+    # Cursors for /api/users/{user_id}/pets and /plans when the lists were truncated
+    pets_next_cursor: Optional[str] = None
+    plans_next_cursor: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -167,10 +212,12 @@ class ItineraryGenerateRequest(BaseModel):
     destination: str
     start_date: str
     end_date: str
-    pet_id: int
+    pet_id: Optional[int] = None
+    pet_ids: Optional[List[int]] = None  # Several pets traveling together, instead of pet_id
     num_adults: int = 2
     num_children: int = 0
     budget: Optional[float] = None
+    reuse: bool = False  # Opt in to adapting another user's itinerary for a similar request
 
 
 class RoadTripGenerateRequest(BaseModel):
@@ -178,11 +225,14 @@ class RoadTripGenerateRequest(BaseModel):
     destination: str
     start_date: str
     end_date: str
-    pet_id: int
+    pet_id: Optional[int] = None
+    pet_ids: Optional[List[int]] = None  # Several pets traveling together, instead of pet_id
     num_adults: int = 2
     num_children: int = 0
     is_round_trip: bool = False
     budget: Optional[float] = None
+    reuse: bool = False
+    vehicle: Optional[str] = None  # drive_estimator.MPG_BY_VEHICLE key (any case), "sedan" by default
 
 
 class ItineraryAlert(BaseModel):
@@ -199,6 +249,11 @@ class ItineraryItem(BaseModel):
     compliance: str
     complianceNote: Optional[str] = None
     estimated_cost: Optional[float] = None
+    poi_id: Optional[int] = None  # Local place the item was built from
+    # Road trip drives, estimated locally (drive_estimator)
+    distance_miles: Optional[float] = None
+    drive_hours: Optional[float] = None
+    fuel_cost: Optional[float] = None  # Part of estimated_cost, which also covers tolls and ferries
 
 
 class ItineraryDay(BaseModel):
@@ -212,6 +267,55 @@ class ItineraryResponse(BaseModel):
     days: List[ItineraryDay]
     total_estimated_cost: Optional[float] = None
     budget: Optional[float] = None
+    # Set when adapted from an itinerary generated for a similar earlier request
+    reused_from: Optional[int] = None
+    similarity: Optional[float] = None
+
+
+class BudgetFitRequest(BaseModel):
+    itinerary: ItineraryResponse
+    budget: float = Field(..., gt=0)
+    num_adults: int = 2
+    num_children: int = 0
+
+
+class BudgetFitChange(BaseModel):
+    day: int  # 1-based
+    item_id: str
+    action: str  # "rescaled" (cheaper class, same place) or "substituted"
+    title: str
+    previous_title: str
+    estimated_cost: float
+    previous_cost: float
+
+
+class BudgetFitResponse(BaseModel):
+    itinerary: ItineraryResponse
+    changes: List[BudgetFitChange]
+    within_budget: bool
+
+
+class DeletionJobResponse(BaseModel):
+    """Background removal of a deleted user or plan"""
+    job_id: int
+    entity: str  # "user" or "plan"
+    entity_id: int
+    status: str  # "pending", "running" or "done"
+    rows_deleted: int
+    blobs_deleted: int
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+# Blob Schemas
+class BlobResponse(BaseModel):
+    name: str  # <sha256>.<ext>
+    url: str
+    size: int
 
 
 # Memory Photo Schemas
@@ -220,22 +324,47 @@ class MemoryPhotoBase(BaseModel):
     city_name: Optional[str] = None
 
 
-class MemoryPhotoCreate(MemoryPhotoBase):
+class MemoryPhotoDetails(MemoryPhotoBase):
+    # EXIF read on the device; a GPS position stores the canonical "City, State" in
+    # location_city_name, which fills city_name only when the client left it empty
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+    taken_at: Optional[datetime] = None
+
+
+class MemoryPhotoCreate(MemoryPhotoDetails):
     trip_id: int
     user_id: int
 
 
+class MemoryPhotoBulkCreate(BaseModel):
+    trip_id: int
+    user_id: int
+    photos: List[MemoryPhotoDetails] = Field(..., min_length=1, max_length=500)
+
+
 class MemoryPhotoResponse(MemoryPhotoBase):
     photo_id: int
     trip_id: int
     user_id: int
     created_at: str
+    original_path: Optional[str] = None  # local_path may point at a smaller variant
+    width: Optional[int] = None
+    height: Optional[int] = None
+    variants_status: Optional[str] = None  # "pending", "ready" or "failed" for server uploads
+    thumbnail_path: Optional[str] = None
+    medium_path: Optional[str] = None
+    webp_path: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    location_city_name: Optional[str] = None  # Canonical "City, State" of the GPS position
+    taken_at: Optional[str] = None
 
     class Config:
         from_attributes = True
 
 
-class PastTripResponse(PlanResponse):
+class PastTripResponse(PlanListItem):
     """Extended plan response with photo metadata for past trips"""
     cover_photo: Optional[str] = None  # URL/path of cover photo
     photo_count: int = 0
@@ -254,3 +383,68 @@ class VisitedCityResponse(BaseModel):
     class Config:
         from_attributes = True
 
+
+class PlanStopResponse(BaseModel):
+    """One itinerary item of a saved plan"""
+    position: int
+    day_index: int
+    type: Optional[str] = None
+    title: Optional[str] = None
+    city_name: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    estimated_cost: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ExplorePlaceResponse(BaseModel):
+    """A pet-friendly place of an explore screen"""
+    poi_id: int
+    category: str  # "hotel", "restaurant", "vet", "pet_service", "park" or "dog_beach"
+    name: str
+    latitude: float
+    longitude: float
+    distance_km: float
+    address: Optional[str] = None
+    city_name: Optional[str] = None
+    pet_policy: str  # "approved", "conditional" or "notAllowed"
+    pet_notes: Optional[str] = None
+    open_24h: bool = False
+    rating: Optional[float] = None
+    phone: Optional[str] = None
+    website: Optional[str] = None
+    attributes: Optional[dict] = None
+
+
+class CorridorPlaceResponse(ExplorePlaceResponse):
+    """A place near a plan's route; distance_km is measured from the route"""
+    progress_km: float  # Along the route from the origin
+
+
+class GeoCityRequest(BaseModel):
+    cities: List[str] = Field(..., max_length=200)  # Free-form city strings, e.g. "Boston, MA"
+
+
+class GeoCityResponse(BaseModel):
+    query: str  # City string as sent / stored on the plan
+    name: Optional[str] = None  # Canonical "City, State"; None when it could not be resolved
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    source: Optional[str] = None  # "gazetteer", "google", "pending" or "unresolved"
+
+
+class CityClusterResponse(BaseModel):
+    """Visited cities grouped into one map marker"""
+    geohash: str  # Cell the cluster covers
+    latitude: float  # Centroid of the cities in the cluster
+    longitude: float
+    bounds: List[float]  # [west, south, east, north] of the cities, to zoom into the cluster
+    city_count: int
+    trip_count: int
+    city_name: Optional[str] = None  # Set when the cluster is a single city
+    photo_count: int = 0
+    cover_photo_id: Optional[int] = None  # Newest photo taken in the cluster's cities
+    cover_photo: Optional[str] = None  # Thumbnail URL/path of that photo
+
@@ -0,0 +1,137 @@
+import html
+import re
+from typing import List
+
+from models import Plan
+from plan_relations import parse_places_passing_by
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Searchable columns of the plan_search table (after owner) and their ranking weights
+COLUMN_WEIGHTS = {"destination": 10.0, "origin": 3.0, "places": 5.0, "itinerary": 1.0}
+BM25_K1, BM25_B = 1.2, 0.75
+# Snippet markers that cannot occur in text, swapped for <mark> after HTML-escaping
+MARK_START, MARK_END = "\x02", "\x03"
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def plan_document(plan: Plan) -> dict:
+    """Searchable text of a plan; the itinerary part comes from its plan_stop rows"""
+    itinerary = "\n".join(
+        " • ".join(part for part in (stop.title, stop.subtitle, stop.compliance_note) if part)
+        for stop in plan.stops
+    )
+    return {
+        "plan_id": plan.plan_id,
+        "owner": f"u{plan.user_id}",
+        "destination": plan.destination or "",
+        "origin": plan.origin or "",
+        "places": "; ".join(parse_places_passing_by(plan.places_passing_by)),
+        "itinerary": itinerary,
+    }
+
+
+def index_plans(db: Session, plans: List[Plan]):
+    """
+    (Re)index plans after they were created or their destination, origin, places or
+    itinerary changed. Plans must have been flushed so they have a plan_id.
+    """
+    if not plans:
+        return
+    # FTS5 honours OR REPLACE on the rowid, so reindexing is a single statement
+    db.execute(
+        text(
+            "INSERT OR REPLACE INTO plan_search (rowid, owner, destination, origin, places, itinerary) "
+            "VALUES (:plan_id, :owner, :destination, :origin, :places, :itinerary)"
+        ),
+        [plan_document(plan) for plan in plans],
+    )
+
+
+def unindex_plans(db: Session, plan_ids: List[int]):
+    """Remove plans from the search index"""
+    if plan_ids:
+        db.execute(text("DELETE FROM plan_search WHERE rowid = :plan_id"), [{"plan_id": i} for i in plan_ids])
+
+
+def match_expression(query: str) -> str:
+    """
+    Turn free text into a safe FTS5 query in which every word must match (as a
+    porter stem, so "breweries" finds "brewery"). Returns "" when there are no words.
+    """
+    return " ".join(f'"{token}"' for token in TOKEN_RE.findall(query))
+
+
+def highlight(fragment: str) -> str:
+    return html.escape(fragment or "").replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+
+def itinerary_snippet(itinerary: str) -> str:
+    """The first itinerary stop (one per line) with a match, or "" """
+    for line in itinerary.splitlines():
+        if MARK_START in line:
+            return line
+    return ""
+
+
+def bm25_scores(rows) -> List[float]:
+    """
+    Weighted BM25 term frequency part per row, counting the marks highlight() put around
+    matched tokens and using text length for length normalization. FTS5's bm25() also
+    needs table-wide match counts for its IDF part, which scans every user's matches on
+    each query; all rows here contain every query word anyway, so the per-column
+    frequencies are what orders them.
+    """
+    columns = list(COLUMN_WEIGHTS)
+    lengths = [[len(getattr(row, column)) for column in columns] for row in rows]
+    average = [max(sum(column) / len(rows), 1.0) for column in zip(*lengths)]
+
+    scores = []
+    for row, row_lengths in zip(rows, lengths):
+        score = 0.0
+        for i, column in enumerate(columns):
+            frequency = getattr(row, column).count(MARK_START)
+            if frequency:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * row_lengths[i] / average[i])
+                score += COLUMN_WEIGHTS[column] * frequency * (BM25_K1 + 1) / (frequency + norm)
+        scores.append(score)
+    return scores
+
+
+def search_plans(db: Session, user_id: int, query: str, limit: int) -> List[dict]:
+    """
+    Best matching plans of a user, best first: [{plan_id, score, destination, snippet}].
+    destination and the itinerary snippet are HTML-escaped with matched words in <mark>.
+    """
+    expression = match_expression(query)
+    if not expression:
+        return []
+
+    # Only this user's matches are read, so the cost follows their plan count, not the table's
+    highlights = ", ".join(
+        f"highlight(plan_search, {i}, :start, :end) AS {column}" for i, column in enumerate(COLUMN_WEIGHTS, 1)
+    )
+    rows = db.execute(
+        text(
+            f"SELECT rowid AS plan_id, {highlights} FROM plan_search WHERE plan_search MATCH :match"
+        ),
+        {
+            "start": MARK_START,
+            "end": MARK_END,
+            # The user's words never match the owner column
+            "match": f"owner:u{int(user_id)} AND {{destination origin places itinerary}}: ({expression})",
+        },
+    ).all()
+    if not rows:
+        return []
+
+    ranked = sorted(zip(bm25_scores(rows), rows), key=lambda pair: (-pair[0], pair[1].plan_id))[:limit]
+    return [
+        {
+            "plan_id": row.plan_id,
+            "score": score,
+            "destination": highlight(row.destination),
+            "snippet": highlight(itinerary_snippet(row.itinerary)),
+        }
+        for score, row in ranked
+    ]
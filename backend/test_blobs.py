@@ -0,0 +1,83 @@
+import base64
+
+from blob_store import blob_path
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n fake avatar"
+DATA_URL = "data:image/png;base64," + base64.b64encode(PNG_BYTES).decode()
+
+
+def test_create_pet_moves_data_url_into_blob_store(client, db_session):
+    from conftest import seed_user
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+
+    pet = client.post("/api/pets", json={"user_id": user_id, "name": "Mochi", "avatar_url": DATA_URL}).json()
+
+    # Absolute, since the frontend is served from another origin
+    assert pet["avatar_url"].startswith("http://testserver/api/blobs/")
+    response = client.get(pet["avatar_url"])
+    assert response.status_code == 200
+    assert response.content == PNG_BYTES
+    assert response.headers["content-type"] == "image/png"
+    assert "immutable" in response.headers["cache-control"]
+
+
+def test_identical_uploads_are_stored_once(client, blob_dir):
+    first = client.post("/api/blobs", files={"file": ("a.png", PNG_BYTES, "image/png")}).json()
+    second = client.post("/api/blobs", files={"file": ("b.png", PNG_BYTES, "image/png")}).json()
+
+    assert first["name"] == second["name"]
+    assert len([p for p in blob_dir.rglob("*") if p.is_file()]) == 1
+    with open(blob_path(first["name"]), "rb") as f:
+        assert f.read() == PNG_BYTES
+
+
+def test_oversized_upload_is_rejected_without_leftovers(client, blob_dir, monkeypatch):
+    monkeypatch.setattr("blob_store.MAX_BLOB_BYTES", 8)
+    monkeypatch.setattr("main.UPLOAD_CHUNK_SIZE", 4)
+
+    response = client.post("/api/blobs", files={"file": ("a.png", PNG_BYTES, "image/png")})
+
+    assert response.status_code == 400
+    assert not [p for p in blob_dir.rglob("*") if p.is_file()]
+
+
+def test_blob_conditional_get(client):
+    blob = client.post("/api/blobs", files={"file": ("a.png", PNG_BYTES, "image/png")}).json()
+    etag = client.get(blob["url"]).headers["etag"]
+
+    response = client.get(blob["url"], headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_blob_rejects_non_images_and_unknown_names(client):
+    upload = client.post("/api/blobs", files={"file": ("a.txt", b"hello", "text/plain")})
+    assert upload.status_code == 400
+    assert client.get("/api/blobs/not-a-blob.png").status_code == 404
+    assert client.get("/api/blobs/" + "0" * 64 + ".png").status_code == 404
+
+
+def test_blob_range_requests(client):
+    data = bytes(range(256)) * 4
+    blob = client.post("/api/blobs", files={"file": ("a.png", data, "image/png")}).json()
+
+    partial = client.get(blob["url"], headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.content == data[10:20]
+    assert partial.headers["content-range"] == f"bytes 10-19/{len(data)}"
+
+    suffix = client.get(blob["url"], headers={"Range": "bytes=-5"})
+    assert suffix.content == data[-5:]
+
+    open_ended = client.get(blob["url"], headers={"Range": "bytes=1000-"})
+    assert open_ended.content == data[1000:]
+
+    unsatisfiable = client.get(blob["url"], headers={"Range": f"bytes={len(data)}-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{len(data)}"
+
+    # A stale If-Range validator gets the whole file
+    stale = client.get(blob["url"], headers={"Range": "bytes=0-9", "If-Range": '"other"'})
+    assert stale.status_code == 200
+    assert stale.content == data
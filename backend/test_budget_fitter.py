@@ -0,0 +1,93 @@
+import copy
+
+import pytest
+from budget_fitter import fit_budget
+
+
+def item(id, type, title, cost, compliance="approved", subtitle="Austin, Texas • Patio"):
+    return {"id": id, "time": "evening", "type": type, "title": title, "subtitle": subtitle,
+            "compliance": compliance, "estimated_cost": cost}
+
+
+def itinerary():
+    items = [
+        item("1", "transport", "Drive to Austin", 80.0),
+        item("2", "accommodation", "Hotel Van Zandt", 340.0),
+        item("3", "dining", "Uchi", 120.0),
+        item("4", "activity", "Zilker Park", 0.0),
+        item("5", "dining", "Taco Stand", 24.0, "conditional"),
+        item("6", "dining", "Jo's Coffee", 28.0),
+    ]
+    return {"days": [{"date": "Sat, Jun 7", "dayLabel": "Day 1", "items": items}], "total_estimated_cost": 592.0}
+
+
+def by_id(result):
+    return {entry["id"]: entry for day in result["days"] for entry in day["items"]}
+
+
+def test_rescales_before_substituting():
+    original = itinerary()
+    fitted, changes = fit_budget(original, 500)
+    assert original == itinerary()
+
+    # The room drops a class at the same hotel; nothing else needs to change
+    assert fitted["total_estimated_cost"] == 472.0 <= fitted["budget"] == 500
+    assert changes == [{"day": 1, "item_id": "2", "action": "rescaled", "title": "Hotel Van Zandt",
+                        "previous_title": "Hotel Van Zandt", "estimated_cost": 220.0, "previous_cost": 340.0}]
+    assert by_id(fitted)["2"]["subtitle"] == "Austin, Texas • Patio • Upscale room"
+
+    fitted, changes = fit_budget(original, 300)
+    items = by_id(fitted)
+    assert fitted["total_estimated_cost"] == pytest.approx(sum(entry["estimated_cost"] for entry in items.values()))
+    assert fitted["total_estimated_cost"] <= 300
+    assert items["1"] == original["days"][0]["items"][0]
+    assert items["2"]["subtitle"].endswith(" • Economy room") and items["2"]["subtitle"].count("room") == 1
+    assert [change["item_id"] for change in changes] == ["2", "3"]
+
+
+def test_substitutes_keep_compliance():
+    fitted, changes = fit_budget(itinerary(), 100)
+    items = by_id(fitted)
+    assert fitted["total_estimated_cost"] > 100  # Nothing left to cut
+
+    # Uchi becomes the cheapest other approved meal on the plan, never the conditional taco stand
+    assert items["3"] == {**copy.deepcopy(items["6"]), "id": "3"}
+    assert items["3"]["title"] == "Jo's Coffee" and items["5"]["compliance"] == "conditional"
+    assert {change["item_id"]: change["action"] for change in changes}["3"] == "substituted"
+
+
+def test_substitutes_stay_in_the_same_city():
+    road_trip = {"days": [
+        {"date": "Sat, Jun 7", "dayLabel": "Day 1: Austin, Texas → Amarillo, Texas", "items": [
+            item("1", "accommodation", "Motel 6", 60.0, subtitle="Amarillo, Texas • Pets stay free"),
+            item("2", "dining", "Diner", 20.0, subtitle="Route 66"),  # city from the day label
+        ]},
+        {"date": "Sun, Jun 8", "dayLabel": "Day 2: Amarillo, Texas → Denver, Colorado", "items": [
+            item("3", "accommodation", "The Crawford", 80.0, subtitle="Denver, Colorado • Pet fee"),
+            item("4", "accommodation", "The Crawford annex", 150.0, subtitle="Denver, Colorado • Suite"),
+            item("5", "dining", "Steakhouse", 60.0, subtitle="Denver, Colorado • Patio"),
+        ]},
+    ]}
+    fitted, changes = fit_budget(road_trip, 100)
+    items = by_id(fitted)
+
+    # Day 2's rooms are never swapped for the Amarillo motel 400 miles back, nor dinner for the diner
+    assert items["4"]["title"] == "The Crawford" and items["4"]["subtitle"].startswith("Denver, Colorado")
+    assert items["5"]["title"] == "Steakhouse"
+    assert {change["item_id"]: change["action"] for change in changes}["4"] == "substituted"
+    assert all(change["title"] != "Motel 6" and change["title"] != "Diner" for change in changes)
+
+
+def test_fit_budget_endpoint(client):
+    body = {"itinerary": itinerary(), "budget": 450}
+    response = client.post("/api/plans/fit-budget", json=body)
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result["within_budget"] and result["itinerary"]["total_estimated_cost"] <= 450
+    assert [change["item_id"] for change in result["changes"]] == ["2"]
+
+    # Meals are priced per person: $120 is fine dining for one, with room for a cheaper class
+    solo = client.post("/api/plans/fit-budget", json={**body, "num_adults": 1}).json()
+    assert [change["item_id"] for change in solo["changes"]] == ["2", "3"]
+    assert not client.post("/api/plans/fit-budget", json={**body, "budget": 100}).json()["within_budget"]
+    assert client.post("/api/plans/fit-budget", json={**body, "budget": 0}).status_code == 422
@@ -0,0 +1,98 @@
+import copy
+from datetime import date
+
+import main
+import pytest
+from climate_alerts import (COLD_F, HEAT_F, add_climate_alerts, get_climate,
+                            pet_thresholds)
+from conftest import seed_user
+from models import Pet
+
+PHOENIX = (33.45, -112.07)
+
+
+def day(label, *subtitles, alerts=None):
+    items = [{"id": str(i), "time": "morning", "type": "activity", "title": "Stop", "subtitle": subtitle,
+              "compliance": "approved"} for i, subtitle in enumerate(subtitles)]
+    return {"date": "", "dayLabel": label, "alerts": alerts, "items": items}
+
+
+def messages(itinerary):
+    return [[alert["message"] for alert in day["alerts"]] for day in itinerary["days"]]
+
+
+def test_normals_interpolate_between_months():
+    highs, lows, elevation, found = get_climate().daily(
+        [PHOENIX[0], PHOENIX[0], 0.0], [PHOENIX[1], PHOENIX[1], -150.0], [date(2025, 7, 16), date(2025, 1, 1), date(2025, 7, 16)]
+    )
+    assert list(found) == [True, True, False]
+    assert (highs[0], lows[0], elevation[0]) == pytest.approx((106, 84, 1100), abs=0.5)
+    # Jan 1 lies halfway between the December and January normals
+    assert (highs[1], lows[1]) == pytest.approx(((66 + 67) / 2, (45 + 46) / 2), abs=0.3)
+
+
+def test_thresholds_follow_the_pet():
+    on = date(2025, 7, 1)
+    lab = pet_thresholds(Pet(name="Lab", breed="Labrador Retriever", size="medium"), on)
+    assert (lab["heat"], lab["cold"]) == (HEAT_F, COLD_F)
+
+    pug = pet_thresholds(Pet(name="Pug", breed="Pug", size="small", date_of_birth=date(2015, 1, 1)), on)
+    assert pug["heat"] < lab["heat"] and pug["altitude"] < lab["altitude"] and pug["short_nosed"]
+    assert pug["cold"] > lab["cold"] and pug["needs_coat"]
+
+    husky = pet_thresholds(Pet(name="Husky", breed="Siberian Husky", size="large"), on)
+    assert husky["heat"] < lab["heat"] and husky["cold"] < lab["cold"]
+
+
+def test_alerts_per_day_and_city():
+    itinerary = {"days": [
+        day("Day 1: Phoenix, Arizona → Flagstaff, Arizona", alerts=[
+            {"type": "weather", "message": "🌡️ Made up by the model"}, {"type": "warning", "message": "Pet fee"},
+        ]),
+        day("Day 2", "Aspen, Colorado • Maroon Bells"),
+        day("Day 3"),
+    ]}
+    pug = Pet(name="Biscuit", breed="French Bulldog", size="small")
+    result = add_climate_alerts(itinerary, [pug], date(2025, 7, 15), "Phoenix, Arizona")
+    first, second, third = messages(result)
+    # The hottest city of the day; model weather alerts are replaced, other alerts kept
+    assert first[0] == "Pet fee"
+    assert first[1].startswith("🌡️ Typical high of 106°F in Phoenix, Arizona — Short-nosed pets overheat fast")
+    assert first[2].startswith("⛰️ Flagstaff, Arizona sits at 6,900 ft")
+    # 80°F is already hot for a short-nosed dog; days without cities keep the last one
+    assert second == third
+    assert second[0].startswith("🌡️ Typical high of 80°F in Aspen, Colorado")
+    assert second[1] == "⛰️ Aspen, Colorado sits at 7,900 ft — Thinner air: plan shorter hikes with extra water and rest for Biscuit"
+
+    lab = Pet(name="Rex", breed="Labrador", size="medium")
+    winter = add_climate_alerts({"days": [day("Day 1", "Los Angeles, California"), day("Day 2", "Fargo, North Dakota")]},
+                                [lab], date(2025, 1, 10), "Los Angeles, California")
+    assert messages(winter) == [[], ["❄️ Typical low of 0°F in Fargo, North Dakota — Keep outdoor time short "
+                                     "for Rex and wipe paws after walks"]]
+
+    # Several pets: the most sensitive thresholds, coats for those that need one
+    chihuahua = Pet(name="Pip", breed="Chihuahua", size="toy")
+    mild = {"days": [day("Day 1", "Atlanta, Georgia")]}
+    assert messages(add_climate_alerts(copy.deepcopy(mild), [lab], date(2025, 1, 10), "Atlanta, Georgia")) == [[]]
+    assert messages(add_climate_alerts(mild, [lab, chihuahua], date(2025, 1, 10), "Atlanta, Georgia")) == [[
+        "❄️ Typical low of 36°F in Atlanta, Georgia — Bring a coat for Pip and keep walks short"
+    ]]
+
+
+def test_generated_itineraries_get_alerts(client, db_session, monkeypatch):
+    monkeypatch.setattr(main, "generate_travel_itinerary", lambda **params: {"days": [
+        day("Arrival", "Phoenix, Arizona • Hotel", alerts=[{"type": "weather", "message": "Sunny"}]),
+    ]})
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+    pug = Pet(user_id=user_id, name="Biscuit", breed="Pug", size="small")
+    db_session.add(pug)
+    db_session.commit()
+    body = {"origin": "Boston, Massachusetts", "destination": "Phoenix, Arizona", "pet_id": pug.pet_id, "reuse": False}
+
+    summer = client.post("/api/plans/generate-itinerary", json={**body, "start_date": "2025-07-10", "end_date": "2025-07-10"})
+    assert summer.status_code == 200, summer.text
+    assert [alert["type"] for alert in summer.json()["days"][0]["alerts"]] == ["weather"]
+    assert "Phoenix, Arizona" in summer.json()["days"][0]["alerts"][0]["message"]
+
+    winter = client.post("/api/plans/generate-itinerary", json={**body, "start_date": "2025-01-10", "end_date": "2025-01-10"})
+    assert winter.json()["days"][0]["alerts"] == []
@@ -0,0 +1,101 @@
+import main
+import pytest
+from conftest import seed_user
+from drive_estimator import (MPG_BY_VEHICLE, ROAD_FACTOR, estimate_drives,
+                             fuel_price)
+from gazetteer import haversine_km, locate_cities
+from models import Pet
+
+ORIGIN, STOP, DESTINATION = "San Francisco, California", "Santa Barbara, California", "Los Angeles, California"
+
+
+def item(type, title, subtitle, cost):
+    return {"id": title, "time": "morning", "type": type, "title": title, "subtitle": subtitle,
+            "compliance": "approved", "estimated_cost": cost}
+
+
+def road_trip():
+    return {"days": [
+        {"date": "Sat, Feb 15", "dayLabel": f"Day 1: {ORIGIN} → {STOP}", "items": [
+            item("transport", "Depart via Highway 1", "Scenic coastal route • 120 miles • ~2.5 hours", 25.0),
+            item("activity", "Dog Beach", f"{STOP} • 30-minute break", 0.0),
+            item("dining", "Roadside Cafe", f"{STOP} • Outdoor patio", 45.0),
+        ]},
+        {"date": "Sun, Feb 16", "dayLabel": "Day 2", "items": [
+            item("transport", "Continue south", "Highway 101 • 95 miles • ~2 hours", 20.0),
+            item("transport", "Traffic into the city", "I-405 • 45 min", 5.0),
+            item("accommodation", "Pet Hotel", f"{DESTINATION} • No pet fee", 150.0),
+        ]},
+    ]}
+
+
+def road_miles(start, end):
+    (_, lat1, lng1), (_, lat2, lng2) = locate_cities([start, end])
+    return float(haversine_km(lat1, lng1, [lat2], [lng2])[0]) * ROAD_FACTOR / 1.609344
+
+
+def test_drives_are_estimated_locally():
+    result = estimate_drives(road_trip(), ORIGIN, DESTINATION, vehicle="suv")
+    depart, _, _ = result["days"][0]["items"]
+    continue_south, traffic, _ = result["days"][1]["items"]
+
+    miles = road_miles(ORIGIN, STOP)
+    assert depart["distance_miles"] == pytest.approx(miles, abs=0.1)
+    assert depart["fuel_cost"] == pytest.approx(miles / MPG_BY_VEHICLE["suv"] * fuel_price(ORIGIN), abs=0.01)
+    # The model's 25.0 is below the fuel alone
+    assert depart["estimated_cost"] == depart["fuel_cost"]
+    assert depart["subtitle"] == f"Scenic coastal route • {round(miles)} miles • ~6 hours"
+
+    # Two drives in a row without a city of their own split the way to the next city
+    miles = road_miles(STOP, DESTINATION)
+    assert continue_south["distance_miles"] + traffic["distance_miles"] == pytest.approx(miles, abs=0.1)
+    assert traffic["subtitle"].startswith("I-405 • ") and "45 min" not in traffic["subtitle"]
+
+    costs = [i["estimated_cost"] for day in result["days"] for i in day["items"]]
+    assert result["total_estimated_cost"] == pytest.approx(sum(costs), abs=0.01)
+
+
+def test_round_trip_drives_home():
+    itinerary = road_trip()
+    itinerary["days"].append({"date": "Mon, Feb 17", "dayLabel": "Day 3", "items": [
+        item("transport", "Head home", "Inland via I-5", 60.0),
+    ]})
+    head_home = estimate_drives(itinerary, ORIGIN, DESTINATION, is_round_trip=True)["days"][2]["items"][0]
+    assert head_home["distance_miles"] == pytest.approx(road_miles(DESTINATION, ORIGIN), abs=0.1)
+
+
+def test_model_cost_with_tolls_is_kept():
+    itinerary = road_trip()
+    itinerary["days"][0]["items"][0]["estimated_cost"] = 250.0  # Gas, tolls and a ferry
+    depart = estimate_drives(itinerary, ORIGIN, DESTINATION, vehicle="hybrid")["days"][0]["items"][0]
+    assert depart["fuel_cost"] < 250.0 and depart["estimated_cost"] == 250.0
+
+    # Drives that never reach a known city keep the model's figures
+    unknown = estimate_drives({"days": [{"items": [item("transport", "Ferry", "Island hop", 80.0)]}]},
+                              "Atlantis, Ocean", "Avalon, Ocean")
+    assert unknown["days"][0]["items"][0]["estimated_cost"] == 80.0 and unknown["total_estimated_cost"] == 80.0
+
+
+def test_null_subtitle():
+    itinerary = {"days": [{"items": [item("transport", "Drive to Boulder", None, 10.0)]}]}
+    drive = estimate_drives(itinerary, "Denver, Colorado", "Boulder, Colorado")["days"][0]["items"][0]
+    miles = road_miles("Denver, Colorado", "Boulder, Colorado")
+    assert drive["distance_miles"] == pytest.approx(miles, abs=0.1)
+    assert drive["subtitle"].startswith(f"{round(miles)} miles • ~")
+
+
+def test_road_trip_endpoint(client, db_session, monkeypatch):
+    monkeypatch.setattr(main, "generate_road_trip_itinerary", lambda **params: road_trip())
+    pet = Pet(user_id=seed_user(db_session, num_pets=0, num_plans=0), name="Biscuit", breed="Corgi", size="small")
+    db_session.add(pet)
+    db_session.commit()
+    body = {"origin": ORIGIN, "destination": DESTINATION, "start_date": "2025-02-15", "end_date": "2025-02-16",
+            "pet_id": pet.pet_id}
+
+    sedan = client.post("/api/plans/generate-road-trip-itinerary", json=body).json()
+    rv = client.post("/api/plans/generate-road-trip-itinerary", json={**body, "vehicle": "rv"}).json()
+    assert sedan["days"][0]["items"][0]["drive_hours"] == rv["days"][0]["items"][0]["drive_hours"]
+    assert rv["total_estimated_cost"] > sedan["total_estimated_cost"]
+    assert client.post("/api/plans/generate-road-trip-itinerary", json={**body, "vehicle": "jet"}).status_code == 400
+    suv = client.post("/api/plans/generate-road-trip-itinerary", json={**body, "vehicle": "SUV"})
+    assert suv.status_code == 200 and suv.json()["days"][0]["items"][0]["fuel_cost"] > sedan["days"][0]["items"][0]["fuel_cost"]
@@ -0,0 +1,67 @@
+import explore
+from models import Poi
+
+BOSTON = (42.3601, -71.0589)
+
+
+def add_places(db, count, category="restaurant", step=0.002):
+    """Places due north of Boston, ~0.22 km apart"""
+    db.add_all(
+        Poi(source_id=f"{category}{step}-{i}", category=category, name=f"{category} {i}",
+            latitude=BOSTON[0] + (i + 1) * step, longitude=BOSTON[1],
+            pet_policy="conditional" if i % 2 else "approved", open_24h=i == 0, attributes={"patio": True})
+        for i in range(count)
+    )
+    db.commit()
+
+
+def get(client, category, **params):
+    return client.get(f"/api/explore/{category}", params={"lat": BOSTON[0], "lng": BOSTON[1], **params})
+
+
+def test_nearest_first_within_radius(client, db_session):
+    add_places(db_session, 30)
+    add_places(db_session, 3, category="vet")
+
+    places = get(client, "dining", radius=2).json()
+    assert [place["name"] for place in places] == [f"restaurant {i}" for i in range(8)]
+    distances = [place["distance_km"] for place in places]
+    assert distances == sorted(distances) and distances[-1] <= 2
+    assert (places[0]["pet_policy"], places[0]["open_24h"], places[0]["attributes"]) == ("approved", True, {"patio": True})
+
+    assert [place["category"] for place in get(client, "hospital").json()] == ["vet"] * 3
+    assert get(client, "outdoor").json() == []
+    assert get(client, "museums").status_code == 404
+    assert get(client, "dining", radius=500).status_code == 422
+
+
+def test_cursor_pagination(client, db_session):
+    add_places(db_session, 25)
+    seen = []
+    url, params = "/api/explore/dining", {"lat": BOSTON[0], "lng": BOSTON[1], "limit": 10}
+    while url:
+        response = client.get(url, params=params)
+        seen += [place["poi_id"] for place in response.json()]
+        link = response.headers.get("link")
+        url, params = (link[1:link.index(">")], None) if link else (None, None)
+    assert seen == [poi.poi_id for poi in db_session.query(Poi).order_by(Poi.latitude)]
+
+    assert get(client, "dining", cursor="garbage").status_code == 400
+
+
+def test_cell_cache(client, db_session, statements):
+    add_places(db_session, 5)
+    first = get(client, "dining").json()
+
+    # A nearby point in the same cell is answered without touching the database
+    statements.clear()
+    nearby = client.get("/api/explore/dining", params={"lat": BOSTON[0] + 0.001, "lng": BOSTON[1]}).json()
+    assert statements == []
+    assert [place["poi_id"] for place in nearby] == [place["poi_id"] for place in first]
+    assert nearby[0]["distance_km"] < first[0]["distance_km"]
+
+    # New places show up once the cached cell expires
+    add_places(db_session, 1, category="restaurant", step=-0.001)
+    assert len(get(client, "dining").json()) == 5
+    explore.clear_cache()
+    assert len(get(client, "dining").json()) == 6
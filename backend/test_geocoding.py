@@ -0,0 +1,114 @@
+import json
+
+import geocoding
+import pytest
+from conftest import seed_user
+from geocoding import resolve_cities
+from models import GeoCity
+
+ITINERARY = json.dumps({"days": [
+    {"dayLabel": "Day 1: Austin, Texas → Waco, Texas", "items": [
+        {"type": "transport", "subtitle": "I-35 North • 100 miles"},
+        {"type": "dining", "subtitle": "Waco, Texas • Patio with water bowls"},
+    ]},
+    {"dayLabel": "Day 2", "items": [
+        {"type": "accommodation", "subtitle": "Dallas, Texas • No pet fee"},
+    ]},
+]})
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Fake Geocoding API answering from a dict; records the queried strings"""
+    answers = {}
+    queried = []
+
+    def fake_get(url, params, timeout):
+        queried.append(params["address"])
+        answer = answers.get(params["address"])
+        if isinstance(answer, Exception):
+            raise answer
+        if answer is None:
+            return FakeResponse({"status": "ZERO_RESULTS", "results": []})
+        city, state, lat, lng = answer
+        return FakeResponse({"status": "OK", "results": [{
+            "address_components": [
+                {"long_name": city, "types": ["locality"]},
+                {"long_name": state, "short_name": "XX", "types": ["administrative_area_level_1"]},
+            ],
+            "geometry": {"location": {"lat": lat, "lng": lng}},
+        }]})
+
+    monkeypatch.setattr(geocoding, "GOOGLE_MAPS_API_KEY", "test-key")
+    monkeypatch.setattr(geocoding.requests, "get", fake_get)
+    return answers, queried
+
+
+def test_gazetteer_first_then_cached(db_session, upstream):
+    answers, queried = upstream
+
+    resolved = resolve_cities(db_session, ["Boston, MA", "boston,  MA, USA", "Boston, Massachusetts"])
+    db_session.commit()
+    assert {city.name for city in resolved.values()} == {"Boston, Massachusetts"}
+    assert db_session.query(GeoCity).count() == 2  # "boston, ma" and "boston, massachusetts"
+    assert queried == []
+
+    resolved = resolve_cities(db_session, ["Boston,MA"])
+    assert resolved["Boston,MA"].source == "gazetteer"
+
+
+def test_upstream_only_on_a_miss(db_session, upstream):
+    answers, queried = upstream
+    answers["Tiny Hamlet, Vermont"] = ("Tiny Hamlet", "Vermont", 44.0, -72.5)
+    answers["Down, Nowhere"] = ConnectionError("offline")
+
+    resolved = resolve_cities(db_session, ["Tiny Hamlet, Vermont", "Atlantis, Ocean", "Down, Nowhere", "Waco, TX"])
+    db_session.commit()
+
+    assert (resolved["Tiny Hamlet, Vermont"].name, resolved["Tiny Hamlet, Vermont"].source) == ("Tiny Hamlet, Vermont", "google")
+    assert resolved["Atlantis, Ocean"].source == "unresolved"
+    assert resolved["Down, Nowhere"].source == "pending"  # retried next time
+    assert sorted(queried) == ["Atlantis, Ocean", "Down, Nowhere", "Tiny Hamlet, Vermont"]
+
+    queried.clear()
+    resolve_cities(db_session, ["Tiny Hamlet, Vermont", "Atlantis, Ocean", "Down, Nowhere"])
+    assert queried == ["Down, Nowhere"]
+
+
+def test_plan_cities_in_one_call(client, db_session, upstream):
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+    plan = client.post("/api/plans", json={
+        "user_id": user_id, "start_date": "2025-06-01", "end_date": "2025-06-05",
+        "origin": "Houston, TX", "destination": "Dallas, Texas", "trip_type": "Road Trip",
+        "places_passing_by": '["Austin, Texas", "Somewhere Odd, Texas"]',
+    }).json()
+    # Strings are recorded offline on save, never looked up upstream there
+    assert db_session.query(GeoCity).count() == 4
+    assert upstream[1] == []
+
+    client.put(f"/api/plans/{plan['plan_id']}", json={"detailed_itinerary": ITINERARY})
+
+    cities = client.get(f"/api/plans/{plan['plan_id']}/geocode").json()
+    assert [city["query"] for city in cities] == [
+        "Houston, TX", "Dallas, Texas", "Austin, Texas", "Somewhere Odd, Texas", "Waco, Texas",
+    ]
+    assert cities[0]["name"] == "Houston, Texas"
+    assert cities[3]["source"] == "unresolved"
+    assert upstream[1] == ["Somewhere Odd, Texas"]
+
+
+def test_batch_endpoint(client):
+    response = client.post("/api/places/geocode", json={"cities": ["St Louis, MO", "", "Nowhere, Atlantis"]})
+    assert response.status_code == 200
+    louis, blank, nowhere = response.json()
+    assert louis["name"] == "St. Louis, Missouri"
+    assert blank["name"] is None and blank["source"] is None
+    assert nowhere["source"] == "pending"
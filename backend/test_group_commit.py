@@ -0,0 +1,85 @@
+import threading
+
+import group_commit
+import main
+from conftest import seed_user
+from models import Base, GeoCity, MemoryPhoto, Plan, User
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+
+def test_bulk_photos_in_one_transaction(client, db_session, statements):
+    user_id = seed_user(db_session, num_pets=0, num_plans=1)
+    photos = [{"local_path": f"photos/{i}.jpg", "city_name": "Boston, MA"} for i in range(40)]
+    photos[0].update(latitude=41.7637, longitude=-72.6851)  # Hartford
+
+    statements.clear()
+    response = client.post("/api/memories/photos/bulk", json={"trip_id": 1, "user_id": user_id, "photos": photos})
+    assert response.status_code == 201, response.text
+    body = response.json()
+    assert [photo["local_path"] for photo in body] == [photo["local_path"] for photo in photos]
+    assert len({photo["photo_id"] for photo in body}) == 40
+    assert body[0]["location_city_name"] == "Hartford, Connecticut" and body[1]["location_city_name"] is None
+    assert body[0]["city_name"] == body[1]["city_name"] == "Boston, MA"
+    assert db_session.query(MemoryPhoto).count() == 40
+    assert {city.name for city in db_session.query(GeoCity)} == {"Hartford, Connecticut", "Boston, Massachusetts"}
+    # Trip check, geo_city lookup and inserts; nothing per photo
+    assert len(statements) < 10
+
+    missing = client.post("/api/memories/photos/bulk", json={"trip_id": 99, "user_id": user_id, "photos": photos})
+    assert missing.status_code == 404
+    assert client.post("/api/memories/photos/bulk", json={"trip_id": 1, "user_id": user_id, "photos": []}).status_code == 422
+
+
+def test_concurrent_inserts_share_transactions(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'photos.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    with Session(bind=engine) as db:
+        db.add(User(email="owner@example.com", password="secret"))
+        db.add(Plan(user_id=1, start_date=main.date(2025, 6, 1), end_date=main.date(2025, 6, 2)))
+        db.commit()
+    commits = []
+    event.listen(engine, "commit", lambda conn: commits.append(1))
+
+    committer = group_commit.GroupCommitter(engine, window_ms=50)
+    results = [None] * 24
+
+    def add(i):
+        row = MemoryPhoto(trip_id=1, user_id=1, local_path=f"photos/{i}.jpg")
+        results[i] = committer.submit(row, ["Hartford, Connecticut"]).result(timeout=10)
+
+    threads = [threading.Thread(target=add, args=(i,)) for i in range(len(results))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    committer.close()
+
+    assert all(photo.photo_id for photo in results)
+    assert len({photo.photo_id for photo in results}) == len(results)
+    assert committer.batches == len(commits) < len(results) / 2
+
+    # A failing row is retried alone and fails only its own request
+    committer = group_commit.GroupCommitter(engine, window_ms=50)
+    good = committer.submit(MemoryPhoto(trip_id=1, user_id=1, local_path="photos/good.jpg"))
+    bad = committer.submit(MemoryPhoto(trip_id=1, user_id=1, local_path=None))
+    committer.close()
+    assert good.result().photo_id and bad.exception() is not None
+    engine.dispose()
+
+
+def test_single_photo_endpoint_can_group_commit(client, db_session, monkeypatch):
+    monkeypatch.setattr(main, "PHOTO_GROUP_COMMIT_MS", 5)
+    user_id = seed_user(db_session, num_pets=0, num_plans=1)
+    try:
+        response = client.post("/api/memories/photos", json={
+            "trip_id": 1, "user_id": user_id, "local_path": "photos/beach.jpg", "city_name": "Boston, MA",
+        })
+    finally:
+        group_commit.shutdown()
+    assert response.status_code == 201, response.text
+    assert response.json()["photo_id"] == 1 and response.json()["created_at"]
+    assert db_session.query(MemoryPhoto).count() == 1
+    assert client.post("/api/memories/photos", json={
+        "trip_id": 99, "user_id": user_id, "local_path": "photos/lost.jpg",
+    }).status_code == 404
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+import idempotency
+from conftest import seed_user
+from models import IdempotencyRecord, MemoryPhoto, Pet, Plan
+
+
+def test_retries_replay_the_first_response(client, db_session):
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+    body = {"user_id": user_id, "name": "Biscuit", "breed": "Corgi"}
+    headers = {"Idempotency-Key": "pet-1"}
+
+    first = client.post("/api/pets", json=body, headers=headers)
+    assert first.status_code == 201 and "idempotent-replayed" not in first.headers
+    # Same body in another key order and spacing
+    retry = client.post("/api/pets", content='{"breed": "Corgi", "name": "Biscuit",  "user_id": %d}' % user_id,
+                        headers={**headers, "Content-Type": "application/json"})
+    assert retry.status_code == 201 and retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == first.json()
+    assert db_session.query(Pet).count() == 1
+
+    assert client.post("/api/pets", json={**body, "name": "Other"}, headers=headers).status_code == 422
+    assert client.post("/api/pets", json=body, headers={"Idempotency-Key": ""}).status_code == 400
+    # Keys are scoped per endpoint; requests without a key are not deduplicated
+    plan = {"user_id": user_id, "origin": "Boston, Massachusetts", "destination": "Portland, Maine",
+            "start_date": "2025-06-01", "end_date": "2025-06-02", "pet_ids": "", "detailed_itinerary": '{"days": []}'}
+    assert client.post("/api/plans/save", json=plan, headers=headers).status_code == 201
+    assert client.post("/api/plans/save", json=plan, headers=headers).json()["plan_id"] == 1
+    client.post("/api/pets", json=body)
+    assert (db_session.query(Pet).count(), db_session.query(Plan).count()) == (2, 1)
+
+    # Expired keys run the request again
+    db_session.query(IdempotencyRecord).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+    db_session.commit()
+    again = client.post("/api/pets", json=body, headers=headers)
+    assert again.status_code == 201 and again.json()["pet_id"] != first.json()["pet_id"]
+    assert db_session.query(IdempotencyRecord).count() == 1
+
+
+def test_concurrent_duplicate_replays_the_winner(client, db_session, monkeypatch):
+    user_id = seed_user(db_session, num_pets=0, num_plans=1)
+    body = {"trip_id": 1, "user_id": user_id, "local_path": "photos/beach.jpg", "city_name": "Boston, MA"}
+    headers = {"Idempotency-Key": "photo-1"}
+    first = client.post("/api/memories/photos", json=body, headers=headers)
+    assert first.status_code == 201
+
+    # A duplicate that checked for the key before the first one committed
+    replay = idempotency.IdempotentRequest.replay
+    calls = []
+
+    def late_replay(self, db):
+        calls.append(self.key)
+        return None if len(calls) == 1 else replay(self, db)
+
+    monkeypatch.setattr(idempotency.IdempotentRequest, "replay", late_replay)
+    duplicate = client.post("/api/memories/photos", json=body, headers=headers)
+    assert duplicate.status_code == 201 and duplicate.headers["idempotent-replayed"] == "true"
+    assert duplicate.json()["photo_id"] == first.json()["photo_id"]
+    assert len(calls) == 2
+    assert db_session.query(MemoryPhoto).count() == 1
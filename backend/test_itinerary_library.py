@@ -0,0 +1,179 @@
+from datetime import date
+
+import main
+import pytest
+from conftest import seed_user
+from itinerary_library import (SIMILARITY_THRESHOLD, health_constraints,
+                               request_features, vectorize)
+from models import GeneratedItinerary, Pet
+
+PET = {"name": "Biscuit", "breed": "Pembroke Welsh Corgi", "age": "3 years old", "size": "small",
+       "personality": ["Playful", "Curious"], "health": ""}
+PARAMS = {"origin": "Austin, Texas", "destination": "Denver, Colorado", "start_date": "2025-06-01",
+          "end_date": "2025-06-02", "pet_info": PET, "num_adults": 2, "num_children": 0, "budget": None}
+
+
+def similarity(params):
+    return float(vectorize(request_features(PARAMS)) @ vectorize(request_features(params)))
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    """Fake generator answering a two day itinerary that mentions the pet; records its calls"""
+    calls = []
+
+    def generate(**params):
+        calls.append(params)
+        name = params["pet_info"]["name"]
+        return {
+            "days": [
+                {"date": "Sun, Jun 1", "dayLabel": "Travel Day", "alerts": [{"type": "warning", "message": f"Vaccination records for {name}"}],
+                 "items": [
+                     {"id": "1", "time": "morning", "type": "transport", "title": "Flight", "subtitle": "In-cabin",
+                      "compliance": "approved", "estimated_cost": 300.0},
+                     {"id": "2", "time": "evening", "type": "accommodation", "title": "Hotel", "subtitle": "Denver, Colorado",
+                      "compliance": "approved", "complianceNote": f"Bed for {name}", "estimated_cost": 200.0},
+                 ]},
+                {"date": "Mon, Jun 2", "dayLabel": "Explore", "items": [
+                    {"id": "3", "time": "afternoon", "type": "dining", "title": "Patio lunch", "subtitle": "Denver, Colorado",
+                     "compliance": "approved", "estimated_cost": 100.0},
+                ]},
+            ],
+            "total_estimated_cost": 600.0,
+        }
+
+    monkeypatch.setattr(main, "generate_travel_itinerary", generate)
+    monkeypatch.setattr(main, "generate_road_trip_itinerary", generate)
+    return calls
+
+
+def generate(client, pet_id, path="/api/plans/generate-itinerary", **overrides):
+    response = client.post(path, json={
+        "origin": "Austin, Texas", "destination": "Denver, Colorado", "start_date": "2025-06-01",
+        "end_date": "2025-06-02", "pet_id": pet_id, "reuse": True, **overrides,
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+def add_pet(db, user_id, name, size="small", breed="Pembroke Welsh Corgi", health=None):
+    pet = Pet(user_id=user_id, name=name, breed=breed, size=size, health=health, date_of_birth=date(2020, 1, 1))
+    db.add(pet)
+    db.commit()
+    return pet.pet_id
+
+
+def test_similarity():
+    assert similarity({**PARAMS, "start_date": "2025-09-10", "end_date": "2025-09-11"}) == pytest.approx(1.0)
+    assert similarity({**PARAMS, "pet_info": {**PET, "name": "Max", "breed": "Corgi"}}) > SIMILARITY_THRESHOLD
+    assert similarity({**PARAMS, "num_adults": 3}) > SIMILARITY_THRESHOLD
+    assert similarity({**PARAMS, "pet_info": {**PET, "size": "large"}}) < SIMILARITY_THRESHOLD
+    assert similarity({**PARAMS, "origin": "Seattle, Washington"}) < SIMILARITY_THRESHOLD
+
+
+def test_health_constraints():
+    assert health_constraints("Hip dysplasia, heart murmur") == "heart,mobility"
+    assert health_constraints("Healthy, up to date on shots") == ""
+    assert health_constraints(None) == ""
+
+
+def test_similar_request_is_adapted(client, db_session, gemini):
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+    biscuit = add_pet(db_session, user_id, "Biscuit")
+    waffles = add_pet(db_session, user_id, "Waffles")
+
+    first = generate(client, biscuit)
+    assert first["reused_from"] is None
+    assert len(gemini) == 1
+
+    reused = generate(client, waffles, start_date="2025-09-12", end_date="2025-09-13", num_adults=4, budget=800)
+    assert len(gemini) == 1
+    assert reused["reused_from"] == db_session.query(GeneratedItinerary).one().itinerary_id
+    assert reused["similarity"] >= SIMILARITY_THRESHOLD
+    assert [day["date"] for day in reused["days"]] == ["Fri, Sep 12", "Sat, Sep 13"]
+    assert reused["days"][0]["alerts"][0]["message"] == "Vaccination records for Waffles"
+    assert reused["days"][0]["items"][1]["complianceNote"] == "Bed for Waffles"
+    # Flight and lunch double for twice the party; the hotel is per room. Over budget is left to fit-budget
+    assert [item["estimated_cost"] for day in reused["days"] for item in day["items"]] == [600.0, 200.0, 200.0]
+    assert (reused["total_estimated_cost"], reused["budget"]) == (1000.0, 800)
+
+
+def test_dissimilar_requests_call_gemini(client, db_session, gemini):
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+    corgi = add_pet(db_session, user_id, "Biscuit")
+    mastiff = add_pet(db_session, user_id, "Tank", size="large", breed="Mastiff")
+
+    generate(client, corgi)
+    generate(client, mastiff)  # different pet size
+    generate(client, corgi, destination="Boston, Massachusetts")
+    generate(client, corgi, end_date="2025-06-04")  # longer trip
+    generate(client, corgi, reuse=False)
+    generate(client, corgi, start_date="June 1st", end_date="June 2nd")  # not ISO dates: not stored
+    assert len(gemini) == 6
+    assert db_session.query(GeneratedItinerary).count() == 5
+
+    # Reuse is opt-in
+    response = client.post("/api/plans/generate-itinerary", json={
+        "origin": "Austin, Texas", "destination": "Denver, Colorado", "start_date": "2025-06-01",
+        "end_date": "2025-06-02", "pet_id": corgi,
+    })
+    assert response.json()["reused_from"] is None and len(gemini) == 7
+
+    road_trip = "/api/plans/generate-road-trip-itinerary"
+    generate(client, corgi, path=road_trip)
+    assert len(gemini) == 8  # trips and road trips are kept apart
+    generate(client, corgi, path=road_trip, is_round_trip=True)
+    assert len(gemini) == 9
+    assert generate(client, corgi, path=road_trip, num_adults=3)["reused_from"] is not None
+
+
+def test_health_constraints_are_matched_exactly(client, db_session, gemini):
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+    healthy = add_pet(db_session, user_id, "Biscuit", health="Healthy")
+    fragile = add_pet(db_session, user_id, "Waffles", health="Hip dysplasia, heart murmur")
+    also_fragile = add_pet(db_session, user_id, "Mochi", health="heart murmur and hip dysplasia")
+
+    generate(client, healthy)
+    assert generate(client, fragile)["reused_from"] is None
+    assert len(gemini) == 2
+    assert generate(client, also_fragile)["reused_from"] is not None
+
+
+def test_background_refinement(client, db_session, gemini, monkeypatch):
+    monkeypatch.setattr(main, "REFINE_IN_BACKGROUND", True)
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+    pet_id = add_pet(db_session, user_id, "Biscuit")
+
+    generate(client, pet_id)
+    reused = generate(client, pet_id, start_date="2025-07-01", end_date="2025-07-02")
+
+    # The adapted itinerary was served, then a fresh one generated and stored
+    assert reused["reused_from"] is not None
+    assert [call["start_date"] for call in gemini] == ["2025-06-01", "2025-07-01"]
+    db_session.expire_all()
+    assert db_session.query(GeneratedItinerary).count() == 2
+
+
+def test_several_pets(client, db_session, gemini):
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+    biscuit = add_pet(db_session, user_id, "Biscuit")
+    tank = add_pet(db_session, user_id, "Tank", size="large", breed="Mastiff")
+    waffles = add_pet(db_session, user_id, "Waffles")
+    rex = add_pet(db_session, user_id, "Rex", size="large", breed="Mastiff")
+
+    generate(client, None, pet_ids=[biscuit, tank])
+    pet_info = gemini[0]["pet_info"]
+    assert (pet_info["name"], pet_info["size"]) == ("Biscuit and Tank", "large")
+    assert [pet["name"] for pet in pet_info["pets"]] == ["Biscuit", "Tank"]
+
+    # Reused only for as many pets, names swapped in order
+    assert generate(client, biscuit)["reused_from"] is None
+    reused = generate(client, None, pet_ids=[waffles, rex])
+    assert reused["reused_from"] is not None and len(gemini) == 2
+    assert reused["days"][0]["alerts"][0]["message"] == "Vaccination records for Waffles and Rex"
+    assert reused["days"][0]["items"][1]["complianceNote"] == "Bed for Waffles and Rex"
+
+    body = {"origin": "Austin, Texas", "destination": "Denver, Colorado", "start_date": "2025-06-01",
+            "end_date": "2025-06-02"}
+    assert client.post("/api/plans/generate-itinerary", json=body).status_code == 400
+    assert client.post("/api/plans/generate-itinerary", json={**body, "pet_ids": [biscuit, 999]}).status_code == 404
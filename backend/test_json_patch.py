@@ -0,0 +1,86 @@
+import json
+
+import pytest
+from conftest import seed_user
+from json_patch import JsonPatchError, JsonPatchTestFailed, apply_patch
+
+ITINERARY = json.dumps({"days": [
+    {"dayLabel": "Day 1: Boston, Massachusetts", "items": [
+        {"id": "1", "type": "dining", "title": "Lunch", "subtitle": "Boston, Massachusetts • Patio", "estimated_cost": 40},
+        {"id": "2", "type": "activity", "title": "Harbor walk", "subtitle": "Boston, Massachusetts", "estimated_cost": 0},
+    ]},
+], "total_estimated_cost": 40})
+
+
+def test_apply_patch():
+    document = {"a/b": {"~": 1}, "list": [1, 2], "flag": True}
+    patched = apply_patch(document, [
+        {"op": "test", "path": "/a~1b/~0", "value": 1.0},
+        {"op": "add", "path": "/list/-", "value": 3},
+        {"op": "add", "path": "/list/0", "value": 0},
+        {"op": "move", "from": "/list/3", "path": "/last"},
+        {"op": "copy", "from": "/last", "path": "/list/-"},
+        {"op": "replace", "path": "/flag", "value": None},
+        {"op": "remove", "path": "/a~1b"},
+    ])
+    assert patched == {"list": [0, 1, 2, 3], "last": 3, "flag": None}
+    assert document == {"a/b": {"~": 1}, "list": [1, 2], "flag": True}
+
+    with pytest.raises(JsonPatchTestFailed):
+        apply_patch(document, [{"op": "test", "path": "/flag", "value": 1}])
+    for operation in (
+        {"op": "remove", "path": "/missing"},
+        {"op": "replace", "path": "/list/2", "value": 0},
+        {"op": "add", "path": "/list/01", "value": 0},
+        {"op": "add", "path": "/missing/child", "value": 0},
+        {"op": "move", "from": "/list", "path": "/list/0"},
+        {"op": "add", "path": "no-slash", "value": 0},
+    ):
+        with pytest.raises(JsonPatchError):
+            apply_patch(document, [operation])
+
+
+def test_patch_itinerary_with_if_match(client, db_session):
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+    plan_id = client.post("/api/plans/save", json={
+        "user_id": user_id, "origin": "Boston, Massachusetts", "destination": "Boston, Massachusetts",
+        "start_date": "2025-06-01", "end_date": "2025-06-01", "pet_ids": "", "detailed_itinerary": ITINERARY,
+    }).json()["plan_id"]
+    url = f"/api/plans/{plan_id}/itinerary"
+
+    fetched = client.get(f"/api/plans/{plan_id}")
+    etag = fetched.headers["etag"]
+    assert etag == '"1"' and fetched.json()["version"] == 1
+
+    edit = [
+        {"op": "test", "path": "/days/0/items/0/title", "value": "Lunch"},
+        {"op": "replace", "path": "/days/0/items/0/estimated_cost", "value": 55},
+        {"op": "add", "path": "/days/0/items/-", "value": {
+            "id": "3", "type": "activity", "title": "Dog beach", "subtitle": "Cambridge, Massachusetts",
+            "estimated_cost": 10,
+        }},
+    ]
+    assert client.patch(url, json=edit).status_code == 428
+    response = client.patch(url, json=edit, headers={"If-Match": etag})
+    assert response.status_code == 200, response.text
+    assert response.headers["etag"] == '"2"' and response.json()["version"] == 2
+    itinerary = json.loads(response.json()["detailed_itinerary"])
+    assert itinerary["total_estimated_cost"] == 65
+    stops = client.get(f"/api/plans/{plan_id}/stops").json()
+    assert [(stop["title"], stop["estimated_cost"]) for stop in stops] == [
+        ("Lunch", 55), ("Harbor walk", 0), ("Dog beach", 10),
+    ]
+
+    # A stale version, a failed test and an impossible operation all leave the plan alone
+    assert client.patch(url, json=edit, headers={"If-Match": etag}).status_code == 412
+    failed = [{"op": "test", "path": "/days/0/items/0/title", "value": "Dinner"}]
+    assert client.patch(url, json=failed, headers={"If-Match": '"2"'}).status_code == 409
+    impossible = [{"op": "remove", "path": "/days/3"}]
+    assert client.patch(url, json=impossible, headers={"If-Match": '"2"'}).status_code == 422
+    assert client.patch(url, json=[{"op": "rename", "path": "/"}], headers={"If-Match": "*"}).status_code == 422
+
+    # Full updates bump the version too and honor If-Match when it is sent
+    assert client.put(f"/api/plans/{plan_id}", json={"budget": 500}, headers={"If-Match": etag}).status_code == 412
+    updated = client.put(f"/api/plans/{plan_id}", json={"budget": 500}, headers={"If-Match": '"2"'})
+    assert updated.headers["etag"] == '"3"'
+    assert client.get(f"/api/plans/{plan_id}").json()["version"] == 3
@@ -0,0 +1,86 @@
+import json
+from datetime import date, timedelta
+
+import map_clusters
+from conftest import seed_user
+from gazetteer import encode_geohash
+from models import MemoryPhoto, Plan, PlanCity
+from plan_relations import sync_plan_relations
+
+NORTHEAST = ["Boston, MA", "Cambridge, Massachusetts", "Providence, Rhode Island", "Hartford, CT"]
+WEST = ["Seattle, Washington", "Portland, Oregon"]
+
+
+def add_trip(db, user_id, trip_type, destination, places=()):
+    today = date.today()
+    plan = Plan(
+        user_id=user_id,
+        start_date=today - timedelta(days=10),
+        end_date=today - timedelta(days=5),
+        trip_type=trip_type,
+        destination=destination,
+        places_passing_by=json.dumps(list(places)),
+    )
+    sync_plan_relations(plan)
+    db.add(plan)
+    db.commit()
+    return plan.plan_id
+
+
+def clusters(client, user_id, **params):
+    response = client.get(f"/api/memories/visited-cities/{user_id}/clusters", params=params)
+    assert response.status_code == 200
+    return sorted(response.json(), key=lambda c: c["geohash"])
+
+
+def test_geohash_matches_reference():
+    assert encode_geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+
+def test_plan_cities_are_placed_on_the_map(db_session):
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+    plan_id = add_trip(db_session, user_id, "Road Trip", "Boston, MA", ["Hartford, CT", "Atlantis, Nowhere"])
+
+    links = db_session.query(PlanCity).filter(PlanCity.plan_id == plan_id).order_by(PlanCity.position).all()
+    assert [link.geohash is not None for link in links] == [True, True, False]
+    assert abs(links[0].latitude - 42.358) < 0.01
+
+
+def test_clusters_merge_nearby_cities_at_low_zoom(client, db_session):
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+    road_trip = add_trip(db_session, user_id, "Road Trip", "Boston, MA", NORTHEAST)
+    add_trip(db_session, user_id, "Road Trip", "Seattle, Washington", WEST)
+    add_trip(db_session, user_id, "Direct Trip", "Boston, MA")
+    db_session.add_all([
+        MemoryPhoto(trip_id=road_trip, user_id=user_id, local_path="photos/1.jpg", city_name="Hartford, CT"),
+        MemoryPhoto(trip_id=road_trip, user_id=user_id, local_path="photos/2.jpg", city_name="Boston, MA"),
+    ])
+    db_session.commit()
+
+    # Whole country: one cluster per coast
+    northeast, west = sorted(clusters(client, user_id, zoom=3), key=lambda c: c["longitude"], reverse=True)
+    assert (northeast["city_count"], northeast["trip_count"], northeast["photo_count"]) == (4, 2, 2)
+    assert northeast["city_name"] is None
+    assert northeast["cover_photo"] == "photos/2.jpg"
+    assert (west["city_count"], west["photo_count"], west["cover_photo"]) == (2, 0, None)
+
+    # Zoomed in on Boston: single-city markers, only inside the box
+    boston = clusters(client, user_id, zoom=12, west=-71.2, south=42.3, east=-71.0, north=42.4)
+    assert sorted(c["city_name"] for c in boston) == ["Boston, MA", "Cambridge, Massachusetts"]
+    assert all(c["city_count"] == 1 for c in boston)
+
+
+def test_clusters_are_bounded(client, db_session, monkeypatch):
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+    add_trip(db_session, user_id, "Road Trip", "Boston, MA", NORTHEAST + WEST)
+    monkeypatch.setattr(map_clusters, "MAX_CLUSTERS", 2)
+
+    result = clusters(client, user_id, zoom=15)
+    assert len(result) <= 2
+    assert sum(c["city_count"] for c in result) == 6
+
+
+def test_clusters_reject_inverted_box(client, db_session):
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+    response = client.get(f"/api/memories/visited-cities/{user_id}/clusters", params={"zoom": 3, "south": 50, "north": 10})
+    assert response.status_code == 400
@@ -0,0 +1,105 @@
+import io
+from datetime import datetime
+
+import photo_pipeline
+from backfill_photo_locations import backfill
+from blob_store import blob_url, save_blob
+from conftest import seed_user
+from gazetteer import reverse_geocode
+from models import MemoryPhoto
+from PIL import Image
+
+BOSTON = (42.3601, -71.0589)
+ANCHORAGE = (61.2181, -149.9003)
+
+
+def dms(value):
+    value = abs(value)
+    degrees, minutes = int(value), int(value * 60 % 60)
+    return (float(degrees), float(minutes), round(value * 3600 % 60, 4))
+
+
+def make_jpeg(position=None, taken_at=None):
+    """A small JPEG carrying an EXIF GPS position and capture time"""
+    exif = Image.Exif()
+    if position:
+        lat, lng = position
+        exif[0x8825] = {1: "N" if lat >= 0 else "S", 2: dms(lat), 3: "E" if lng >= 0 else "W", 4: dms(lng)}
+    if taken_at:
+        exif[0x8769] = {0x9003: taken_at}
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), (40, 120, 200)).save(buffer, "JPEG", exif=exif)
+    return buffer.getvalue()
+
+
+def test_reverse_geocode_batch():
+    lats, lngs = zip(BOSTON, ANCHORAGE, (30.0, -40.0))  # last one is in the Atlantic
+    assert reverse_geocode(lats, lngs) == ["Boston, Massachusetts", "Anchorage, Alaska", None]
+
+
+def test_upload_tags_photo_from_exif(client, db_session):
+    user_id = seed_user(db_session, num_pets=0, num_plans=1)
+
+    response = client.post(
+        "/api/memories/photos/upload",
+        data={"trip_id": 1, "user_id": user_id, "city_name": "somewhere near boston"},
+        files={"file": ("trip.jpg", make_jpeg(BOSTON, "2024:07:04 18:30:00"), "image/jpeg")},
+    )
+    assert response.status_code == 201
+
+    photo_pipeline.wait_for_pending(timeout=30)
+    photo = client.get("/api/memories/photos/1").json()[0]
+    assert photo["city_name"] == "somewhere near boston"
+    assert photo["location_city_name"] == "Boston, Massachusetts"
+    assert abs(photo["latitude"] - BOSTON[0]) < 1e-3
+    assert abs(photo["longitude"] - BOSTON[1]) < 1e-3
+    assert photo["taken_at"] == "2024-07-04T18:30:00"
+
+
+def test_client_coordinates_are_geocoded(client, db_session):
+    user_id = seed_user(db_session, num_pets=0, num_plans=1)
+
+    photo = client.post("/api/memories/photos", json={
+        "trip_id": 1, "user_id": user_id, "local_path": "/photos/1.jpg",
+        "city_name": "Anc", "latitude": ANCHORAGE[0], "longitude": ANCHORAGE[1],
+    }).json()
+    # The client's label is kept for matching the plan's cities
+    assert (photo["city_name"], photo["location_city_name"]) == ("Anc", "Anchorage, Alaska")
+    assert len(client.get("/api/memories/photos/1", params={"city_name": "Anc"}).json()) == 1
+
+    photo = client.post("/api/memories/photos", json={
+        "trip_id": 1, "user_id": user_id, "local_path": "/photos/2.jpg", "city_name": "Boston, Massachusetts",
+    }).json()
+    assert (photo["city_name"], photo["location_city_name"]) == ("Boston, Massachusetts", None)
+
+    photo = client.post("/api/memories/photos", json={
+        "trip_id": 1, "user_id": user_id, "local_path": "/photos/3.jpg", "latitude": BOSTON[0], "longitude": BOSTON[1],
+    }).json()
+    assert photo["city_name"] == photo["location_city_name"] == "Boston, Massachusetts"
+
+
+def test_backfill_tags_existing_photos(db_session):
+    user_id = seed_user(db_session, num_pets=0, num_plans=1)
+    sources = [
+        make_jpeg(BOSTON, "2023:05:01 09:00:00"),
+        make_jpeg(ANCHORAGE),
+        make_jpeg(),  # no EXIF
+    ]
+    for data in sources:
+        db_session.add(MemoryPhoto(trip_id=1, user_id=user_id, local_path=blob_url(save_blob(data, "image/jpeg"))))
+    db_session.add(MemoryPhoto(trip_id=1, user_id=user_id, local_path="https://example.com/a.jpg", city_name="Elsewhere"))
+    db_session.commit()
+
+    scanned, tagged = backfill(db_session, batch_size=2)
+
+    assert (scanned, tagged) == (4, 2)
+    db_session.expire_all()
+    photos = db_session.query(MemoryPhoto).order_by(MemoryPhoto.photo_id).all()
+    assert [p.location_city_name for p in photos] == ["Boston, Massachusetts", "Anchorage, Alaska", None, None]
+    assert [p.city_name for p in photos] == ["Boston, Massachusetts", "Anchorage, Alaska", None, "Elsewhere"]
+    assert photos[0].taken_at == datetime(2023, 5, 1, 9, 0)
+    assert photos[2].latitude is None
+
+    # Every photo is scanned once, including those without GPS or capture time
+    assert backfill(db_session) == (0, 0)
+    assert backfill(db_session, recompute=True) == (2, 2)
@@ -0,0 +1,69 @@
+import io
+
+import photo_pipeline
+from conftest import seed_user
+from models import MemoryPhoto
+from PIL import Image
+
+
+def make_jpeg(width=2000, height=1500):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 120, 40)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def upload(client, trip_id, user_id, data, content_type="image/jpeg"):
+    return client.post(
+        "/api/memories/photos/upload",
+        data={"trip_id": trip_id, "user_id": user_id, "city_name": "Boston, Massachusetts"},
+        files={"file": ("trip.jpg", data, content_type)},
+    )
+
+
+def test_upload_generates_variants_in_background(client, db_session):
+    user_id = seed_user(db_session, num_pets=0, num_plans=1)
+    original = make_jpeg()
+
+    response = upload(client, 1, user_id, original)
+
+    assert response.status_code == 201
+    photo = response.json()
+    assert photo["variants_status"] == "pending"
+    assert client.get(photo["local_path"]).content == original
+
+    photo_pipeline.wait_for_pending(timeout=30)
+    db_session.expire_all()
+    row = db_session.get(MemoryPhoto, photo["photo_id"])
+    assert row.variants_status == "ready"
+    assert (row.width, row.height) == (2000, 1500)
+    assert (row.thumbnail_width, row.thumbnail_height) == (320, 240)
+    assert (row.medium_width, row.medium_height) == (1280, 960)
+
+    webp = client.get(row.webp_path)
+    assert webp.headers["content-type"] == "image/webp"
+    assert Image.open(io.BytesIO(webp.content)).size == (1280, 960)
+
+
+def test_list_endpoints_return_small_variants(client, db_session):
+    user_id = seed_user(db_session, num_pets=0, num_plans=1)
+    photo = upload(client, 1, user_id, make_jpeg()).json()
+    photo_pipeline.wait_for_pending(timeout=30)
+    db_session.expire_all()
+    row = db_session.get(MemoryPhoto, photo["photo_id"])
+
+    photos = client.get("/api/memories/photos/1").json()
+    assert photos[0]["local_path"] == row.thumbnail_path
+    assert photos[0]["original_path"] == photo["local_path"]
+
+    original = client.get("/api/memories/photos/1?variant=original").json()
+    assert original[0]["local_path"] == photo["local_path"]
+
+    trips = client.get(f"/api/memories/past-trips/{user_id}").json()
+    assert trips[0]["cover_photo"] == row.medium_path
+
+
+def test_upload_rejects_missing_trip_and_non_images(client, db_session):
+    user_id = seed_user(db_session, num_pets=0, num_plans=1)
+
+    assert upload(client, 999, user_id, make_jpeg()).status_code == 404
+    assert upload(client, 1, user_id, b"%PDF", content_type="application/pdf").status_code == 400
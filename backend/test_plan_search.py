@@ -0,0 +1,83 @@
+import json
+
+from conftest import seed_user
+from search_index import match_expression
+
+ITINERARY = json.dumps({"days": [
+    {"dayLabel": "Day 1: Denver, Colorado → Moab, Utah", "items": [
+        {"type": "dining", "title": "Lunch at Rocky <Mountain> Grill", "subtitle": "Grand Junction, Colorado • Shaded patio",
+         "compliance": "allowed", "complianceNote": "Dogs welcome on the patio"},
+        {"type": "accommodation", "title": "Red Cliffs Lodge", "subtitle": "Moab, Utah • No pet fee"},
+    ]},
+]})
+
+
+def create_plan(client, user_id, destination, places=None, itinerary=None):
+    response = client.post("/api/plans", json={
+        "user_id": user_id, "start_date": "2025-06-01", "end_date": "2025-06-05",
+        "origin": "Denver, Colorado", "destination": destination, "trip_type": "Road Trip",
+        "places_passing_by": json.dumps(places or []), "detailed_itinerary": itinerary,
+    })
+    assert response.status_code == 201
+    return response.json()["plan_id"]
+
+
+def search(client, user_id, q):
+    response = client.get(f"/api/users/{user_id}/plans/search", params={"q": q})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_match_expression():
+    assert match_expression("pet-friendly  Moab") == '"pet" "friendly" "Moab"'
+    assert match_expression('NEAR(a b) OR') == '"NEAR" "a" "b" "OR"'  # operators become plain words
+    assert match_expression('" * -') == ""
+
+
+def test_search_ranks_and_highlights(client, db_session):
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+    itinerary_plan = create_plan(client, user_id, "Salt Lake City, Utah", itinerary=ITINERARY)
+    destination_plan = create_plan(client, user_id, "Moab, Utah")
+    create_plan(client, user_id, "Austin, Texas")
+
+    results = search(client, user_id, "moab")
+    # A destination match outranks a mention in the itinerary
+    assert [result["plan_id"] for result in results] == [destination_plan, itinerary_plan]
+    assert results[0]["destination_highlight"] == "<mark>Moab</mark>, Utah"
+    assert results[0]["score"] > results[1]["score"]
+    assert "<mark>Moab</mark>" in results[1]["snippet"]
+
+    results = search(client, user_id, "rocky mountains")  # stemmed
+    assert [result["plan_id"] for result in results] == [itinerary_plan]
+    assert "&lt;<mark>Mountain</mark>&gt;" in results[0]["snippet"]
+
+    assert [result["plan_id"] for result in search(client, user_id, "dogs welcome")] == [itinerary_plan]
+    assert search(client, user_id, "moab texas") == []
+    assert search(client, user_id, "***") == []
+
+
+def test_search_is_scoped_to_the_user(client, db_session):
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+    other_id = seed_user(db_session, num_pets=0, num_plans=0, email="other@example.com")
+    create_plan(client, other_id, "Moab, Utah")
+
+    assert search(client, user_id, "moab") == []
+    # The owner column cannot be searched
+    assert search(client, other_id, f"u{other_id}") == []
+
+
+def test_index_follows_updates_and_deletes(client, db_session):
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+    plan_id = create_plan(client, user_id, "Moab, Utah", places=["Green River, Utah"])
+    assert len(search(client, user_id, "green river")) == 1
+
+    client.put(f"/api/plans/{plan_id}", json={"destination": "Sedona, Arizona", "places_passing_by": "[]"})
+    assert search(client, user_id, "moab") == []
+    assert search(client, user_id, "green river") == []
+    assert [result["plan_id"] for result in search(client, user_id, "sedona")] == [plan_id]
+
+    client.put(f"/api/plans/{plan_id}", json={"detailed_itinerary": ITINERARY})
+    assert len(search(client, user_id, "red cliffs lodge")) == 1
+
+    client.delete(f"/api/plans/{plan_id}")
+    assert search(client, user_id, "sedona") == []
@@ -0,0 +1,89 @@
+import json
+
+from conftest import seed_user
+from models import Plan, PlanPet, PlanStop
+from plan_relations import parse_itinerary_stops
+
+ITINERARY = json.dumps({"days": [
+    {"dayLabel": "Day 1: San Francisco, California → Santa Barbara, California", "items": [
+        {"type": "transport", "title": "Drive", "subtitle": "Highway 101 South • 320 miles", "estimated_cost": 60},
+        {"type": "dining", "title": "Lunch", "subtitle": "San Luis Obispo, California • Patio", "estimated_cost": "35.5"},
+    ]},
+    {"dayLabel": "Day 2", "items": [
+        {"type": "accommodation", "title": "Hotel", "subtitle": "Los Angeles, California • No pet fee"},
+        "not an item",
+    ]},
+]})
+
+
+def save_plan(client, user_id, itinerary=ITINERARY, pet_ids=""):
+    response = client.post("/api/plans/save", json={
+        "user_id": user_id, "origin": "San Francisco, California", "destination": "Los Angeles, California",
+        "start_date": "2025-06-01", "end_date": "2025-06-03", "trip_type": "Road Trip",
+        "pet_ids": pet_ids, "detailed_itinerary": itinerary,
+    })
+    assert response.status_code == 201
+    return response.json()["plan_id"]
+
+
+def test_parse_itinerary_stops():
+    stops = parse_itinerary_stops(ITINERARY)
+    assert [(s["day_index"], s["type"], s["city_name"], s["estimated_cost"]) for s in stops] == [
+        (0, "transport", "Santa Barbara, California", 60.0),  # no city in the subtitle: day label
+        (0, "dining", "San Luis Obispo, California", 35.5),
+        (1, "accommodation", "Los Angeles, California", None),
+    ]
+    assert parse_itinerary_stops("{broken") == []
+    assert parse_itinerary_stops(None) == []
+
+
+def test_stops_extracted_on_save_and_update(client, db_session):
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+    plan_id = save_plan(client, user_id)
+
+    stops = client.get(f"/api/plans/{plan_id}/stops").json()
+    assert [stop["title"] for stop in stops] == ["Drive", "Lunch", "Hotel"]
+    assert abs(stops[2]["latitude"] - 34.05) < 0.1
+
+    dining = client.get(f"/api/plans/{plan_id}/stops", params={"type": "dining"}).json()
+    assert [stop["city_name"] for stop in dining] == ["San Luis Obispo, California"]
+
+    new_itinerary = json.dumps({"days": [{"dayLabel": "Day 1", "items": [
+        {"type": "activity", "title": "Beach", "subtitle": "Santa Monica, California • Dog beach"},
+    ]}]})
+    client.put(f"/api/plans/{plan_id}", json={"detailed_itinerary": new_itinerary})
+    stops = client.get(f"/api/plans/{plan_id}/stops").json()
+    assert [(stop["position"], stop["title"]) for stop in stops] == [(0, "Beach")]
+
+    # Updates that do not touch the itinerary keep the stops
+    client.put(f"/api/plans/{plan_id}", json={"budget": 900})
+    assert len(client.get(f"/api/plans/{plan_id}/stops").json()) == 1
+
+
+def test_stops_deleted_with_plan(client, db_session):
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+    first, second = save_plan(client, user_id), save_plan(client, user_id)
+
+    assert client.delete(f"/api/plans/{first}").status_code == 204
+    assert client.get(f"/api/plans/{first}/stops").status_code == 404
+    assert db_session.query(PlanStop).filter(PlanStop.plan_id == second).count() == 3
+
+    assert client.delete(f"/api/users/{user_id}").status_code == 204
+    assert db_session.query(PlanStop).count() == 0
+
+
+def test_deleted_pet_leaves_plan_pet_ids(client, db_session):
+    user_id = seed_user(db_session, num_pets=3, num_plans=0)
+    plan_id = save_plan(client, user_id, pet_ids="1, 2,3")
+    other_id = save_plan(client, user_id, pet_ids="3")
+
+    assert client.delete("/api/pets/2").status_code == 204
+    db_session.expire_all()
+    assert db_session.get(Plan, plan_id).pet_ids == "1,3"
+    # A later sync must not link the deleted pet again
+    client.put(f"/api/plans/{plan_id}", json={"destination": "San Diego, California"})
+    assert sorted(link.pet_id for link in db_session.query(PlanPet).filter(PlanPet.plan_id == plan_id)) == [1, 3]
+
+    assert client.delete("/api/pets/3").status_code == 204
+    db_session.expire_all()
+    assert db_session.get(Plan, plan_id).pet_ids == "1" and db_session.get(Plan, other_id).pet_ids == ""
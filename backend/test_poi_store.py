@@ -0,0 +1,117 @@
+import csv
+import io
+import json
+
+import gemini_service
+import pytest
+from conftest import seed_user
+from models import Pet, Poi
+from poi_store import (import_pois, itinerary_candidates, pois_near, read_csv,
+                       read_geojson)
+from sqlalchemy import text
+
+DENVER = (39.7392, -104.9903)
+
+CSV = """id,category,name,latitude,longitude,city,pet_policy,pet_notes,rating,open_24h,parking
+h1,hotel,Mile High Pet Inn,39.7420,-104.9880,"Denver, Colorado",approved,No pet fee,4.6,,yes
+h2,hotel,Larimer Lodge,39.7500,-104.9990,"Denver, Colorado",conditional,Dogs under 40 lbs,4.1,,
+r1,restaurant,Patio Grill,39.7350,-104.9800,"Denver, Colorado",approved,Water bowls on the patio,4.4,,
+v1,vet,Downtown Animal ER,39.7300,-104.9700,"Denver, Colorado",approved,,,24/7,
+x1,restaurant,No Dogs Diner,39.7390,-104.9900,"Denver, Colorado",notAllowed,,5.0,,
+b1,dog_beach,Far Away Beach,34.0100,-118.4960,"Santa Monica, California",approved,,,,
+bad,museum,Not A Category,39.74,-104.99,,,,,,
+"""
+
+GEOJSON = {"type": "FeatureCollection", "features": [
+    {"type": "Feature", "id": "p1", "geometry": {"type": "Point", "coordinates": [-104.9560, 39.7480]},
+     "properties": {"category": "park", "name": "City Park Dog Run", "city": "Denver, Colorado"}},
+    # On the straight line from Salt Lake City towards Denver
+    {"type": "Feature", "id": "h3", "geometry": {"type": "Point", "coordinates": [-109.55, 40.41]},
+     "properties": {"category": "hotel", "name": "Halfway Motel", "rating": 3.9}},
+    {"type": "Feature", "id": "l1", "geometry": {"type": "LineString", "coordinates": [[0, 0], [1, 1]]},
+     "properties": {"category": "park", "name": "A trail"}},
+]}
+
+
+@pytest.fixture
+def places(db_session, tmp_path):
+    csv_path, geojson_path = tmp_path / "places.csv", tmp_path / "places.geojson"
+    csv_path.write_text(CSV)
+    geojson_path.write_text(json.dumps(GEOJSON))
+    assert import_pois(db_session, read_csv(str(csv_path)), batch_size=3) == (6, 1)
+    assert import_pois(db_session, read_geojson(str(geojson_path))) == (2, 0)
+    return {poi.source_id: poi.poi_id for poi in db_session.query(Poi)}
+
+
+def test_import_and_nearby(db_session, places):
+    nearby = pois_near(db_session, *DENVER, radius_km=5)
+    assert [poi.source_id for poi, _ in nearby] == ["x1", "h1", "r1", "h2", "v1", "p1"]
+    assert all(distance <= 5 for _, distance in nearby)
+    assert [poi.source_id for poi, _ in pois_near(db_session, *DENVER, radius_km=0.8)] == ["x1", "h1"]
+    assert [poi.source_id for poi, _ in pois_near(db_session, *DENVER, 5, categories=["vet"])] == ["v1"]
+
+    vet = db_session.get(Poi, places["v1"])
+    assert (vet.open_24h, vet.city_name, vet.attributes) == (1, "Denver, Colorado", None)
+    assert db_session.get(Poi, places["h1"]).attributes == {"parking": "yes"}
+
+
+def test_reimport_updates_the_spatial_index(db_session, places):
+    moved = "id,category,name,latitude,longitude\nh1,hotel,Mile High Pet Inn,34.0195,-118.4912\n"
+    import_pois(db_session, csv.DictReader(io.StringIO(moved)))
+    assert "h1" not in [poi.source_id for poi, _ in pois_near(db_session, *DENVER, radius_km=5)]
+    assert [poi.source_id for poi, _ in pois_near(db_session, 34.0195, -118.4912, 5)] == ["h1", "b1"]
+
+    db_session.query(Poi).filter(Poi.source_id == "b1").delete()
+    db_session.commit()
+    assert db_session.execute(text("SELECT count(*) FROM poi_rtree")).scalar() == db_session.query(Poi).count()
+
+
+def test_itinerary_candidates(db_session, places):
+    candidates = itinerary_candidates(db_session, "Denver, Colorado")
+    assert [c["id"] for c in candidates] == [places[i] for i in ("h1", "h2", "r1", "p1", "v1")]
+    assert itinerary_candidates(db_session, "Atlantis, Ocean") == []
+
+    road_trip = itinerary_candidates(db_session, "Denver, Colorado", origin="Salt Lake City, Utah")
+    assert road_trip[-1]["name"] == "Halfway Motel"
+
+
+def test_generation_references_places(client, db_session, places, monkeypatch):
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+    pet = Pet(user_id=user_id, name="Biscuit", breed="Corgi", size="small")
+    db_session.add(pet)
+    db_session.commit()
+    prompts = []
+
+    class FakeResponse:
+        status_code = 200
+
+        def json(self):
+            days = {"days": [{"date": "Sun, Jun 1", "dayLabel": "Arrival", "items": [
+                {"id": "1", "time": "evening", "type": "accommodation", "poi": places["h1"], "estimated_cost": 150},
+                {"id": "2", "time": "evening", "type": "dining", "poi": 999999, "estimated_cost": 40},
+                {"id": "3", "time": "morning", "type": "transport", "title": "Fly in", "subtitle": "In-cabin",
+                 "compliance": "approved", "estimated_cost": 300},
+            ]}]}
+            return {"candidates": [{"content": {"parts": [{"text": json.dumps(days)}]}}]}
+
+    def fake_post(url, headers, data, timeout):
+        prompts.append(json.loads(data)["contents"][0]["parts"][0]["text"])
+        return FakeResponse()
+
+    monkeypatch.setattr(gemini_service, "API_KEY", "test-key")
+    monkeypatch.setattr(gemini_service.requests, "post", fake_post)
+
+    response = client.post("/api/plans/generate-itinerary", json={
+        "origin": "Austin, Texas", "destination": "Denver, Colorado",
+        "start_date": "2025-06-01", "end_date": "2025-06-01", "pet_id": pet.pet_id,
+    })
+    assert response.status_code == 200
+    assert f"{places['h1']}|hotel|Mile High Pet Inn|Denver, Colorado|No pet fee" in prompts[0]
+    assert "No Dogs Diner" not in prompts[0]
+
+    items = response.json()["days"][0]["items"]
+    # The unknown place id is dropped, the known one filled in from the record
+    assert [item["title"] for item in items] == ["Mile High Pet Inn", "Fly in"]
+    assert items[0]["subtitle"] == "Denver, Colorado"
+    assert (items[0]["compliance"], items[0]["complianceNote"], items[0]["poi_id"]) == ("approved", "No pet fee", places["h1"])
+    assert response.json()["total_estimated_cost"] == 450
@@ -0,0 +1,328 @@
+"""
+Query-count and latency regression guard.
+
+Every route in main.py is called against databases seeded at several scales while
+SQLAlchemy statements are counted. A route fails if its statement count changes with
+the amount of data (an N+1 query) or exceeds the stored baseline, or if its latency at
+the largest scale goes past the baseline in perf_baseline.csv.
+
+Record baselines for new routes, or routes whose statement count changed on purpose, with:
+    PERF_BASELINE_UPDATE=1 python -m pytest -q test_query_budget.py
+Use PERF_BASELINE_UPDATE=all to re-measure every route.
+
+The seed includes soft-deleted users and trips, so the latencies include the NOT IN
+subqueries models.hide_soft_deleted adds to ORM selects; test_soft_delete_subqueries
+checks from SQLite's query plans that each of them runs once, off an index.
+"""
+
+import csv
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+
+import main
+import pytest
+from blob_store import save_blob
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from models import DeletionJob, MemoryPhoto, Pet, Plan, Poi, User
+from plan_relations import sync_plan_relations, sync_plan_stops
+from search_index import index_plans
+
+SCALES = [1, 8, 32]
+LATENCY_RUNS = 3  # best-of-N at the largest scale, to ride out GC pauses and warm-up
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perf_baseline.csv")
+UPDATE_BASELINE = os.getenv("PERF_BASELINE_UPDATE", "")
+
+
+def itinerary(items):
+    """Itinerary JSON with `items` items spread over two days"""
+    day_items = [
+        {"type": "dining", "title": f"Stop {i}", "subtitle": "Hartford, Connecticut • Patio", "estimated_cost": 20.0}
+        for i in range(items)
+    ]
+    return json.dumps({"days": [
+        {"dayLabel": "Day 1: Boston, Massachusetts → Hartford, Connecticut", "items": day_items[::2]},
+        {"dayLabel": "Day 2", "items": day_items[1::2]},
+    ]})
+
+
+def seed(db, scale):
+    """Seed a main user with `scale` pets, past plans and photos per plan, plus other users"""
+    for i in range(scale):
+        db.add(User(email=f"other{i}@example.com", password="secret"))
+
+    user = User(email="owner@example.com", password="secret", name="Owner")
+    db.add(user)
+    db.flush()
+
+    pets = [Pet(user_id=user.user_id, name=f"Pet {i}", breed="Corgi", size="small") for i in range(scale)]
+    db.add_all(pets)
+    db.flush()
+
+    today = date.today()
+    plans = []
+    for i in range(scale):
+        plan = Plan(
+            user_id=user.user_id,
+            start_date=today - timedelta(days=i + 10),
+            end_date=today - timedelta(days=i + 5),
+            trip_type="Road Trip" if i % 2 else "Direct Trip",
+            destination="Boston, Massachusetts",
+            places_passing_by='["Hartford, Connecticut", "Providence, Rhode Island"]',
+            detailed_itinerary=itinerary(scale),
+            pet_ids=",".join(str(p.pet_id) for p in pets[:2]),
+        )
+        sync_plan_relations(plan)
+        sync_plan_stops(plan)
+        plans.append(plan)
+    db.add_all(plans)
+    db.flush()
+    index_plans(db, plans)
+
+    photos = []
+    for plan in plans:
+        for j in range(scale):
+            photos.append(MemoryPhoto(
+                trip_id=plan.plan_id,
+                user_id=user.user_id,
+                local_path=f"photos/{plan.plan_id}/{j}.jpg",
+                city_name="Hartford, Connecticut" if j % 2 else "Boston, Massachusetts",
+                created_at=datetime(2024, 1, 1) + timedelta(minutes=j),
+            ))
+    db.add_all(photos)
+
+    # Soft-deleted rows waiting for the reaper: another user's whole account and `scale`
+    # of the main user's trips, so the filters that hide them have rows to skip
+    gone = User(email="gone@example.com", password="secret", deleted_at=datetime.utcnow())
+    db.add(gone)
+    db.flush()
+    gone_pets = [Pet(user_id=gone.user_id, name=f"Gone {i}", size="small") for i in range(scale)]
+    db.add_all(gone_pets)
+    db.flush()
+    hidden = []
+    for i, owner in enumerate([gone.user_id] * scale + [user.user_id] * scale):
+        plan = Plan(
+            user_id=owner,
+            start_date=today - timedelta(days=i + 10),
+            end_date=today - timedelta(days=i + 5),
+            trip_type="Road Trip",
+            destination="Boston, Massachusetts",
+            places_passing_by='["Hartford, Connecticut"]',
+            pet_ids=str(gone_pets[0].pet_id if owner == gone.user_id else pets[0].pet_id),
+            deleted_at=None if owner == gone.user_id else datetime.utcnow(),
+        )
+        sync_plan_relations(plan)
+        hidden.append(plan)
+    db.add_all(hidden)
+    db.flush()
+    db.add_all(
+        MemoryPhoto(trip_id=plan.plan_id, user_id=plan.user_id, local_path=f"photos/gone/{plan.plan_id}.jpg",
+                    city_name="Boston, Massachusetts")
+        for plan in hidden
+    )
+    db.add_all(
+        Poi(source_id=f"r{i}", category="restaurant", name=f"Patio {i}",
+            latitude=42.36 + i * 0.0005, longitude=-71.06, pet_policy="approved")
+        for i in range(scale)
+    )
+    job = DeletionJob(entity="plan", entity_id=0)
+    db.add(job)
+    db.commit()
+
+    return {
+        "user_id": user.user_id,
+        "pet_id": pets[0].pet_id,
+        "plan_id": plans[0].plan_id,
+        "photo_id": photos[0].photo_id,
+        "job_id": job.job_id,
+        "blob_name": save_blob(b"\x89PNG avatar", "image/png"),
+    }
+
+
+GENERATE_BODY = {
+    "origin": "San Francisco, California",
+    "destination": "Boston, Massachusetts",
+    "start_date": "2025-06-01",
+    "end_date": "2025-06-05",
+}
+
+# (method, route path, request builder) for every route in main.py
+ROUTES = [
+    ("GET", "/", lambda ids: {"url": "/"}),
+    ("GET", "/api/explore/{category}", lambda ids: {"url": "/api/explore/dining?lat=42.36&lng=-71.06&radius=5&limit=2"}),
+    ("POST", "/api/places/geocode", lambda ids: {"url": "/api/places/geocode", "json": {"cities": ["Boston, MA", "Hartford, Connecticut", "Nowhere, Atlantis"]}}),
+    ("GET", "/api/places/autocomplete", lambda ids: {"url": "/api/places/autocomplete?input=Bos"}),
+    ("POST", "/api/users", lambda ids: {"url": "/api/users", "json": {"email": "new@example.com", "password": "pw"}}),
+    ("GET", "/api/users/{user_id}", lambda ids: {"url": f"/api/users/{ids['user_id']}"}),
+    ("GET", "/api/users", lambda ids: {"url": "/api/users"}),
+    ("PUT", "/api/users/{user_id}", lambda ids: {"url": f"/api/users/{ids['user_id']}", "json": {"name": "Renamed"}}),
+    ("DELETE", "/api/users/{user_id}", lambda ids: {"url": f"/api/users/{ids['user_id']}"}),
+    ("POST", "/api/users/login", lambda ids: {"url": "/api/users/login", "json": {"email": "owner@example.com", "password": "secret"}}),
+    ("POST", "/api/pets", lambda ids: {"url": "/api/pets", "json": {"user_id": ids["user_id"], "name": "Newbie"}}),
+    ("GET", "/api/pets/{pet_id}", lambda ids: {"url": f"/api/pets/{ids['pet_id']}"}),
+    ("GET", "/api/users/{user_id}/pets", lambda ids: {"url": f"/api/users/{ids['user_id']}/pets"}),
+    ("PUT", "/api/pets/{pet_id}", lambda ids: {"url": f"/api/pets/{ids['pet_id']}", "json": {"health": "Healthy"}}),
+    ("DELETE", "/api/pets/{pet_id}", lambda ids: {"url": f"/api/pets/{ids['pet_id']}"}),
+    ("POST", "/api/pets/analyze-image", lambda ids: {"url": "/api/pets/analyze-image", "files": {"file": ("pet.png", b"\x89PNG", "image/png")}}),
+    ("POST", "/api/blobs", lambda ids: {"url": "/api/blobs", "files": {"file": ("avatar.png", b"\x89PNG new", "image/png")}}),
+    ("GET", "/api/blobs/{name}", lambda ids: {"url": f"/api/blobs/{ids['blob_name']}"}),
+    ("POST", "/api/plans", lambda ids: {"url": "/api/plans", "json": {"user_id": ids["user_id"], "start_date": "2025-06-01", "end_date": "2025-06-05", "destination": "Austin, Texas", "pet_ids": str(ids["pet_id"])}}),
+    ("GET", "/api/plans/{plan_id}", lambda ids: {"url": f"/api/plans/{ids['plan_id']}"}),
+    ("GET", "/api/plans/{plan_id}/stops", lambda ids: {"url": f"/api/plans/{ids['plan_id']}/stops"}),
+    ("GET", "/api/plans/{plan_id}/geocode", lambda ids: {"url": f"/api/plans/{ids['plan_id']}/geocode"}),
+    ("GET", "/api/plans/{plan_id}/corridor", lambda ids: {"url": f"/api/plans/{ids['plan_id']}/corridor?category=restaurant&limit=2"}),
+    ("GET", "/api/users/{user_id}/plans/search", lambda ids: {"url": f"/api/users/{ids['user_id']}/plans/search?q=hartford stop"}),
+    ("GET", "/api/users/{user_id}/plans", lambda ids: {"url": f"/api/users/{ids['user_id']}/plans"}),
+    ("PUT", "/api/plans/{plan_id}", lambda ids: {"url": f"/api/plans/{ids['plan_id']}", "json": {"destination": "Austin, Texas"}}),
+    ("PATCH", "/api/plans/{plan_id}/itinerary", lambda ids: {"url": f"/api/plans/{ids['plan_id']}/itinerary", "headers": {"If-Match": '"1"'}, "json": [{"op": "replace", "path": "/days/0/items/0/estimated_cost", "value": 35.0}, {"op": "add", "path": "/days/1/items/-", "value": {"type": "activity", "title": "Dog park", "subtitle": "Providence, Rhode Island"}}]}),
+    ("DELETE", "/api/plans/{plan_id}", lambda ids: {"url": f"/api/plans/{ids['plan_id']}"}),
+    ("GET", "/api/deletions/{job_id}", lambda ids: {"url": f"/api/deletions/{ids['job_id']}"}),
+    ("POST", "/api/plans/generate-itinerary", lambda ids: {"url": "/api/plans/generate-itinerary", "json": {**GENERATE_BODY, "pet_id": ids["pet_id"], "reuse": True}}),
+    ("POST", "/api/plans/generate-road-trip-itinerary", lambda ids: {"url": "/api/plans/generate-road-trip-itinerary", "json": {**GENERATE_BODY, "pet_id": ids["pet_id"], "reuse": True}}),
+    ("POST", "/api/plans/fit-budget", lambda ids: {"url": "/api/plans/fit-budget", "json": {"budget": 100, "itinerary": {"days": [{"date": "Sun, Jun 1", "dayLabel": "Day 1", "items": [{"id": "1", "time": "evening", "type": "dining", "title": "Stop", "subtitle": "Patio", "compliance": "approved", "estimated_cost": 150.0}]}]}}}),
+    ("POST", "/api/plans/save", lambda ids: {"url": "/api/plans/save", "json": {**GENERATE_BODY, "user_id": ids["user_id"], "pet_ids": str(ids["pet_id"]), "detailed_itinerary": itinerary(3)}}),
+    ("GET", "/api/memories/past-trips/{user_id}", lambda ids: {"url": f"/api/memories/past-trips/{ids['user_id']}"}),
+    ("GET", "/api/memories/photos/{trip_id}", lambda ids: {"url": f"/api/memories/photos/{ids['plan_id']}"}),
+    ("POST", "/api/memories/photos", lambda ids: {"url": "/api/memories/photos", "json": {"trip_id": ids["plan_id"], "user_id": ids["user_id"], "local_path": "photos/new.jpg"}}),
+    ("POST", "/api/memories/photos/bulk", lambda ids: {"url": "/api/memories/photos/bulk", "json": {"trip_id": ids["plan_id"], "user_id": ids["user_id"], "photos": [{"local_path": f"photos/new{i}.jpg", "city_name": "Boston, MA"} for i in range(20)]}}),
+    ("POST", "/api/memories/photos/upload", lambda ids: {"url": "/api/memories/photos/upload", "data": {"trip_id": ids["plan_id"], "user_id": ids["user_id"]}, "files": {"file": ("trip.jpg", b"\xff\xd8 photo", "image/jpeg")}}),
+    ("DELETE", "/api/memories/photos/{photo_id}", lambda ids: {"url": f"/api/memories/photos/{ids['photo_id']}"}),
+    ("GET", "/api/memories/visited-cities/{user_id}", lambda ids: {"url": f"/api/memories/visited-cities/{ids['user_id']}"}),
+    ("GET", "/api/memories/visited-cities/{user_id}/clusters", lambda ids: {"url": f"/api/memories/visited-cities/{ids['user_id']}/clusters?zoom=5"}),
+    ("DELETE", "/api/memories/trips/{trip_id}", lambda ids: {"url": f"/api/memories/trips/{ids['plan_id']}"}),
+]
+
+
+def load_baseline():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH, newline="") as f:
+        return {
+            (row["method"], row["path"]): (int(row["max_statements"]), float(row["max_ms"]))
+            for row in csv.DictReader(f)
+        }
+
+
+def write_baseline(measurements):
+    with open(BASELINE_PATH, "w", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(["method", "path", "max_statements", "max_ms"])
+        for (method, path), (statement_count, elapsed_ms) in sorted(measurements.items()):
+            # Leave headroom so slower machines do not trip the latency check
+            writer.writerow([method, path, statement_count, round(elapsed_ms)])
+
+
+BASELINE = load_baseline()
+MEASUREMENTS = {}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def update_baseline_file():
+    yield
+    if not UPDATE_BASELINE or not MEASUREMENTS:
+        return
+    baseline = dict(BASELINE)
+    for route, (statement_count, elapsed_ms) in MEASUREMENTS.items():
+        if UPDATE_BASELINE == "all" or baseline.get(route, (None,))[0] != statement_count:
+            # Leave headroom so slower machines do not trip the latency check
+            baseline[route] = (statement_count, max(100, round(elapsed_ms * 5)))
+    write_baseline(baseline)
+
+
+@pytest.fixture(autouse=True)
+def offline_services(monkeypatch):
+    """Keep Google and Gemini calls off the network"""
+    def no_network(*args, **kwargs):
+        raise ConnectionError("network disabled in tests")
+
+    itinerary = {"days": [], "total_estimated_cost": 0}
+    monkeypatch.setattr(main.requests, "get", no_network)
+    monkeypatch.setattr(main, "analyze_pet_image", lambda *args, **kwargs: {"breed": "Corgi"})
+    monkeypatch.setattr(main, "generate_travel_itinerary", lambda **kwargs: itinerary)
+    monkeypatch.setattr(main, "generate_road_trip_itinerary", lambda **kwargs: itinerary)
+    # Variant generation runs off the request path; keep it out of the statement counts
+    monkeypatch.setattr(main, "schedule_variants", lambda *args, **kwargs: None)
+
+
+def measure(request_factory, scale, engine_factory):
+    """Seed a fresh database at `scale`, call the route once, return (statements, ms, status)"""
+    engine, client, session, statements = engine_factory()
+    ids = seed(session, scale)
+    kwargs = request_factory(ids)
+    method = kwargs.pop("method")
+
+    statements.clear()
+    started = time.perf_counter()
+    response = client.request(method, **kwargs)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return len(statements), elapsed_ms, response.status_code
+
+
+def test_every_route_is_covered():
+    app_routes = {
+        (method, route.path)
+        for route in main.app.routes
+        if isinstance(route, APIRoute)
+        for method in route.methods
+    }
+    covered = {(method, path) for method, path, _ in ROUTES}
+    assert app_routes - covered == set(), "add new routes to ROUTES in test_query_budget.py"
+    assert covered - app_routes == set(), "remove routes from ROUTES that no longer exist"
+
+
+@pytest.mark.parametrize("method,path,build", ROUTES, ids=[f"{m} {p}" for m, p, _ in ROUTES])
+def test_route_query_budget(method, path, build, fresh_app):
+    request_factory = lambda ids: {"method": method, **build(ids)}
+    counts = []
+    timings = []
+    for scale in SCALES:
+        runs = LATENCY_RUNS if scale == SCALES[-1] else 1
+        for _ in range(runs):
+            statement_count, elapsed_ms, status_code = measure(request_factory, scale, fresh_app)
+            assert status_code < 400, f"{method} {path} returned {status_code} at scale {scale}"
+            if scale == SCALES[-1]:
+                timings.append(elapsed_ms)
+        counts.append(statement_count)
+    elapsed_ms = min(timings)
+
+    assert len(set(counts)) == 1, f"{method} {path} statement count grows with data: {dict(zip(SCALES, counts))}"
+
+    MEASUREMENTS[(method, path)] = (counts[-1], elapsed_ms)
+    if UPDATE_BASELINE:
+        return
+
+    assert (method, path) in BASELINE, f"no baseline for {method} {path}; run with PERF_BASELINE_UPDATE=1"
+    max_statements, max_ms = BASELINE[(method, path)]
+    assert counts[-1] <= max_statements, f"{method} {path} runs {counts[-1]} statements, baseline {max_statements}"
+    assert elapsed_ms <= max_ms, f"{method} {path} took {elapsed_ms:.1f} ms, baseline {max_ms:.0f} ms"
+
+
+@pytest.mark.parametrize("method,path,build", ROUTES, ids=[f"{m} {p}" for m, p, _ in ROUTES])
+def test_soft_delete_subqueries(method, path, build, fresh_app):
+    """The soft-delete filters must not be correlated or scan whole tables"""
+    engine, client, session, _ = fresh_app()
+    ids = seed(session, SCALES[0])
+    kwargs = build(ids)
+
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            executed.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    assert client.request(method, **kwargs).status_code < 400
+    event.remove(engine, "before_cursor_execute", record)
+
+    connection = engine.raw_connection()
+    try:
+        for statement, parameters in executed:
+            if "deleted_at IS NOT NULL" not in statement:
+                continue
+            plan = [row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+            slow = [step for step in plan if "CORRELATED" in step or step.startswith(("SCAN users", "SCAN plans"))]
+            assert not slow, f"{method} {path}: {plan}"
+    finally:
+        connection.close()
@@ -0,0 +1,85 @@
+import os
+
+from blob_store import blob_path, blob_url, save_blob
+from conftest import seed_user
+from models import DeletionJob, MemoryPhoto, Pet, Plan, PlanStop, User
+from reaper import reap_pending, reaper_session
+
+
+def add_photos(db, trip_id, user_id, urls):
+    db.add_all(MemoryPhoto(trip_id=trip_id, user_id=user_id, local_path=url, city_name="Boston, MA") for url in urls)
+    db.commit()
+
+
+def test_deleted_user_disappears_then_is_reaped(client, db_session, engine):
+    user_id = seed_user(db_session, num_pets=2, num_plans=3)
+    other_id = seed_user(db_session, num_pets=1, num_plans=1, email="other@example.com")
+    own, shared = save_blob(b"\x89PNG own", "image/png"), save_blob(b"\x89PNG shared", "image/png")
+    add_photos(db_session, 1, user_id, [blob_url(own), blob_url(shared), "photos/local.jpg", "photos/2.jpg", "photos/3.jpg"])
+    add_photos(db_session, 4, other_id, [blob_url(shared)])
+    db_session.add(PlanStop(plan_id=1, position=0, day_index=0, title="Lunch"))
+    db_session.commit()
+
+    response = client.delete(f"/api/users/{user_id}")
+    assert response.status_code == 204
+    # Gone from reads before any row is removed
+    assert client.get(f"/api/users/{user_id}").status_code == 404
+    assert client.get(f"/api/plans/1").status_code == 404
+    assert client.get(f"/api/pets/1").status_code == 404
+    assert client.get("/api/memories/photos/1").json() == []
+    assert client.get(f"/api/memories/past-trips/{other_id}").json()[0]["photo_count"] == 1
+    assert client.post("/api/users/login", json={"email": "owner@example.com", "password": "secret"}).status_code == 401
+    assert client.post("/api/users", json={"email": "owner@example.com", "password": "new"}).status_code == 201
+
+    job = client.get(response.headers["location"]).json()
+    assert (job["entity"], job["entity_id"], job["status"], job["rows_deleted"]) == ("user", user_id, "pending", 0)
+    with reaper_session(engine) as db:
+        assert db.query(MemoryPhoto).count() == 6 and db.query(User).count() == 3
+
+    assert reap_pending(engine, batch_size=2) == 1
+    job = client.get(response.headers["location"]).json()
+    # 5 photos, 3 plans with 1 stop and their city/pet links, 2 pets, the user
+    assert job["status"] == "done" and job["finished_at"] and job["blobs_deleted"] == 1
+    with reaper_session(engine) as db:
+        assert db.query(MemoryPhoto).count() == 1 and db.query(Plan).count() == 1
+        assert db.query(Pet).count() == 1 and db.query(PlanStop).count() == 0
+        assert db.query(User).count() == 2
+        assert job["rows_deleted"] == 5 + 3 + 1 + 2 + 1
+    # The other user's photo still points at the shared blob
+    assert not os.path.exists(blob_path(own)) and os.path.exists(blob_path(shared))
+    assert reap_pending(engine) == 0
+
+
+def test_deleted_trip_photos_are_reaped(client, db_session, engine):
+    user_id = seed_user(db_session, num_pets=0, num_plans=2)
+    add_photos(db_session, 1, user_id, ["photos/a.jpg", "photos/b.jpg"])
+    add_photos(db_session, 2, user_id, ["photos/c.jpg"])
+
+    assert client.delete("/api/memories/trips/1").status_code == 204
+    assert client.delete("/api/memories/trips/1").status_code == 404
+    trips = client.get(f"/api/memories/past-trips/{user_id}").json()
+    assert [(trip["plan_id"], trip["photo_count"]) for trip in trips] == [(2, 1)]
+
+    reap_pending(engine)
+    with reaper_session(engine) as db:
+        assert [photo.trip_id for photo in db.query(MemoryPhoto)] == [2]
+        assert [plan.plan_id for plan in db.query(Plan)] == [2]
+        assert db.query(DeletionJob).one().rows_deleted == 3
+
+
+def test_deleted_trip_is_hidden_from_pet_and_city_lookups(client, db_session):
+    # plan_pets and plan_cities rows have no soft-delete criteria of their own
+    user_id = seed_user(db_session, num_pets=1, num_plans=0)
+    trip = {"user_id": user_id, "start_date": "2024-05-01", "end_date": "2024-05-03", "pet_ids": "1",
+            "trip_type": "Direct Trip"}
+    kept = client.post("/api/plans", json={**trip, "destination": "Boston, Massachusetts"}).json()["plan_id"]
+    gone = client.post("/api/plans", json={**trip, "destination": "Denver, Colorado"}).json()["plan_id"]
+    assert client.delete(f"/api/plans/{gone}").status_code == 204
+
+    by_pet = client.get(f"/api/memories/past-trips/{user_id}", params={"pet_id": 1}).json()
+    assert [trip["plan_id"] for trip in by_pet] == [kept]
+    assert client.get(f"/api/memories/past-trips/{user_id}", params={"city_name": "Denver, Colorado"}).json() == []
+    cities = client.get(f"/api/memories/visited-cities/{user_id}").json()
+    assert [city["city_name"] for city in cities] == ["Boston, Massachusetts"]
+    clusters = client.get(f"/api/memories/visited-cities/{user_id}/clusters", params={"zoom": 3}).json()
+    assert sum(cluster["trip_count"] for cluster in clusters) == 1
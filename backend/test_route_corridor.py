@@ -0,0 +1,97 @@
+import json
+from datetime import date
+
+import numpy as np
+import pytest
+from conftest import seed_user
+from gazetteer import (EARTH_RADIUS_KM, haversine_km, locate_cities,
+                       to_unit_vectors)
+from models import Plan, Poi
+from route_corridor import route_positions
+
+CITIES = ["Salt Lake City, Utah", "Grand Junction, Colorado", "Denver, Colorado"]
+
+
+@pytest.fixture
+def road_trip(db_session):
+    user_id = seed_user(db_session, num_pets=0, num_plans=0)
+    plan = Plan(
+        user_id=user_id, start_date=date(2025, 6, 1), end_date=date(2025, 6, 5), trip_type="Road Trip",
+        origin=CITIES[0], places_passing_by=json.dumps(CITIES[1:2]), destination=CITIES[2],
+    )
+    db_session.add(plan)
+    (_, slc_lat, slc_lng), (_, gj_lat, gj_lng), (_, den_lat, den_lng) = locate_cities(CITIES)
+    midway = ((slc_lat + gj_lat) / 2, (slc_lng + gj_lng) / 2)
+    places = [
+        ("denver-vet", "vet", den_lat + 0.02, den_lng, True),
+        ("junction-vet", "vet", gj_lat - 0.03, gj_lng + 0.01, True),
+        ("day-vet", "vet", gj_lat, gj_lng - 0.02, False),
+        ("midway-park", "park", midway[0] + 0.05, midway[1], False),
+        ("aspen-vet", "vet", 39.19, -106.82, True),  # ~90 km south of the route
+        ("salt-lake-diner", "restaurant", slc_lat, slc_lng + 0.01, False),
+    ]
+    db_session.add_all(
+        Poi(source_id=source_id, category=category, name=source_id, latitude=lat, longitude=lng,
+            pet_policy="approved", open_24h=open_24h)
+        for source_id, category, lat, lng, open_24h in places
+    )
+    db_session.commit()
+    return plan.plan_id
+
+
+def names(response):
+    assert response.status_code == 200, response.text
+    return [place["name"] for place in response.json()]
+
+
+def test_places_in_route_order(client, road_trip):
+    url = f"/api/plans/{road_trip}/corridor"
+    assert names(client.get(url)) == ["salt-lake-diner", "midway-park", "day-vet", "junction-vet", "denver-vet"]
+    assert names(client.get(url, params={"category": "vet", "open_24h": True})) == ["junction-vet", "denver-vet"]
+    assert names(client.get(url, params={"category": ["park", "restaurant"]})) == ["salt-lake-diner", "midway-park"]
+    assert "aspen-vet" in names(client.get(url, params={"category": "vet", "radius": 50, "open_24h": True}))
+
+    places = client.get(url).json()
+    assert all(place["distance_km"] <= 16 for place in places)
+    assert places[0]["progress_km"] < 5 and 150 < places[1]["progress_km"] < 185
+
+    # Pages follow the Link header without repeating places
+    first = client.get(url, params={"limit": 3})
+    link = first.headers["link"]
+    assert names(first) + names(client.get(link[1:link.index(">")])) == names(client.get(url))
+
+
+def test_errors(client, db_session, road_trip):
+    assert client.get("/api/plans/999/corridor").status_code == 404
+    assert client.get(f"/api/plans/{road_trip}/corridor", params={"category": "museum"}).status_code == 400
+
+    plan = db_session.get(Plan, road_trip)
+    plan.origin, plan.places_passing_by = "Atlantis, Ocean", None
+    db_session.commit()
+    assert client.get(f"/api/plans/{road_trip}/corridor").status_code == 422
+
+
+def test_route_positions_match_sampled_route():
+    rng = np.random.default_rng(1)
+    route = np.array([(47.61, -122.33), (43.62, -116.21), (41.88, -87.63), (40.71, -74.01)])
+    vertices = to_unit_vectors(route[:, 0], route[:, 1])
+    angles = np.arccos(np.sum(vertices[:-1] * vertices[1:], axis=1))
+    lats, lngs = rng.uniform(38, 50, 300), rng.uniform(-125, -70, 300)
+
+    distances, progress = route_positions(vertices, angles, to_unit_vectors(lats, lngs))
+
+    # Brute force: the route sampled every ~1 km along each great-circle leg
+    samples, offsets = [], []
+    for i, angle in enumerate(angles):
+        fractions = np.linspace(0, 1, int(angle * EARTH_RADIUS_KM) + 1)
+        start = np.outer(np.sin((1 - fractions) * angle), vertices[i])
+        end = np.outer(np.sin(fractions * angle), vertices[i + 1])
+        samples.append((start + end) / np.sin(angle))
+        offsets.append((angles[:i].sum() + fractions * angle) * EARTH_RADIUS_KM)
+    samples, offsets = np.vstack(samples), np.concatenate(offsets)
+    sample_lats = np.degrees(np.arcsin(samples[:, 2]))
+    sample_lngs = np.degrees(np.arctan2(samples[:, 1], samples[:, 0]))
+    for lat, lng, distance, along in zip(lats, lngs, distances, progress):
+        to_samples = haversine_km(lat, lng, sample_lats, sample_lngs)
+        assert distance == pytest.approx(to_samples.min(), abs=0.6)
+        assert along == pytest.approx(offsets[np.argmin(to_samples)], abs=2)
@@ -0,0 +1,44 @@
+import pytest
+from conftest import seed_user
+
+
+@pytest.mark.parametrize("num_pets,num_plans", [(0, 0), (1, 1), (5, 20), (30, 120)])
+def test_get_user_runs_fixed_number_of_queries(client, db_session, statements, num_pets, num_plans):
+    user_id = seed_user(db_session, num_pets=num_pets, num_plans=num_plans)
+    statements.clear()
+
+    response = client.get(f"/api/users/{user_id}")
+
+    assert response.status_code == 200
+    assert len(statements) == 3  # user, pets, plans
+    assert not any("detailed_itinerary" in statement for statement in statements)
+
+
+def test_get_user_limits_each_relationship(client, db_session):
+    user_id = seed_user(db_session, num_pets=4, num_plans=6)
+
+    body = client.get(f"/api/users/{user_id}?pets_limit=3&plans_limit=2").json()
+
+    assert len(body["pets"]) == 3
+    assert len(body["plans"]) == 2
+    assert "detailed_itinerary" not in body["plans"][0]
+    assert body["plans"][0]["end_date"] > body["plans"][1]["end_date"]
+
+    # The cursors continue where the embedded lists stopped
+    pets = client.get(f"/api/users/{user_id}/pets?cursor={body['pets_next_cursor']}").json()
+    plans = client.get(f"/api/users/{user_id}/plans?cursor={body['plans_next_cursor']}").json()
+    assert len(pets) == 1
+    assert len(plans) == 4
+
+
+def test_get_user_without_truncation_has_no_cursors(client, db_session):
+    user_id = seed_user(db_session, num_pets=2, num_plans=2)
+
+    body = client.get(f"/api/users/{user_id}").json()
+
+    assert body["pets_next_cursor"] is None
+    assert body["plans_next_cursor"] is None
+
+
+def test_get_user_not_found(client):
+    assert client.get("/api/users/999").status_code == 404
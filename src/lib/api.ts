@@ -197,6 +197,31 @@ class PawcationAPI {
     return response.json();
   }
 
+  // List endpoints return one page at a time; follow the Link rel="next" header to the last page
+  private async requestAll<T>(endpoint: string): Promise<T[]> {
+    const path = endpoint.split('?')[0];
+    const items: T[] = [];
+    let url = `${this.baseUrl}${endpoint}`;
+
+    while (url) {
+      const response = await fetch(url, {
+        headers: { 'Content-Type': 'application/json' },
+      });
+
+      if (!response.ok) {
+        const error = await response.json().catch(() => ({}));
+        throw new Error(error.detail || `API Error: ${response.statusText}`);
+      }
+
+      items.push(...(await response.json()));
+      // Keep only the next page's query string: the server may see another host than baseUrl
+      const next = response.headers.get('Link')?.match(/<([^>]+)>;\s*rel="next"/);
+      url = next ? `${this.baseUrl}${path}${new URL(next[1]).search}` : '';
+    }
+
+    return items;
+  }
+
   // ========== USER ENDPOINTS ==========
 
   async createUser(email: string, password: string): Promise<User> {
@@ -211,7 +236,7 @@ class PawcationAPI {
   }
 
   async listUsers(): Promise<User[]> {
-    return this.request<User[]>('/api/users');
+    return this.requestAll<User>('/api/users');
   }
 
   async loginUser(email: string, password: string): Promise<User> {
@@ -237,7 +262,7 @@ class PawcationAPI {
   // ========== PET ENDPOINTS ==========
 
   async getUserPets(userId: string): Promise<Pet[]> {
-    return this.request<Pet[]>(`/api/users/${userId}/pets`);
+    return this.requestAll<Pet>(`/api/users/${userId}/pets`);
   }
 
   async createPet(petData: Omit<Pet, 'pet_id'>): Promise<Pet> {
@@ -294,8 +319,10 @@ class PawcationAPI {
     return this.request<Plan>(`/api/plans/${planId}`);
   }
 
-  async getUserPlans(userId: string): Promise<Plan[]> {
-    return this.request<Plan[]>(`/api/users/${userId}/plans`);
+  // List results leave detailed_itinerary out unless includeItinerary is set
+  async getUserPlans(userId: string, includeItinerary = false): Promise<Plan[]> {
+    const params = includeItinerary ? '?include=itinerary' : '';
+    return this.requestAll<Plan>(`/api/users/${userId}/plans${params}`);
   }
 
   async updatePlan(planId: number | string, updates: Partial<Plan>): Promise<Plan> {
@@ -347,13 +374,14 @@ class PawcationAPI {
 
   // ========== MEMORY ENDPOINTS ==========
 
-  async getPastTrips(userId: string): Promise<PastTrip[]> {
-    return this.request<PastTrip[]>(`/api/memories/past-trips/${userId}`);
+  async getPastTrips(userId: string, includeItinerary = false): Promise<PastTrip[]> {
+    const params = includeItinerary ? '?include=itinerary' : '';
+    return this.requestAll<PastTrip>(`/api/memories/past-trips/${userId}${params}`);
   }
 
   async getTripPhotos(tripId: number | string, cityName?: string): Promise<MemoryPhoto[]> {
     const params = cityName ? `?city_name=${encodeURIComponent(cityName)}` : '';
-    return this.request<MemoryPhoto[]>(`/api/memories/photos/${tripId}${params}`);
+    return this.requestAll<MemoryPhoto>(`/api/memories/photos/${tripId}${params}`);
   }
 
   async addMemoryPhoto(photo: MemoryPhotoCreate): Promise<MemoryPhoto> {
@@ -81,10 +81,10 @@ export const MapsPage = () => {
     enabled: !!user,
   });
 
-  // Fetch all past trips for pet info
+  // Fetch all past trips for pet info, with itineraries for the route stops
   const { data: pastTrips = [] } = useQuery({
-    queryKey: ["pastTrips", user?.user_id],
-    queryFn: () => api.getPastTrips(user!.user_id),
+    queryKey: ["pastTrips", user?.user_id, "itinerary"],
+    queryFn: () => api.getPastTrips(user!.user_id, true),
     enabled: !!user,
   });
 
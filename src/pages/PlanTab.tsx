@@ -234,8 +234,10 @@ export const PlanTab = () => {
     }
   };
 
-  const handleViewPlan = (plan: Plan) => {
+  const handleViewPlan = async (listedPlan: Plan) => {
     try {
+      // The plan list leaves detailed_itinerary out; load the full plan
+      const plan = await api.getPlan(listedPlan.plan_id);
       const parsedItinerary = JSON.parse(plan.detailed_itinerary || "{}");
       setItinerary(parsedItinerary.days || []);
       setTotalCost(parsedItinerary.total_estimated_cost);
@@ -256,7 +258,7 @@ export const PlanTab = () => {
       setSelectedPlanForMemo(plan);
       setMemoOpen(false);
     } catch (error) {
-      console.error("Failed to parse plan:", error);
+      console.error("Failed to load plan:", error);
       toast({
         title: "Error",
         description: "Failed to load saved plan",
@@ -600,8 +602,11 @@ export const PlanTab = () => {
       {!showItinerary && upcomingTripWithinThreeDays && (
         <>
           <FloatingMemoButton 
-            onClick={() => {
-              setSelectedPlanForMemo(upcomingTripWithinThreeDays);
+            onClick={async () => {
+              // Full plan, for the packing memo stored in its itinerary
+              const plan = await api.getPlan(upcomingTripWithinThreeDays.plan_id)
+                .catch(() => upcomingTripWithinThreeDays);
+              setSelectedPlanForMemo(plan);
               setMemoOpen(true);
             }} 
           />